@@ -1,31 +1,13 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
+'''
+Part 1: Document Missing Values
 
-# Load the dataset:
-url = 'Electric_Vehicle_Population_Data.csv'                          
-df = pd.read_csv(url) # Read the CSV file into a pandas DataFrame
+Overview:
+     Runs part 1 of the analysis on its own. The analysis itself lives in assignment1_1212214.py and is shared with the menu and the batch runner.
+'''
 
-# Check for missing values in the DataFrame, by count the number of missing values in each column:
-missing_values = df.isnull().sum()
+# Import necessary libraries:
+from assignment1_1212214 import run_analysis   # for loading the dataset and running the shared analysis
 
-# Document the frequency and distribution of missing values:
-missing_frequency = pd.DataFrame({
-    'Feature': missing_values.index,
-    'Missing Values': missing_values.values,
-    'Percentage': (missing_values.values / len(df)) * 100
-})
-
-# Print the summary of missing values frequency and percentage:
-print("Missing Values Frequency and Percentage:")
-print(missing_frequency)
-
-# Plotting the distribution of missing values:
-plt.figure(figsize=(12, 6))
-sns.barplot(x='Feature', y='Missing Values', data=missing_frequency, hue='Feature', legend=False, palette='viridis')
-plt.title('Missing Values Distribution', fontsize=16)
-plt.xlabel('Features', fontsize=14)
-plt.ylabel('Number of Missing Values', fontsize=14)
-plt.xticks(rotation=45, ha='right', fontsize=12, rotation_mode='anchor')
-plt.tight_layout()
-plt.show()
\ No newline at end of file
+# Run the part:
+if __name__ == "__main__":
+    run_analysis('1')
@@ -1,22 +1,13 @@
-import pandas as pd
+'''
+Part 3: Feature Encoding
 
-# Load the dataset
-url = 'Electric_Vehicle_Population_Data.csv'
-df = pd.read_csv(url)  # Read the CSV file into a pandas DataFrame
+Overview:
+     Runs part 3 of the analysis on its own. The analysis itself lives in assignment1_1212214.py and is shared with the menu and the batch runner.
+'''
 
-# Display the first few rows of the dataset
-print("Original DataFrame:")
-print(df.head())
+# Import necessary libraries:
+from assignment1_1212214 import run_analysis   # for loading the dataset and running the shared analysis
 
-# Select categorical features to encode
-categorical_features = ['Make', 'Model']
-
-# One-Hot Encoding
-df_encoded = pd.get_dummies(df, columns=categorical_features)
-
-# Display the first few rows of the encoded DataFrame
-print("\nOne-Hot Encoded DataFrame:")
-print(df_encoded.head())
-
-# Save the encoded DataFrame to a new CSV file (optional)
-df_encoded.to_csv('Electric_Vehicle_Population_Data_Encoded.csv', index=False)
\ No newline at end of file
+# Run the part:
+if __name__ == "__main__":
+    run_analysis('3')
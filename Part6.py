@@ -1,33 +1,13 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
+'''
+Part 6: Spatial Distribution
 
-# Load the dataset
-url = 'Electric_Vehicle_Population_Data.csv'
-df = pd.read_csv(url)
+Overview:
+     Runs part 6 of the analysis on its own. The analysis itself lives in assignment1_1212214.py and is shared with the menu and the batch runner.
+'''
 
-# Analyze the spatial distribution of EVs by City
-city_counts = df['City'].value_counts()
+# Import necessary libraries:
+from assignment1_1212214 import run_analysis   # for loading the dataset and running the shared analysis
 
-# Create a bar plot for the distribution of EVs by City
-plt.figure(figsize=(12, 8))
-city_counts.plot(kind='bar', color='teal')
-plt.title('Spatial Distribution of EVs by City')
-plt.xlabel('City')
-plt.ylabel('Number of EVs')
-plt.xticks(rotation=90)
-plt.tight_layout()
-plt.show()
-
-# Analyze the spatial distribution of EVs by County
-county_counts = df['County'].value_counts()
-
-# Create a bar plot for the distribution of EVs by County
-plt.figure(figsize=(12, 8))
-county_counts.plot(kind='bar', color='purple')
-plt.title('Spatial Distribution of EVs by County')
-plt.xlabel('County')
-plt.ylabel('Number of EVs')
-plt.xticks(rotation=90)
-plt.tight_layout()
-plt.show()
\ No newline at end of file
+# Run the part:
+if __name__ == "__main__":
+    run_analysis('6')
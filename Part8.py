@@ -1,22 +1,13 @@
-import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
+'''
+Part 8: Investigate Relationships
 
-# Load the dataset
-url = 'Electric_Vehicle_Population_Data.csv'
-df = pd.read_csv(url)
+Overview:
+     Runs part 8 of the analysis on its own. The analysis itself lives in assignment1_1212214.py and is shared with the menu and the batch runner.
+'''
 
-# Select the relevant numerical features for correlation analysis
-numerical_features = ['Postal Code', 'Model Year', 'Electric Range', 'Base MSRP', 'Legislative District', 'DOL Vehicle ID', '2020 Census Tract']
+# Import necessary libraries:
+from assignment1_1212214 import run_analysis   # for loading the dataset and running the shared analysis
 
-# Calculate the correlation matrix
-correlation_matrix = df[numerical_features].corr()
-
-print("Correlation Matrix:")
-print(correlation_matrix)
-
-# Create a heatmap to visualize correlations
-plt.figure(figsize=(12, 8))
-sns.heatmap(correlation_matrix, annot=True, cmap='coolwarm', linewidths=0.5)
-plt.title('Correlation Matrix of Numeric Features')
-plt.show()
\ No newline at end of file
+# Run the part:
+if __name__ == "__main__":
+    run_analysis('8')
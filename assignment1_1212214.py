@@ -17,11 +17,118 @@ sec: 3
 '''
 
 # Import necessary libraries:
+import argparse                        # for the command line options of the menu
+import multiprocessing                 # for the start method of the parallel runs
+import os                              # for output paths
+import shutil                          # for copying cached figures to the output directory
 import pandas as pd                    # for data manipulation
 import numpy as np                     # for numerical operations
-import matplotlib.pyplot as plt        # for data visualization
-import seaborn as sns                  # for data visualization
-import geopandas as gpd                # for spatial analysis and map plotting
+from ev_lazy_imports import lazy_import   # for importing the plotting libraries only when a part plots
+from ev_data_loader import DATASET_PATH   # for the location of the dataset
+from ev_sqlite_store import parse_filters  # for the filters given on the command line
+from ev_session import DatasetSession, load_columns   # for loading only the columns (and rows) the chosen parts read
+from ev_feature_encoding import build_vocabulary, load_vocabulary, save_encoding, sparse_one_hot   # for sparse one-hot encoding
+from ev_missing_values import MissingValueStrategies   # for comparing missing value strategies without copying the dataset
+from ev_streaming_stats import accumulate_stream, ranking_tables, statistics_table, streaming_top_values   # for chunked statistics and rankings with flat memory
+from ev_aggregations import group_counts, prefetch, value_counts    # for counts shared (and cached) across the analyses
+from ev_scalers import MinMaxScaler, StandardScaler   # for fitted, reusable normalization
+from ev_geometry import plot_choropleth   # for cached, simplified county boundaries joined by FIPS code (spatial analysis)
+from ev_correlation import correlation_matrix, streaming_correlation_matrix   # for correlations of all numeric columns from one scan
+from ev_profiling import print_record, profile_part   # for timing the parts chosen from the menu
+from ev_density_plots import DENSITY_ROW_THRESHOLD, pairplot_or_density, scatter_or_density   # for density plots of large datasets
+from ev_category_plots import CATEGORY_PLOTS, count_lines, stacked_bars   # for scalable plots of many cities, counties and models
+from ev_figure_cache import cached_files, figure_key, store_figures   # for reusing the images of figures whose data has not changed
+from ev_temporal_cube import build_cube   # for the adoption metrics of every model, make, EV type and county
+
+# Plotting libraries, imported on first use (the text-only parts never load them):
+plt = lazy_import('matplotlib.pyplot')   # for data visualization
+sns = lazy_import('seaborn')             # for data visualization
+
+###############################################################################
+
+#                                Figure Output                                #
+ 
+###############################################################################
+
+# Where figures go: displayed on screen when "directory" is None, otherwise saved there as <prefix>_<number>.<format> (used by headless runs,
+# which also collect the paths of the saved files). The CSV and other files written by the parts go to the same directory (see output_path()):
+FIGURE_OUTPUT = {'directory': None, 'prefix': 'figure', 'formats': ('png',), 'count': 0, 'files': []}
+
+'''
+This function displays the figures that an analysis has drawn, or saves them to files when FIGURE_OUTPUT has a directory. Empty figures (for
+example a plt.figure() call followed by a pandas plot, which opens its own figure) are skipped when saving.
+'''
+def show_figures():
+    if FIGURE_OUTPUT['directory'] is None:
+        plt.show()
+        return
+
+    # Save every open figure that has something drawn on it:
+    for number in plt.get_fignums():
+        figure = plt.figure(number)
+        if not figure.axes:
+            continue
+        FIGURE_OUTPUT['count'] += 1
+        for file_format in FIGURE_OUTPUT['formats']:
+            name = f"{FIGURE_OUTPUT['prefix']}_{FIGURE_OUTPUT['count']:02d}.{file_format}"
+            figure.savefig(os.path.join(FIGURE_OUTPUT['directory'], name), bbox_inches='tight')
+            FIGURE_OUTPUT['files'].append(os.path.join(FIGURE_OUTPUT['directory'], name))
+    plt.close('all')
+
+'''
+This function returns the path of a file written by a part: in the output directory of headless runs, so runs with different output directories
+never overwrite each other's files, and in the current directory otherwise.
+'''
+def output_path(name):
+    return name if FIGURE_OUTPUT['directory'] is None else os.path.join(FIGURE_OUTPUT['directory'], name)
+
+'''
+This function draws an image file (a saved figure) on a new figure of the same size, to be displayed with the other figures.
+'''
+def show_image(path):
+    image = plt.imread(path)
+    plt.figure(figsize=(image.shape[1] / 100, image.shape[0] / 100))
+    plt.imshow(image)
+    plt.axis('off')
+
+'''
+This function copies a PNG image file (a saved figure) to the output directory as the next figure.
+'''
+def save_image(path):
+    FIGURE_OUTPUT['count'] += 1
+    target = os.path.join(FIGURE_OUTPUT['directory'], f"{FIGURE_OUTPUT['prefix']}_{FIGURE_OUTPUT['count']:02d}.png")
+    shutil.copyfile(path, target)
+    FIGURE_OUTPUT['files'].append(target)
+
+'''
+This function shows figures through the figure cache (ev_figure_cache). "draw" draws the figures on new figures and returns them, and "table" and
+"parameters" are the aggregated data and plot parameters they are drawn from. When the same table and parameters were drawn before, the cached
+images are shown (or copied to the output directory) without drawing anything; otherwise the figures are drawn, cached and shown. The cache holds
+PNG images only, so headless runs that save other formats always draw.
+'''
+def show_cached_figures(table, parameters, draw):
+    headless = FIGURE_OUTPUT['directory'] is not None
+    if headless and tuple(FIGURE_OUTPUT['formats']) != ('png',):
+        draw()
+        show_figures()
+        return
+
+    key = figure_key(table, {**parameters, 'category_plots': CATEGORY_PLOTS})
+    files = cached_files(key)
+    if files is None:
+        files = store_figures(key, draw())
+        if not headless:
+            show_figures()
+            return
+        plt.close('all')
+
+    for path in files:
+        if headless:
+            save_image(path)
+        else:
+            show_image(path)
+    if not headless:
+        show_figures()
 
 ###############################################################################
 
@@ -58,8 +165,11 @@ def document_missing_values(df):
     plt.ylabel('Number of Missing Values', fontsize=14)
     plt.xticks(rotation=45, ha='right', fontsize=12, rotation_mode='anchor')
     plt.tight_layout()
-    plt.show()
+    show_figures()
     
+# Number of bins of the Electric Range histograms of the missing value strategies (the same edges for every strategy):
+STRATEGY_HISTOGRAM_BINS = 50
+
 # Part 2: Missing Value Strategies
 '''
 This function employs several approaches to manage missing values and evaluates the results.
@@ -68,69 +178,58 @@ This function employs several approaches to manage missing values and evaluates
 3. Drop Rows: Removes rows with any missing values.
 The function then calculates summary statistics for each strategy to enable comparison and 
 visualizes the impact of each method on a specific numerical feature, such as "Electric Range".
+The strategies are compared with a MissingValueStrategies engine, which scans the numeric columns once and derives the statistics of every strategy
+from the observed values and the fill values, so the dataset is never copied per strategy. Extra strategies (for example mode_fill or
+group_mean_fill('Make') from ev_missing_values) can be passed in "strategies".
 '''
-def apply_missing_value_strategies(df):
+def apply_missing_value_strategies(df, strategies=None):
     # Check for missing values in the DataFrame:
     missing_values = df.isnull().sum()
     print("\n\n\nMissing Values Frequency and Percentage:")
     print(missing_values)
     print("\n")
 
-    # Define a function to compare missing value strategies:
-    def compare_missing_value_strategies(df):
-        strategies = {
-            'Original': df.copy(),
-            'Mean Imputation': df.copy(),
-            'Median Imputation': df.copy(),
-            'Drop Rows': df.copy()
-        }
-
-        # Mean Imputation:
-        for column in df.select_dtypes(include=[np.number]).columns:
-            strategies['Mean Imputation'][column] = strategies['Mean Imputation'][column].fillna(strategies['Mean Imputation'][column].mean())
-
-        # Median Imputation:
-        for column in df.select_dtypes(include=[np.number]).columns:
-            strategies['Median Imputation'][column] = strategies['Median Imputation'][column].fillna(strategies['Median Imputation'][column].median())
-
-        # Drop Rows:
-        strategies['Drop Rows'] = strategies['Drop Rows'].dropna()
-
-        # Summary statistics for comparison:
-        summary_stats = {}
-        for strategy, df_strategy in strategies.items():
-            summary_stats[strategy] = df_strategy.describe()
-
-        return strategies, summary_stats
-
     # Apply the strategies and get the summary statistics:
-    strategies, summary_stats = compare_missing_value_strategies(df)
+    engine = MissingValueStrategies(df, strategies)
+    summary_stats = engine.summaries()
 
     # Print summary statistics for each strategy:
     for strategy, stats in summary_stats.items():
         print(f"\nSummary Statistics for {strategy}:")
         print(stats)
 
-    # Plotting the impact of missing value strategies on a numerical feature (e.g., 'Electric Range'):
+    # Plotting the impact of missing value strategies on a numerical feature (e.g., 'Electric Range'), skipped when no strategy has any value:
+    weighted = {strategy: engine.weighted_values(strategy, 'Electric Range') for strategy in engine.names}
+    present = [values for values, _ in weighted.values() if len(values)]
+    if not present:
+        print("\nNo strategy has any Electric Range value: the histogram is skipped.")
+        return
     plt.figure(figsize=(12, 8))
 
-    for strategy, df_strategy in strategies.items():
-        sns.histplot(df_strategy['Electric Range'].dropna(), kde=True, label=strategy, element="step")
+    # Seaborn cannot pick automatic bins for weighted values, so a fixed number of bins spans the range of all the strategies, with the same edges
+    # for every histogram (as a list: seaborn compares "bins" with a string):
+    low, high = min(values[0] for values in present), max(values[-1] for values in present)
+    bins = np.histogram_bin_edges([low, high], bins=STRATEGY_HISTOGRAM_BINS, range=(low, high)).tolist()
+
+    for strategy, (values, counts) in weighted.items():
+        sns.histplot(x=values, weights=counts, bins=bins, kde=True, label=strategy, element="step")
 
     plt.title('Impact of Missing Value Strategies on Electric Range')
     plt.xlabel('Electric Range')
     plt.ylabel('Frequency')
     plt.legend()
     plt.tight_layout()
-    plt.show()
+    show_figures()
 
 # Part 3: Feature Encoding
 '''
 This function conducts encoding on categorical features by first selecting specific columns, namely Make and Model. 
 It then employs one-hot encoding to convert these columns into numeric format. Additionally, it save the encoded DataFrame 
 as a CSV file.
+With sparse=True the one-hot columns are stored as a CSR matrix instead, saved to a .npz file with its category vocabulary. Passing the path of a
+saved vocabulary reuses its columns, so new data is encoded exactly like an earlier run.
 '''
-def feature_encoding(df):
+def feature_encoding(df, sparse=False, vocabulary_path=None):
     # Display the first few rows of the dataset:
     print("\n\n\nOriginal DataFrame:")
     print(df.head())
@@ -138,6 +237,10 @@ def feature_encoding(df):
     # Select categorical features to encode:
     categorical_features = ['Make', 'Model']
 
+    if sparse:
+        sparse_feature_encoding(df, categorical_features, vocabulary_path)
+        return
+
     # One-Hot Encoding
     df_encoded = pd.get_dummies(df, columns=categorical_features)
 
@@ -146,13 +249,42 @@ def feature_encoding(df):
     print(df_encoded.head())
 
     # Save the encoded DataFrame to a new CSV file:
-    df_encoded.to_csv('Electric_Vehicle_Population_Data_Encoded.csv', index=False)
+    df_encoded.to_csv(output_path('Electric_Vehicle_Population_Data_Encoded.csv'), index=False)
+
+'''
+This function is the sparse mode of feature_encoding(): it builds (or reuses) the category vocabulary, encodes the features into a CSR matrix and
+saves the matrix and the vocabulary. Memory and file size grow with the number of non-zero entries instead of rows x categories.
+'''
+def sparse_feature_encoding(df, categorical_features, vocabulary_path=None):
+    # Build the vocabulary from the data, or reuse a saved one:
+    if vocabulary_path is not None:
+        vocabulary = load_vocabulary(vocabulary_path)
+    else:
+        vocabulary = build_vocabulary(df, categorical_features)
+
+    # Sparse One-Hot Encoding:
+    encoding, unknown = sparse_one_hot(df, vocabulary)
+
+    # Display the first few rows of the encoded matrix and its size:
+    print("\nOne-Hot Encoded Matrix (first rows):")
+    print(encoding.head())
+    print(f"\nShape: {encoding.shape}, non-zero entries: {encoding.nnz}, size: {encoding.nbytes / 1e6:.2f} MB"
+          f" (dense: {encoding.shape[0] * encoding.shape[1] / 1e6:.2f} MB)")
+    for feature, count in unknown.items():
+        if count:
+            print(f"Values of {feature} not in the vocabulary (left unencoded): {count}")
+
+    # Save the sparse matrix and its vocabulary:
+    save_encoding(encoding, output_path('Electric_Vehicle_Population_Data_Encoded.npz'))
 
 # Part 4: Normalization
 '''
 This function normalizes numerical features to ensure uniform scaling by utilizing Min-Max Normalization, which scales valuesbetween 0 and 1,
 and Standard Normalization, which centers values around the mean with unit variance. It also save each normalized DataFrame, both min-max and
 standard scaled, as separate CSV files.
+The scalers are fitted in one vectorized pass and saved as JSON files, so new data (for example a monthly increment) can be normalized later
+against the same fit with ev_scalers.load_scaler() and transform_csv(). The CSV files only hold the row key (DOL Vehicle ID) and the scaled
+columns, as float32 values.
 '''
 def normalization(df):
     # Display the first few rows of the original DataFrame:
@@ -164,18 +296,12 @@ def normalization(df):
     numerical_features = ['Model Year', 'Electric Range', 'Base MSRP']
 
     # Apply Min-Max Normalization:
-    df_min_max_scaled = df.copy()
-    for feature in numerical_features:
-        min_value = df[feature].min()
-        max_value = df[feature].max()
-        df_min_max_scaled[feature] = (df[feature] - min_value) / (max_value - min_value)
+    min_max_scaler = MinMaxScaler(numerical_features)
+    df_min_max_scaled = min_max_scaler.fit_transform(df)
 
     # Apply Standard Normalization:
-    df_standard_scaled = df.copy()
-    for feature in numerical_features:
-        mean_value = df[feature].mean()
-        std_value = df[feature].std()
-        df_standard_scaled[feature] = (df[feature] - mean_value) / std_value
+    standard_scaler = StandardScaler(numerical_features)
+    df_standard_scaled = standard_scaler.fit_transform(df)
 
     # Display the first few rows of the normalized DataFrames:
     print("\nMin-Max Scaled DataFrame:")
@@ -184,9 +310,11 @@ def normalization(df):
     print("\nStandard Scaled DataFrame:")
     print(df_standard_scaled.head())
 
-    # Save the normalized DataFrames to new CSV files:
-    df_min_max_scaled.to_csv('Electric_Vehicle_Population_Data_MinMax_Scaled.csv', index=False)
-    df_standard_scaled.to_csv('Electric_Vehicle_Population_Data_Standard_Scaled.csv', index=False)
+    # Save the fitted scalers and the normalized columns to new files:
+    min_max_scaler.save(output_path('Electric_Vehicle_Population_Data_MinMax_Scaler.json'))
+    standard_scaler.save(output_path('Electric_Vehicle_Population_Data_Standard_Scaler.json'))
+    df_min_max_scaled.to_csv(output_path('Electric_Vehicle_Population_Data_MinMax_Scaled.csv'), index=False, float_format='%.6g')
+    df_standard_scaled.to_csv(output_path('Electric_Vehicle_Population_Data_Standard_Scaled.csv'), index=False, float_format='%.6g')
 
 ###############################################################################
 
@@ -198,32 +326,56 @@ def normalization(df):
 '''
 This function calculates and displays descriptive statistics for numerical features by computing standard statistics, such as the mean, minimum,
 maximum, standard deviation, and the median. It prints these statistics and save them to a CSV file.
+With streaming=True the statistics are computed while reading the CSV file in chunks (the DataFrame is not used), so memory stays flat for any
+file size. Count, mean, std, min and max are exact; the quartiles and the median come from a quantile sketch and their rank error bounds are printed.
+The same pass ranks the 20 most frequent cities, counties, makes and models with heavy hitter summaries, printed with their count error bounds.
 '''
-def descriptive_statistics(df):
+def descriptive_statistics(df, streaming=False, path=DATASET_PATH, chunksize=100_000):
     # Select numerical features:
     numerical_features = ['Model Year', 'Electric Range', 'Base MSRP']
 
     # Calculate descriptive statistics:
-    descriptive_stats = df[numerical_features].describe().transpose()
-    descriptive_stats['median'] = df[numerical_features].median()
+    if streaming:
+        accumulators, rankings = accumulate_stream(path, numerical_features, ['City', 'County', 'Make', 'Model'], chunksize)
+        descriptive_stats, error_bounds = statistics_table(accumulators)
+        top_values, count_error_bounds = ranking_tables(rankings, 20)
+    else:
+        descriptive_stats = df[numerical_features].describe().transpose()
+        descriptive_stats['median'] = df[numerical_features].median()
 
     # Print the descriptive statistics:
     print("\n\n\nDescriptive Statistics:")
     print(descriptive_stats)
     print("\n")
+    if streaming:
+        print("Quantile Rank Error Bounds:")
+        print(error_bounds)
+        print("\n")
+        for column, table in top_values.items():
+            print(f"Top 20 Values of {column}:")
+            print(table)
+            print("\n")
+        print("Count Error Bounds of the Top Values:")
+        print(count_error_bounds)
+        print("\n")
 
     # Save the statistics to a CSV file:
-    descriptive_stats.to_csv('Descriptive_Statistics.csv')
+    descriptive_stats.to_csv(output_path('Descriptive_Statistics.csv'))
 
 # Part 6: Spatial Distribution
 '''
 This function visualizes the spatial distribution of electric vehicles by creating bar charts to display the number of EVs registered in various cities
 and counties. It also performs geospatial analysis by loading a GeoJSON file containing region boundaries, merging this data with EV information by city,
 and then plotting a map to illustrate the distribution of EVs across different regions.
+The map is drawn per Washington county: the boundaries come from the geometry store (parsed once, cached and simplified), and the EVs are joined to
+them by the county FIPS code of their 2020 census tract.
 '''
 def spatial_distribution_visualization(df):
+    # Count the EVs per County, City and type in one scan (shared with the comparative visualization):
+    prefetch(df, ['County', 'City', 'Electric Vehicle Type'])
+
     # Analyze the spatial distribution of EVs by City:
-    city_counts = df['City'].value_counts()
+    city_counts = value_counts(df, 'City')
 
     # Create a bar plot for the distribution of EVs by City:
     plt.figure(figsize=(12, 8))
@@ -233,10 +385,10 @@ def spatial_distribution_visualization(df):
     plt.ylabel('Number of EVs')
     plt.xticks(rotation=90)
     plt.tight_layout()
-    plt.show()
+    show_figures()
 
     # Analyze the spatial distribution of EVs by County:
-    county_counts = df['County'].value_counts()
+    county_counts = value_counts(df, 'County')
 
     # Create a bar plot for the distribution of EVs by County:
     plt.figure(figsize=(12, 8))
@@ -246,37 +398,34 @@ def spatial_distribution_visualization(df):
     plt.ylabel('Number of EVs')
     plt.xticks(rotation=90)
     plt.tight_layout()
-    plt.show()
+    show_figures()
 
-    # Load GeoJSON file for geographic boundaries:
-    gdf = gpd.read_file("gz_2010_us_040_00_5m.json")
-
-    # Calculate the number of vehicles per area and merge it with GeoDataFrame:
-    city_counts = df.groupby('City').size().reset_index(name='Number_of_EVs')
-    gdf = gdf.merge(city_counts, left_on="NAME", right_on="City", how="left") 
-
-    # Set missing values ​​to 0 for areas with no data:
-    gdf['Number_of_EVs'] = gdf['Number_of_EVs'].fillna(0)
-
-    # Plot the map:
+    # Plot the map (county boundaries from the geometry store, EVs joined by county FIPS code; regions without EVs are set to 0):
     fig, ax = plt.subplots(1, 1, figsize=(15, 10))
-    gdf.plot(column='Number_of_EVs', cmap='viridis', linewidth=0.8, ax=ax, edgecolor='0.8', legend=True)
-    sm = plt.cm.ScalarMappable(cmap='viridis', norm=plt.Normalize(vmin=0, vmax=gdf['Number_of_EVs'].max()))
-    sm._A = []
+    plot_choropleth(df, ax, level='county')
+    ax.set_axis_off()
     plt.title("Electric Vehicle Distribution Across Regions")
-    plt.show()
+    show_figures()
 
 # Part 7: Model Popularity
 '''
 This function delves into the popularity of various EV models by plotting the top 20 most popular EV models in a bar chart, showcasing how their popularity
 has shifted over the years. It illustrates the distribution of different EV types, such as BEV versus PHEV, using both pie and bar charts and tracks the trend
 of each EV type's popularity over time through detailed plots.
+With streaming=True the top 20 models are ranked while reading the CSV file in chunks, in bounded memory (ev_heavy_hitters), instead of from the
+exact counts of every model.
 '''
-def model_popularity_analysis(df):
+def model_popularity_analysis(df, streaming=False, path=DATASET_PATH, chunksize=100_000):
+    # Count the EVs per Model Year, Model and type in one scan (shared with the temporal analysis):
+    prefetch(df, ['Model Year', 'Model', 'Electric Vehicle Type'])
+
     # 1. Top 20 Most Popular EV Models:
 
-    # Analyze the popularity of different EV models:
-    top_20_models = df['Model'].value_counts().head(20)
+    # Analyze the popularity of different EV models (ranked while reading the CSV file in chunks when streaming):
+    if streaming:
+        top_20_models = streaming_top_values(path, ['Model'], 20, chunksize)[0]['Model']['Count']
+    else:
+        top_20_models = value_counts(df, 'Model').head(20)
 
     # Create a bar plot for the top 20 most popular EV models:
     plt.figure(figsize=(12, 8))
@@ -287,15 +436,16 @@ def model_popularity_analysis(df):
     plt.xticks(rotation=45)
     plt.tight_layout()
     plt.legend(title='Model', loc='upper left')
-    plt.show()
+    show_figures()
 
     # 2. Trends in Popularity of Top EV Models Over Years:
     # Filter top models:
-    top_models = df['Model'].value_counts().head(20).index
-    df_top_models = df[df['Model'].isin(top_models)]
+    top_models = top_20_models.index
+    model_year_counts = group_counts(df, ['Model Year', 'Model'])
+    top_model_year_counts = model_year_counts[model_year_counts.index.get_level_values('Model').isin(top_models)]
 
     # Trends in popularity over years:
-    trends_over_years = df_top_models.groupby(['Model Year', 'Model']).size().unstack().fillna(0)
+    trends_over_years = top_model_year_counts.unstack().fillna(0)
 
     # Plotting:
     plt.figure(figsize=(14, 10))
@@ -305,12 +455,12 @@ def model_popularity_analysis(df):
     plt.ylabel('Number of EVs')
     plt.legend(title='Model', loc='upper left')
     plt.tight_layout()
-    plt.show()
+    show_figures()
 
     # 3. Distribution of Electric Vehicle Types:
 
     # Analyze the distribution of EV types:
-    ev_type_distribution = df['Electric Vehicle Type'].value_counts()
+    ev_type_distribution = value_counts(df, 'Electric Vehicle Type')
 
     # Create a figure with two subplots:
     fig, axs = plt.subplots(1, 2, figsize=(16, 6))
@@ -323,12 +473,12 @@ def model_popularity_analysis(df):
     axs[1].set_title('Distribution of Electric Vehicle Types (Bar Chart)')
     # Display the plots:
     plt.tight_layout()
-    plt.show()
+    show_figures()
 
     # 4. Trends in Electric Vehicle Types Over Years:
 
     # Trends in EV types over years:
-    trends_ev_types = df.groupby(['Model Year', 'Electric Vehicle Type']).size().unstack().fillna(0)
+    trends_ev_types = group_counts(df, ['Model Year', 'Electric Vehicle Type']).unstack().fillna(0)
 
     # Plotting:
     plt.figure(figsize=(14, 10))
@@ -338,29 +488,34 @@ def model_popularity_analysis(df):
     plt.ylabel('Number of EVs')
     plt.legend(title='Electric Vehicle Type', loc='upper left')
     plt.tight_layout()
-    plt.show()
+    show_figures()
 
 # Part 8: Investigate the relationship between every pair of numeric features
 '''
 This function explores relationships between numeric features by calculating and printing a correlation matrix for selected numeric features. 
 It then visualizes the matrix with a heatmap to make correlations easier to interpret.
+The correlations come from the correlation engine ("pearson" or "spearman" method), which accumulates all numeric columns in one scan and shares the
+result with the heatmap of Part 9. With streaming=True they are computed while reading the CSV file in chunks (the DataFrame is not used).
 '''
-def correlation_investigation(df):
+def correlation_investigation(df, method='pearson', streaming=False, path=DATASET_PATH, chunksize=100_000):
     # Select the relevant numerical features for correlation analysis:
     numerical_features = ['Postal Code', 'Model Year', 'Electric Range', 'Base MSRP', 'Legislative District', 'DOL Vehicle ID', '2020 Census Tract']
 
     # Calculate the correlation matrix:
-    correlation_matrix = df[numerical_features].corr()
+    if streaming:
+        correlations = streaming_correlation_matrix(path, numerical_features, method, chunksize)
+    else:
+        correlations = correlation_matrix(df, numerical_features, method)
 
     print("\n\n\nCorrelation Matrix:")
-    print(correlation_matrix)
+    print(correlations)
     print("\n")
 
     # Create a heatmap to visualize correlations:
     plt.figure(figsize=(12, 8))
-    sns.heatmap(correlation_matrix, annot=True, cmap='coolwarm', linewidths=0.5)
-    plt.title('Correlation Matrix of Numeric Features')
-    plt.show()
+    sns.heatmap(correlations, annot=True, cmap='coolwarm', linewidths=0.5)
+    plt.title('Correlation Matrix of Numeric Features' if method == 'pearson' else f'{method.title()} Correlation Matrix of Numeric Features')
+    show_figures()
 
 ###############################################################################
 
@@ -373,18 +528,18 @@ def correlation_investigation(df):
 This function generates various plots to examine feature relationships, including a Correlation Heatmap for numeric features, a Boxplot 
 of Base MSRP by EV Type, a Scatter Plot of Electric Range versus Base MSRP, a Histogram depicting the distribution of Electric Range,
  a Count Plot for the number of EVs by type, and a Pair Plot to visualize pairwise relationships among selected numeric features.
+Above "density_threshold" rows the Scatter Plot and the Pair Plot are drawn as binned densities, so their drawing time does not grow with the data.
 '''
-def data_exploration_visualizations(df):
+def data_exploration_visualizations(df, density_threshold=DENSITY_ROW_THRESHOLD):
     # Set general style for the plots:
     sns.set(style="whitegrid")
 
     # 1. Correlation Heatmap - only include numerical columns:
     plt.figure(figsize=(10, 8))
-    numerical_df = df.select_dtypes(include=['float64', 'int64'])  # Select only numeric columns
-    correlation_matrix = numerical_df.corr()
-    sns.heatmap(correlation_matrix, annot=True, cmap="coolwarm", square=True)
+    correlations = correlation_matrix(df)  # All numeric columns, shared with Part 8
+    sns.heatmap(correlations, annot=True, cmap="coolwarm", square=True)
     plt.title("Correlation Heatmap")
-    plt.show()
+    show_figures()
 
     # 2. Boxplot for Base MSRP by Electric Vehicle Type:
     plt.figure(figsize=(10, 6))
@@ -393,16 +548,16 @@ def data_exploration_visualizations(df):
     plt.xlabel('Electric Vehicle Type')
     plt.ylabel('Base MSRP')
     plt.xticks(rotation=45, ha='right')
-    plt.show()
+    show_figures()
 
     # 3. Scatter Plot for Electric Range vs. Base MSRP:
     plt.figure(figsize=(10, 6))
-    sns.scatterplot(data=df, x='Electric Range', y='Base MSRP', hue='Electric Vehicle Type', palette='viridis', alpha=0.6)
+    scatter_or_density(df, x='Electric Range', y='Base MSRP', hue='Electric Vehicle Type', palette='viridis',
+                       threshold=density_threshold, alpha=0.6)
     plt.title('Electric Range vs. Base MSRP')
     plt.xlabel('Electric Range')
     plt.ylabel('Base MSRP')
-    plt.legend(title='Electric Vehicle Type', bbox_to_anchor=(1.05, 1), loc='upper left')
-    plt.show()
+    show_figures()
 
     # 4. Histogram for Distribution of Electric Range:
     plt.figure(figsize=(10, 6))
@@ -410,7 +565,7 @@ def data_exploration_visualizations(df):
     plt.title('Distribution of Electric Range')
     plt.xlabel('Electric Range')
     plt.ylabel('Frequency')
-    plt.show()
+    show_figures()
 
     # 5. Count Plot for Electric Vehicles by Type:
     plt.figure(figsize=(8, 6))
@@ -419,67 +574,65 @@ def data_exploration_visualizations(df):
     plt.xlabel('Electric Vehicle Type')
     plt.ylabel('Count')
     plt.xticks(rotation=45, ha='right')
-    plt.show()
+    show_figures()
 
     # 6. Pair Plot for Selected Features - again only select numerical columns:
     selected_features = ['Base MSRP', 'Electric Range', 'Model Year']
-    sns.pairplot(df[selected_features].select_dtypes(include=['float64', 'int64']), plot_kws={'alpha': 0.5})
+    numeric_features = list(df[selected_features].select_dtypes(include='number').columns)
+    pairplot_or_density(df, numeric_features, threshold=density_threshold, plot_kws={'alpha': 0.5})
     plt.suptitle('Scatter Plot Matrix of Selected Features', y=1.02)
-    plt.show()
+    show_figures()
 
 # Part 10: Comparative Visualization
 '''
 This function generates comparative visualizations across various locations by creating bar charts that highlight the top cities and counties with
 the highest number of EVs. Additionally, it produces stacked bar charts to visualize the distribution of different EV types within each city and county,
 thus facilitating comparisons of EV types across various locations.
+With streaming=True the top 20 cities and counties are ranked while reading the CSV file in chunks, in bounded memory (ev_heavy_hitters).
 '''
-def comparative_visualization(df):
+def comparative_visualization(df, streaming=False, path=DATASET_PATH, chunksize=100_000):
     # Set general style for the plots:
     sns.set(style="whitegrid")
 
+    # Count the EVs per County, City and type in one scan (shared with the spatial distribution):
+    prefetch(df, ['County', 'City', 'Electric Vehicle Type'])
+
+    # Select the top 20 cities and counties with the most EVs (ranked while reading the CSV file in chunks when streaming):
+    if streaming:
+        top_values, _ = streaming_top_values(path, ['City', 'County'], 20, chunksize)
+        top_cities, top_counties = top_values['City']['Count'], top_values['County']['Count']
+    else:
+        top_cities, top_counties = value_counts(df, 'City').nlargest(20), value_counts(df, 'County').nlargest(20)
+
     # 1. Bar Chart for EV Distribution Across Cities:
     plt.figure(figsize=(14, 8))
-    top_cities = df['City'].value_counts().nlargest(20)  # Select top 20 cities with the most EVs
-    sns.barplot(x=top_cities.index, y=top_cities.values, palette="Blues_d")
+    sns.barplot(x=top_cities.index.astype(str), y=top_cities.values, palette="Blues_d")
     plt.title('Top 20 Cities with Most Electric Vehicles')
     plt.xlabel('City')
     plt.ylabel('Number of Electric Vehicles')
     plt.xticks(rotation=45, ha='right')
-    plt.show()
+    show_figures()
 
     # 2. Bar Chart for EV Distribution Across Counties:
     plt.figure(figsize=(14, 8))
-    top_counties = df['County'].value_counts().nlargest(20)  # Select top 20 counties with the most EVs
-    sns.barplot(x=top_counties.index, y=top_counties.values, palette="Greens_d")
+    sns.barplot(x=top_counties.index.astype(str), y=top_counties.values, palette="Greens_d")
     plt.title('Top 20 Counties with Most Electric Vehicles')
     plt.xlabel('County')
     plt.ylabel('Number of Electric Vehicles')
     plt.xticks(rotation=45, ha='right')
-    plt.show()
+    show_figures()
 
-    # 3. Stacked Bar Chart for EV Distribution Across All Cities by Vehicle Type:
-    plt.figure(figsize=(14, 20))  # Adjust height for better readability if there are many cities
-    city_type_data = df.groupby(['City', 'Electric Vehicle Type']).size().unstack(fill_value=0)
-    city_type_data.plot(kind='bar', stacked=True, figsize=(14, 20), colormap="viridis")
-    plt.title('Distribution of Electric Vehicle Types Across All Cities')
-    plt.xlabel('City')
-    plt.ylabel('Number of Electric Vehicles')
-    plt.xticks(rotation=45, ha='right')
-    plt.legend(title='Electric Vehicle Type', bbox_to_anchor=(1.05, 1), loc='upper left')  # Adjust legend position
-    plt.tight_layout()
-    plt.show()
+    # 3. Stacked Bar Chart for EV Distribution Across All Cities by Vehicle Type (paged, biggest cities first, when there are many cities):
+    city_type_data = group_counts(df, ['City', 'Electric Vehicle Type']).unstack(fill_value=0)
+    city_plot = {'title': 'Distribution of Electric Vehicle Types Across All Cities', 'xlabel': 'City', 'ylabel': 'Number of Electric Vehicles',
+                 'legend_title': 'Electric Vehicle Type', 'colormap': 'viridis', 'figsize': (14, 20)}
+    show_cached_figures(city_type_data, {'plot': 'stacked_bars', **city_plot}, lambda: stacked_bars(city_type_data, **city_plot))
 
-    # 4. Stacked Bar Chart for EV Distribution Across All Counties by Vehicle Type:
-    plt.figure(figsize=(14, 20))  # Adjust height for better readability if there are many counties
-    county_type_data = df.groupby(['County', 'Electric Vehicle Type']).size().unstack(fill_value=0)
-    county_type_data.plot(kind='bar', stacked=True, figsize=(14, 20), colormap="plasma")
-    plt.title('Distribution of Electric Vehicle Types Across All Counties')
-    plt.xlabel('County')
-    plt.ylabel('Number of Electric Vehicles')
-    plt.xticks(rotation=45, ha='right')
-    plt.legend(title='Electric Vehicle Type', bbox_to_anchor=(1.05, 1), loc='upper left')  # Adjust legend position
-    plt.tight_layout()
-    plt.show()
+    # 4. Stacked Bar Chart for EV Distribution Across All Counties by Vehicle Type (paged, biggest counties first, when there are many counties):
+    county_type_data = group_counts(df, ['County', 'Electric Vehicle Type']).unstack(fill_value=0)
+    county_plot = {'title': 'Distribution of Electric Vehicle Types Across All Counties', 'xlabel': 'County', 'ylabel': 'Number of Electric Vehicles',
+                   'legend_title': 'Electric Vehicle Type', 'colormap': 'plasma', 'figsize': (14, 20)}
+    show_cached_figures(county_type_data, {'plot': 'stacked_bars', **county_plot}, lambda: stacked_bars(county_type_data, **county_plot))
 
 ###############################################################################
 
@@ -492,13 +645,26 @@ def comparative_visualization(df):
 This function examines trends in EV adoption over time by plotting a time series that displays the number of EVs registered each year, showcasing the popularity
 trends of different EV models through visualizations of registration numbers over time. Additionally, it creates a stacked bar chart to illustrate the evolving
 popularity of specific models over the years.
+The yearly counts of every model, make, EV type and county are gathered in a sparse temporal cube (ev_temporal_cube), from which the adoption metrics
+of all the series (YoY growth, cumulative registrations, share of the year and rolling mean) are computed at once, printed with the top movers of the
+latest model year, and saved to a CSV file.
 '''
 def temporal_analysis(df):
-    # Ensure 'Model Year' is treated as a numeric feature:
-    df['Model Year'] = pd.to_numeric(df['Model Year'], errors='coerce')
+    # Ensure 'Model Year' is treated as a numeric feature (converted on a copy, so the shared dataset and the counts cached for it are untouched):
+    if not pd.api.types.is_numeric_dtype(df['Model Year']):
+        df = df.assign(**{'Model Year': pd.to_numeric(df['Model Year'], errors='coerce')})
+
+    # Count the EVs per Model Year, Model and type in one scan (shared with the model popularity analysis), and per Model Year, Make and County
+    # in another, then gather the yearly counts of every model, make, type and county in one sparse cube:
+    prefetch(df, ['Model Year', 'Model', 'Electric Vehicle Type'])
+    prefetch(df, ['Model Year', 'Make', 'County'])
+    cube = build_cube(df)
+    if cube.is_empty():
+        print("\nNo registrations with a model year in the data: there are no trends to analyze.")
+        return
 
     # 1. Analyze the EV adoption rates over time:
-    ev_adoption = df.groupby('Model Year').size()
+    ev_adoption = group_counts(df, ['Model Year'])
 
     # Plotting the EV adoption rates over time:
     plt.figure(figsize=(12, 6))
@@ -508,34 +674,41 @@ def temporal_analysis(df):
     plt.ylabel('Number of EVs')
     plt.grid(True)
     plt.tight_layout()
-    plt.show()
+    show_figures()
 
     # 2. Analyze the popularity of all EV models over time:
-    model_popularity = df.groupby(['Model Year', 'Model']).size().unstack().fillna(0)
+    model_popularity = cube.table('Model')
 
-    # Plotting the popularity of all EV models over time:
-    plt.figure(figsize=(14, 8))
-    model_popularity.plot(kind='line', marker='o', colormap='tab20')
-    plt.title('Trends in Popularity of All EV Models Over Time')
-    plt.xlabel('Model Year')
-    plt.ylabel('Number of EVs')
-    plt.legend(title='Model', bbox_to_anchor=(1.05, 1), loc='upper left', ncol=2)
-    plt.grid(True)
-    plt.tight_layout()
-    plt.show()
+    # Plotting the popularity of all EV models over time (the top models and "Other" when there are many models):
+    trend_plot = {'title': 'Trends in Popularity of All EV Models Over Time', 'xlabel': 'Model Year', 'ylabel': 'Number of EVs',
+                  'legend_title': 'Model', 'colormap': 'tab20'}
+    show_cached_figures(model_popularity, {'plot': 'count_lines', **trend_plot}, lambda: count_lines(model_popularity, **trend_plot))
 
     # 3. Spatial Distribution of EVs by City:
 
     # Plotting the popularity of top EV models over time as a bar chart:
-    colors = sns.color_palette('tab20', len(model_popularity.columns)) 
-    model_popularity.T.plot(kind='bar', stacked=True, figsize=(14, 8), color=colors) 
-    plt.title('Model Popularity Over the Years') 
-    plt.xlabel('Model Year') 
-    plt.ylabel('Number of Vehicles') 
-    plt.legend(title='Model', bbox_to_anchor=(1.05, 1), loc='upper left', ncol=1) 
-    plt.xticks(rotation=45) 
-    plt.tight_layout() 
-    plt.show()
+    bar_plot = {'title': 'Model Popularity Over the Years', 'xlabel': 'Model Year', 'ylabel': 'Number of Vehicles', 'legend_title': 'Model',
+                'colormap': 'tab20'}
+    show_cached_figures(model_popularity.T, {'plot': 'stacked_bars', **bar_plot}, lambda: stacked_bars(model_popularity.T, **bar_plot))
+
+    # 4. Adoption metrics of every model, make, EV type and county (YoY growth, cumulative registrations, share of the year, rolling mean):
+    adoption_metrics = cube.metrics()
+    print("\n\n\nAdoption Metrics by Electric Vehicle Type:")
+    print(adoption_metrics.loc['Electric Vehicle Type'])
+    # The top movers compare the latest model year with the year before, so they need at least two years:
+    latest_year = cube.years[-1]
+    if len(cube.years) < 2:
+        print(f"\nThe data only covers the model year {latest_year}: there are no top movers to compare with a year before.")
+    else:
+        print(f"\nMakes with the Largest Change in Registrations in {latest_year}:")
+        print(cube.top_movers('Make', latest_year))
+        print(f"\nFastest Growing Models in {latest_year}:")
+        print(cube.top_movers('Model', latest_year, by='growth'))
+        print(f"\nCounties with the Largest Change of Share in {latest_year}:")
+        print(cube.top_movers('County', latest_year, by='share'))
+
+    # Save the metrics of every series to a CSV file:
+    adoption_metrics.to_csv(output_path('Temporal_Metrics.csv'))
 
 ################################################################################
 
@@ -543,6 +716,102 @@ def temporal_analysis(df):
  
 ################################################################################
 
+# Analysis of each menu option (part number -> title and function):
+ANALYSES = {
+    '1': ('Document Missing Values', document_missing_values),
+    '2': ('Missing Value Strategies', apply_missing_value_strategies),
+    '3': ('Feature Encoding', feature_encoding),
+    '4': ('Normalization', normalization),
+    '5': ('Descriptive Statistics', descriptive_statistics),
+    '6': ('Spatial Distribution', spatial_distribution_visualization),
+    '7': ('Model Popularity', model_popularity_analysis),
+    '8': ('Investigate Relationships', correlation_investigation),
+    '9': ('Data Exploration Visualizations', data_exploration_visualizations),
+    '10': ('Comparative Visualization', comparative_visualization),
+    '11': ('Temporal Analysis', temporal_analysis),
+}
+
+# Columns each part reads (None: all columns, for the parts that report on every column):
+NUMERIC_COLUMNS = ['Postal Code', 'Model Year', 'Electric Range', 'Base MSRP', 'Legislative District', 'DOL Vehicle ID', '2020 Census Tract']
+ANALYSIS_COLUMNS = {
+    '1': None,
+    '2': None,
+    '3': None,
+    '4': ['Model Year', 'Electric Range', 'Base MSRP', 'DOL Vehicle ID'],
+    '5': ['Model Year', 'Electric Range', 'Base MSRP'],
+    '6': ['County', 'City', 'Electric Vehicle Type', '2020 Census Tract'],
+    '7': ['Model Year', 'Model', 'Electric Vehicle Type'],
+    '8': NUMERIC_COLUMNS,
+    '9': NUMERIC_COLUMNS + ['Electric Vehicle Type'],
+    '10': ['County', 'City', 'Electric Vehicle Type'],
+    '11': ['Model Year', 'Model', 'Make', 'Electric Vehicle Type', 'County'],
+}
+
+'''
+This function loads the columns the part reads (see ANALYSIS_COLUMNS) and runs the part on them. With a filter dictionary (for example
+{'County': 'King', 'Model Year': (2020, None)}) only the matching rows are loaded, from the SQLite store, and the counts of the part are computed
+by the database. It is the entry point of the stand-alone Part scripts, so every part has a single implementation, shared with the menu and the
+batch runner.
+'''
+def run_analysis(part, path=DATASET_PATH, filters=None):
+    function = ANALYSES[part][1]
+    function(load_columns(path, ANALYSIS_COLUMNS[part], filters))
+
+# Directory of the figures and printed output of the parts run in parallel from the menu:
+PARALLEL_OUTPUT_DIR = 'report'
+
+'''
+This function turns a menu choice into the parts to run in parallel: "all", or part numbers separated by commas (for example "5,7,10"). It returns
+None when the choice is not such a list.
+'''
+def parallel_choice(choice):
+    if choice.strip().lower() == 'all':
+        return list(ANALYSES)
+    if ',' not in choice:
+        return None
+    parts = []
+    for part in (value.strip() for value in choice.split(',') if value.strip()):
+        if part not in ANALYSES:
+            return None
+        if part not in parts:
+            parts.append(part)
+    return parts or None
+
+'''
+This function displays figures that were saved as image files by a worker process (or only lists them when the figures of this process are saved
+to files as well).
+'''
+def show_saved_figures(files):
+    for path in files:
+        print(f"Figure: {path}")
+        if FIGURE_OUTPUT['directory'] is None:
+            show_image(path)
+    if files and FIGURE_OUTPUT['directory'] is None:
+        show_figures()
+
+'''
+This function runs several parts at once in a pool of worker processes (ev_batch_runner) and then reports them in the order of the parts: the
+printed output of each part, its error if it failed (the other parts still run), and its figures. The workers are started fresh ("forkserver" or
+"spawn", since forking a process that runs a GUI backend is not safe), render their figures with the non-GUI backend, and map the columns they
+need from the memory-mapped column store instead of receiving a pickled copy of the DataFrame.
+'''
+def run_parts_in_parallel(parts, filters=None, output_dir=PARALLEL_OUTPUT_DIR):
+    # (imported here because the batch runner imports this module)
+    from ev_batch_runner import run_parts
+
+    start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    results = run_parts(parts, output_dir, ('png',), None, DATASET_PATH, filters, start_method)
+
+    for result in results:
+        print(f"\n\n\n===== Part {result['part']}: {result['title']} ({result['status']}, {result['seconds']:.2f}s) =====")
+        log_path = os.path.join(output_dir, f"part{int(result['part']):02d}.log")
+        if os.path.exists(log_path):
+            with open(log_path, encoding='utf-8') as log:
+                print(log.read())
+        if result['error']:
+            print(result['error'])
+        show_saved_figures(result['files'])
+
 '''
 This function displays a menu of analysis options for the user, each corresponding to one of the main parts of the analysis.
 '''
@@ -559,26 +828,48 @@ def display_menu():
         print("9. Data Exploration Visualizations")
         print("10. Comparative Visualization")
         print("11. Temporal Analysis")
-        print("\nNote: if you want to exit, press 0.\n")
+        print("\nTo run several parts in parallel, enter 'all' or part numbers separated by commas (for example 5,7,10).")
+        print("Note: if you want to exit, press 0.\n")
 
 # Main function
 '''
 The process begins with data loading, where the dataset is read into a DataFrame. The user interface then continuously prompts the user to choose an analysis option
 from the menu, calling the appropriate function based on the user's selection. This loop continues until the user decides to exit by entering "0".
+With a profile directory every chosen part is profiled (wall and CPU time, peak memory, compute / rendering / I/O split) and logged there, with a
+cProfile dump per part when cprofile is True. With a filter dictionary every part runs on the matching rows only (see run_analysis()).
+The columns are loaded on demand by a DatasetSession: each choice reads only the columns its part needs that earlier choices did not load.
 '''
-def main():
+def main(profile_directory=None, cprofile=False, filters=None):
 
     #display the menue and ask the user to choose the part he need to execute:
     display_menu()
     choice = input("Choose the part you want to execute (1-11): ")
 
-    # Load the dataset:
-    url = 'Electric_Vehicle_Population_Data.csv' 
-    # Read the CSV file into a pandas DataFrame:
-    df = pd.read_csv(url)
+    # Columns of the dataset (or of the rows matching the filter), loaded with their declared schema as the chosen parts need them:
+    session = DatasetSession(DATASET_PATH, filters)
     
     while(choice != '0'):
 
+        # Run several parts in parallel when asked:
+        parts = parallel_choice(choice)
+        if parts is not None:
+            run_parts_in_parallel(parts, filters)
+            display_menu()
+            choice = input("Choose the part you want to execute (1-11): ")
+            continue
+
+        # Load the columns of the chosen part that are not loaded yet:
+        if choice in ANALYSES:
+            df = session.load(ANALYSIS_COLUMNS[choice])
+
+        # Profile the chosen part when asked:
+        if profile_directory is not None and choice in ANALYSES:
+            title, function = ANALYSES[choice]
+            print_record(profile_part(choice, title, function, df, profile_directory, cprofile))
+            display_menu()
+            choice = input("Choose the part you want to execute (1-11): ")
+            continue
+
         match choice:
             case '1':
                 document_missing_values(df)
@@ -603,7 +894,7 @@ def main():
             case '11':
                 temporal_analysis(df)
             case _:
-                print("Invalid choice. Please select a number between 1 and 10.")
+                print("Invalid choice. Please select a number between 1 and 11, 'all', or part numbers separated by commas.")
 
         #display the menue and ask the user to choose the part he need to execute:
         display_menu()
@@ -613,4 +904,14 @@ def main():
 
 # Run the main function
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Electric Vehicle Population Data Analysis')
+    parser.add_argument('--profile', metavar='DIRECTORY', default=None, help='profile every chosen part and log the results to DIRECTORY')
+    parser.add_argument('--cprofile', action='store_true', help='with --profile, also write a cProfile dump per part')
+    parser.add_argument('--filter', nargs='+', default=[], help='run the parts on the matching rows only: COLUMN=VALUE, COLUMN=VALUE1,VALUE2 '
+                        'or COLUMN=LOW..HIGH (for example County=King "Model Year=2020..")')
+    args = parser.parse_args()
+    try:
+        filters = parse_filters(args.filter)
+    except ValueError as error:
+        parser.error(str(error))
+    main(args.profile, args.cprofile, filters)
\ No newline at end of file
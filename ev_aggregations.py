@@ -0,0 +1,177 @@
+'''
+Shared Aggregations:
+
+Overview:
+     Several analyses compute the same counts again and again (City and County value counts, Model Year x Model and Model Year x Electric Vehicle
+     Type group sizes, ...). This module answers those counts from a memo cache keyed by (dataset version, group keys, filter). A group-by over
+     several columns is computed once and the coarser counts are rolled up from it without scanning the rows again, so prefetch() can prepare all
+     the counts of an analysis in a single scan. The dataset version comes from ev_data_loader.get_dataset_version() (set by load_dataset), so a
+     new release of the file never reuses old results. Only the DataFrame the version was set on has it: copies (filtered, or with a column
+     assigned) are counted directly and never cached. invalidate() drops the cached results of a dataset explicitly, for example after it was
+     modified in place (ev_data_loader.clear_dataset_version() then removes its version).
+
+     Filters are dictionaries {column: condition}, where the condition is a single value, a list of values, or a (low, high) tuple for an
+     inclusive range (either bound may be None), for example {'County': 'King', 'Model Year': (2020, None)}.
+     For a DataFrame loaded from the SQLite store (ev_sqlite_store.load_subset) the scans are GROUP BY queries answered by the database instead.
+'''
+
+# Import necessary libraries:
+from collections import OrderedDict    # for the least recently used cache
+import pandas as pd                    # for data manipulation
+from ev_data_loader import get_dataset_version   # for the version of the data held by a DataFrame
+from ev_sqlite_store import database_counts   # for counting the rows of a subset in the SQLite store
+
+# Maximum number of cached results:
+CACHE_SIZE = 256
+
+# Cached results: (dataset version, group keys, filter key, handling of missing keys) -> counts:
+_CACHE = OrderedDict()
+
+###############################################################################
+
+#                                Cache Keys                                   #
+
+###############################################################################
+
+'''
+This function returns the version of the data held by a DataFrame, or None when it has none (for example a filtered or modified copy of a
+loaded DataFrame): the results of such DataFrames are not cached, since nothing tells whether their data has changed since.
+'''
+def dataset_version(df):
+    return get_dataset_version(df)
+
+'''
+This function turns a filter dictionary into a hashable key that does not depend on the order of its entries.
+'''
+def filter_key(filters):
+    if not filters:
+        return ()
+    key = []
+    for column, condition in sorted(filters.items()):
+        if isinstance(condition, list):
+            condition = ('in',) + tuple(sorted(condition, key=str))
+        elif isinstance(condition, tuple):
+            condition = ('range',) + condition
+        key.append((column, condition))
+    return tuple(key)
+
+'''
+This function returns the rows of a DataFrame that satisfy a filter dictionary.
+'''
+def apply_filters(df, filters):
+    if not filters:
+        return df
+    mask = pd.Series(True, index=df.index)
+    for column, condition in filters.items():
+        if isinstance(condition, list):
+            mask &= df[column].isin(condition)
+        elif isinstance(condition, tuple):
+            low, high = condition
+            if low is not None:
+                mask &= df[column] >= low
+            if high is not None:
+                mask &= df[column] <= high
+        else:
+            mask &= df[column] == condition
+    return df[mask.fillna(False).astype(bool)]
+
+'''
+This function counts the rows of every combination of some columns with one scan. Rows loaded from the SQLite store (as long as the DataFrame still
+holds all of them) are counted by the database, with its filter and the given one pushed down as SQL; other DataFrames are counted by pandas.
+'''
+def scan_counts(df, keys, filters=None, dropna=True):
+    if 'sqlite_database' in df.attrs and dataset_version(df) is not None:
+        return database_counts(df.attrs['sqlite_database'], keys, [df.attrs['sqlite_filters'], filters], dropna)
+    return apply_filters(df, filters).groupby(keys, observed=True, dropna=dropna).size()
+
+###############################################################################
+
+#                                 Cached Counts                               #
+
+###############################################################################
+
+# Store a result, dropping the least recently used ones beyond CACHE_SIZE:
+def _store(key, counts):
+    _CACHE[key] = counts
+    _CACHE.move_to_end(key)
+    while len(_CACHE) > CACHE_SIZE:
+        _CACHE.popitem(last=False)
+
+'''
+This function rolls counts grouped by some columns up to a subset of those columns (rows with a missing value in the kept columns are dropped,
+like groupby().size() does).
+'''
+def roll_up(counts, keys):
+    rolled = counts.groupby(level=list(keys), observed=True, dropna=True).sum()
+    return rolled.astype('int64')
+
+'''
+This function computes the number of rows of every combination of several columns in one scan and caches it. Missing values are kept as their own
+group here, so that every coarser count can later be rolled up from this one exactly. A DataFrame without a version is scanned every time.
+'''
+def prefetch(df, keys, filters=None):
+    keys = list(keys)
+    if dataset_version(df) is None:
+        return scan_counts(df, keys, filters, dropna=False)
+    key = (dataset_version(df), tuple(keys), filter_key(filters), 'with-missing')
+    if key not in _CACHE:
+        _store(key, scan_counts(df, keys, filters, dropna=False))
+    _CACHE.move_to_end(key)
+    return _CACHE[key]
+
+'''
+This function stores counts computed elsewhere (for example kept up to date by ev_incremental) as the prefetched group-by of a DataFrame. The counts
+must include missing values as their own group, like prefetch() does, so the coarser counts can be rolled up from them. Nothing is stored for a
+DataFrame without a version.
+'''
+def store_counts(df, keys, counts, filters=None):
+    if dataset_version(df) is None:
+        return
+    _store((dataset_version(df), tuple(keys), filter_key(filters), 'with-missing'), counts)
+
+'''
+This function returns the number of rows of every combination of the given columns (the same result as df.groupby(keys, observed=True).size()).
+It is answered from the cache when possible: first the exact result, then a roll-up of a prefetched group-by over the same or more columns of the
+same data and filter, and only otherwise a new scan of the rows.
+'''
+def group_counts(df, keys, filters=None):
+    keys = list(keys)
+    version, filters_key = dataset_version(df), filter_key(filters)
+    if version is None:
+        return scan_counts(df, keys, filters)
+    key = (version, tuple(keys), filters_key, 'without-missing')
+    if key in _CACHE:
+        _CACHE.move_to_end(key)
+        return _CACHE[key].copy()
+
+    # Roll up from a prefetched group-by over the same or more columns:
+    for cached_key, cached in reversed(_CACHE.items()):
+        if cached_key[3] == 'with-missing' and cached_key[0] == version and cached_key[2] == filters_key and set(keys) <= set(cached_key[1]):
+            counts = roll_up(cached, keys)
+            break
+    else:
+        counts = scan_counts(df, keys, filters)
+
+    _store(key, counts)
+    return counts.copy()
+
+'''
+This function returns the counts of the values of one column sorted from the most to the least frequent, like df[column].value_counts().
+'''
+def value_counts(df, column, filters=None):
+    counts = group_counts(df, [column], filters)
+    counts.index.name = column
+    return counts.sort_values(ascending=False, kind='stable').rename('count')
+
+'''
+This function drops the cached results of one dataset (or all cached results when no DataFrame is given).
+'''
+def invalidate(df=None):
+    if df is None:
+        _CACHE.clear()
+        return
+    version = dataset_version(df)
+    if version is None:
+        return
+    for key in [key for key in _CACHE if key[0] == version]:
+        del _CACHE[key]
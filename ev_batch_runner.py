@@ -0,0 +1,209 @@
+'''
+Headless Batch Runner:
+
+Overview:
+     This script runs the analyses of the menu without any user interaction, for example as a nightly report on a server without a display.
+     It selects the non-GUI "Agg" matplotlib backend, loads the dataset once, and runs the requested parts (1-11 or "all") in a process pool.
+     Every figure is saved to the output directory as part<NN>_<number>.<format> (PNG and/or SVG) and the printed output of each part goes to
+     part<NN>.log. The workers are forked from the process that loaded the dataset, so they share its memory instead of reading the CSV again.
+     With another start method (the only ones on platforms without fork, and the one the interactive menu uses, since forking a process that
+     runs a GUI backend is not safe) the dataset is never pickled to the workers: each worker memory-maps the columns it needs from the column
+     store of ev_column_store, so all workers share one copy of the data through the page cache.
+     The results come back in the order the parts were requested, and a failing part never stops the others: exceptions are reported with the
+     part, and a part whose worker process died is run again on its own, so only that part is reported as failed.
+
+Usage:
+     python ev_batch_runner.py all --output-dir report --formats png svg --workers 4
+     python ev_batch_runner.py 5 7 10
+'''
+
+# Import necessary libraries:
+import argparse                        # for the command line interface
+import contextlib                      # for redirecting the output of each part
+import json                            # for the run summary
+import multiprocessing                 # for the process pool start method
+import os                              # for output paths
+import time                            # for timing each part
+import traceback                       # for reporting failed parts
+import sys                             # for checking whether pyplot is loaded
+from concurrent.futures import ProcessPoolExecutor   # for running parts in parallel
+from concurrent.futures.process import BrokenProcessPool   # for detecting worker processes that died
+
+from assignment1_1212214 import ANALYSES, ANALYSIS_COLUMNS, FIGURE_OUTPUT   # for the analyses, their columns and where their figures go
+from ev_data_loader import DATASET_PATH                   # for the default dataset
+from ev_column_store import build_column_store, load_column_store   # for sharing the dataset with workers that are not forked
+from ev_session import load_columns, union_columns                  # for loading only the columns the requested parts read
+from ev_lazy_imports import lazy_import                             # for importing matplotlib only when the headless backend is selected
+
+# matplotlib, imported on first use (text-only parts never load it):
+matplotlib = lazy_import('matplotlib')
+
+# Dataset shared by the parts run in this process (set before the pool forks its workers):
+_DATASET = None
+
+###############################################################################
+
+#                                  Running Parts                              #
+
+###############################################################################
+
+'''
+This function selects the non-GUI "Agg" backend, so figures are only rendered to files. It is called by the command line and by every worker
+(not at import, so the interactive menu can import this module and keep its own backend).
+'''
+def use_headless_backend():
+    matplotlib.use('Agg')
+
+'''
+This function prepares a worker process: with the fork start method the dataset loaded by the parent is already there; otherwise the worker maps
+the columns it needs from the column store of the dataset (written by the parent), which costs no parsing and no private copy of the data. For a
+filtered subset the worker reads the matching rows from the SQLite store instead.
+'''
+def init_worker(path, columns=None, filters=None):
+    global _DATASET
+    use_headless_backend()
+    if _DATASET is None:
+        _DATASET = load_columns(path, columns, filters) if filters else load_column_store(path, columns)
+
+'''
+This function runs one part on the shared dataset, saving its figures and its printed output in the output directory. Errors are caught and
+returned with the result, so a failing part never stops the other parts. FIGURE_OUTPUT is restored afterwards, so a part run in the process of
+the interactive menu does not change where the menu's own figures go.
+'''
+def run_part(part, output_dir, formats):
+    title, function = ANALYSES[part]
+    prefix = f"part{int(part):02d}"
+    previous_output = dict(FIGURE_OUTPUT)
+    FIGURE_OUTPUT.update(directory=output_dir, prefix=prefix, formats=tuple(formats), count=0, files=[])
+
+    # Run the analysis with its printed output going to a log file:
+    start = time.perf_counter()
+    status, error = 'ok', None
+    try:
+        with open(os.path.join(output_dir, prefix + '.log'), 'w', encoding='utf-8') as log, contextlib.redirect_stdout(log):
+            function(_DATASET)
+    except Exception:
+        status, error = 'failed', traceback.format_exc()
+    finally:
+        if 'matplotlib.pyplot' in sys.modules:
+            sys.modules['matplotlib.pyplot'].close('all')
+
+    result = {'part': part, 'title': title, 'status': status, 'seconds': round(time.perf_counter() - start, 3),
+              'figures': FIGURE_OUTPUT['count'], 'files': FIGURE_OUTPUT['files'], 'error': error}
+    FIGURE_OUTPUT.clear()
+    FIGURE_OUTPUT.update(previous_output)
+    return result
+
+'''
+This function returns the result of a part that could not report one itself (its worker process died, or the result could not be sent back).
+'''
+def failed_result(part, error):
+    return {'part': part, 'title': ANALYSES[part][0], 'status': 'failed', 'seconds': 0.0, 'figures': 0, 'files': [], 'error': error}
+
+'''
+This function runs one part in a process pool of its own, so that a crash of its worker process only fails this part.
+'''
+def run_isolated(part, output_dir, formats, context, initargs):
+    try:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context, initializer=init_worker, initargs=initargs) as pool:
+            return pool.submit(run_part, part, output_dir, formats).result()
+    except Exception:
+        return failed_result(part, traceback.format_exc())
+
+'''
+This function runs the requested parts (on the rows matching "filters", when given) and returns their results in the order the parts were
+requested. With one worker the parts run in this process. Otherwise they are distributed over a process pool: forked workers share the dataset
+loaded here, and workers started in any other way ("spawn", "forkserver") attach to the column store. The start method defaults to fork where
+available.
+'''
+def run_parts(parts, output_dir='report', formats=('png',), workers=None, path=DATASET_PATH, filters=None, start_method=None):
+    global _DATASET
+    os.makedirs(output_dir, exist_ok=True)
+    workers = workers or min(len(parts), os.cpu_count() or 1)
+    methods = multiprocessing.get_all_start_methods()
+    start_method = start_method or ('fork' if 'fork' in methods else 'spawn')
+    columns = union_columns(ANALYSIS_COLUMNS[part] for part in parts)
+
+    # Load the columns the parts read once, before any worker is started (or write the column store the workers will map):
+    if workers == 1 or start_method == 'fork':
+        _DATASET = load_columns(path, columns, filters)
+    elif not filters:
+        build_column_store(path)
+
+    if workers == 1:
+        return [run_part(part, output_dir, formats) for part in parts]
+
+    context = multiprocessing.get_context(start_method)
+    initargs = (path, columns, filters)
+    results, crashed = {}, []
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=init_worker, initargs=initargs) as pool:
+        futures = {part: pool.submit(run_part, part, output_dir, formats) for part in parts}
+        for part, future in futures.items():
+            try:
+                results[part] = future.result()
+            except BrokenProcessPool:
+                crashed.append(part)
+            except Exception:
+                results[part] = failed_result(part, traceback.format_exc())
+
+    # A dead worker breaks the whole pool, so the parts it took down are run again one by one:
+    for part in crashed:
+        results[part] = run_isolated(part, output_dir, formats, context, initargs)
+
+    return [results[part] for part in parts]
+
+'''
+This function expands the parts given on the command line ("all" or part numbers) into a list of menu options.
+'''
+def parse_parts(values):
+    if any(value.lower() == 'all' for value in values):
+        return list(ANALYSES)
+    parts = []
+    for value in values:
+        if value not in ANALYSES:
+            raise SystemExit(f"Invalid part: {value}. Please select numbers between 1 and {len(ANALYSES)} or 'all'.")
+        if value not in parts:
+            parts.append(value)
+    return parts
+
+###############################################################################
+
+#                                 Command Line                                #
+
+###############################################################################
+
+'''
+The main function parses the command line, runs the parts, prints one line per part and writes a summary.json file to the output directory.
+It exits with a non-zero status when any part failed.
+'''
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the EV analyses headless and save every figure to files.')
+    parser.add_argument('parts', nargs='+', help="part numbers (1-11) or 'all'")
+    parser.add_argument('--output-dir', default='report', help='directory for figures, logs and the summary')
+    parser.add_argument('--formats', nargs='+', default=['png'], choices=['png', 'svg'], help='figure file formats')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes (default: one per part, up to the CPU count)')
+    parser.add_argument('--data', default=DATASET_PATH, help='path of the dataset CSV file')
+    parser.add_argument('--start-method', default=None, choices=multiprocessing.get_all_start_methods(),
+                        help='how worker processes are started (default: fork where available; others map the column store)')
+    args = parser.parse_args(argv)
+    use_headless_backend()
+
+    # Run the parts:
+    start = time.perf_counter()
+    results = run_parts(parse_parts(args.parts), args.output_dir, args.formats, args.workers, args.data, start_method=args.start_method)
+    total = round(time.perf_counter() - start, 3)
+
+    # Print and save the summary of the run:
+    for result in results:
+        print(f"Part {result['part']:>2} {result['title']:<35} {result['status']:<7} {result['seconds']:>8.2f}s  {result['figures']} figure(s)")
+        if result['error']:
+            print(result['error'])
+    print(f"Total: {total:.2f}s")
+    with open(os.path.join(args.output_dir, 'summary.json'), 'w', encoding='utf-8') as file:
+        json.dump({'total_seconds': total, 'parts': results}, file, indent=2)
+
+    return 1 if any(result['status'] != 'ok' for result in results) else 0
+
+# Run the main function
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,271 @@
+'''
+Benchmark Harness:
+
+Overview:
+     This script measures how the analyses scale with the size of the data. It runs every requested part headless (like ev_batch_runner, with the
+     figures rendered to PNG files) on the dataset itself and on copies replicated 10x and 50x, and records for each part and scale:
+     - the wall time and the CPU time of the part,
+     - the peak resident set size (RSS) of the process, and how much it grew during the part,
+     - the peak of the memory allocated through Python (tracemalloc), measured in a separate run because tracing slows the code down.
+     Each measurement runs in a freshly forked process, so the memory high-water mark and the caches of one part never leak into another, and the
+     files the parts write go to a temporary directory. Replicated copies get new DOL Vehicle IDs and a small seeded perturbation of Model Year,
+     Electric Range and Base MSRP, so they are not plain duplicates.
+     The results are written to a JSON file. Given the JSON file of an earlier run (for example of the previous commit), the script lists the
+     measurements that got slower or bigger by more than a threshold and exits with a non-zero status.
+
+Usage:
+     python ev_benchmark.py all --scales 1 10 50 --output benchmark.json
+     python ev_benchmark.py 2 5 7 --baseline benchmark.json --threshold 0.2
+'''
+
+# Import necessary libraries:
+import argparse                        # for the command line interface
+import datetime                        # for the time stamp of a run
+import json                            # for the results file
+import multiprocessing                 # for measuring every part in a fresh process
+import os                              # for the temporary working directory
+import platform                        # for describing the machine
+import subprocess                      # for the current git commit
+import tempfile                        # for the files written by the parts
+import time                            # for wall and CPU times
+import tracemalloc                     # for the peak of the Python allocations
+from concurrent.futures import ProcessPoolExecutor   # for running a measurement in a child process
+
+try:
+    import resource                    # for the peak RSS (not available on Windows)
+except ImportError:
+    resource = None
+
+import numpy as np                     # for numerical operations
+import pandas as pd                    # for data manipulation
+
+import ev_batch_runner                 # for running a part headless
+from ev_batch_runner import parse_parts, run_part, use_headless_backend
+from ev_data_loader import DATASET_PATH, load_dataset, set_dataset_version   # for loading and versioning the data
+from ev_geometry import BOUNDARY_FILES                                       # for the boundary files of the spatial analysis
+
+# Default replication factors (1 is the dataset itself):
+SCALES = (1, 10, 50)
+
+# Default relative increase above which a measurement counts as a regression, and the absolute changes below which it is treated as noise:
+REGRESSION_THRESHOLD = 0.25
+NOISE_FLOOR = {'seconds': 0.05, 'cpu_seconds': 0.05, 'rss_growth_mb': 5.0, 'allocated_peak_mb': 5.0}
+
+###############################################################################
+
+#                                 Scaled Data                                 #
+
+###############################################################################
+
+'''
+This function returns the dataset replicated "factor" times. Every copy after the first gets new DOL Vehicle IDs (offset past the largest one) and a
+seeded perturbation: Model Year moves by -1, 0 or +1 within the observed years, and Electric Range and Base MSRP are scaled by up to +/-5%.
+The result carries its own dataset version, so cached results of the original data are never reused for it.
+'''
+def scaled_dataset(df, factor, seed=0):
+    if factor == 1:
+        return df
+    rng = np.random.default_rng(seed)
+    span = int(df['DOL Vehicle ID'].max()) + 1
+    copies = [df]
+    for copy in range(1, factor):
+        replica = df.copy()
+        replica['DOL Vehicle ID'] = replica['DOL Vehicle ID'] + copy * span
+        years = replica['Model Year'].to_numpy() + rng.integers(-1, 2, len(replica))
+        replica['Model Year'] = np.clip(years, df['Model Year'].min(), df['Model Year'].max()).astype(df['Model Year'].dtype)
+        for column in ('Electric Range', 'Base MSRP'):
+            factors = 1 + rng.uniform(-0.05, 0.05, len(replica))
+            replica[column] = (replica[column].astype('float64') * factors).round().astype(df[column].dtype)
+        copies.append(replica)
+
+    scaled = pd.concat(copies, ignore_index=True)
+    return set_dataset_version(scaled, f"{df.attrs.get('dataset_version', '')}:x{factor}:seed{seed}")
+
+###############################################################################
+
+#                                 Measurements                                #
+
+###############################################################################
+
+'''
+This function returns the peak RSS of the current process in MB, or None where it cannot be measured.
+'''
+def peak_rss_mb():
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS:
+    divisor = 1024 ** 2 if platform.system() == 'Darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / divisor
+
+'''
+This function runs one part on the shared dataset and measures it. With trace=True only the peak of the Python allocations is measured (tracing
+slows the code down, so its times are not kept).
+'''
+def measure_part(part, output_dir, trace=False):
+    start_rss = peak_rss_mb()
+    if trace:
+        tracemalloc.start()
+    wall, cpu = time.perf_counter(), time.process_time()
+
+    result = run_part(part, output_dir, ('png',))
+
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    if trace:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return {'allocated_peak_mb': round(peak / 1024 ** 2, 2)}
+
+    end_rss = peak_rss_mb()
+    return {
+        'status': result['status'],
+        'error': result['error'],
+        'figures': result['figures'],
+        'seconds': round(wall, 3),
+        'cpu_seconds': round(cpu, 3),
+        'peak_rss_mb': None if end_rss is None else round(end_rss, 1),
+        'rss_growth_mb': None if end_rss is None else round(end_rss - start_rss, 1),
+    }
+
+'''
+This function runs a measurement in a freshly forked process that shares the dataset loaded here (or in this process where fork is not available).
+'''
+def measure_isolated(part, output_dir, trace=False):
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        return measure_part(part, output_dir, trace)
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('fork')) as pool:
+        return pool.submit(measure_part, part, output_dir, trace).result()
+
+'''
+This function links the boundary files of the map (and their geometry caches) from the current directory into the temporary working directory,
+since the spatial analysis opens them by relative path.
+'''
+def link_boundary_files(output_dir):
+    stems = tuple(os.path.splitext(name)[0] for name in BOUNDARY_FILES.values())
+    for name in os.listdir('.'):
+        if name.startswith(stems):
+            os.symlink(os.path.abspath(name), os.path.join(output_dir, name))
+
+'''
+This function benchmarks the requested parts at every scale and returns one record per (part, scale). The files written by the parts (CSV outputs,
+figures and logs) go to a temporary directory that is removed afterwards.
+'''
+def run_benchmark(parts, scales=SCALES, path=DATASET_PATH, allocations=True, seed=0):
+    use_headless_backend()
+    base = load_dataset(path)
+    records = []
+    working_directory = os.getcwd()
+
+    with tempfile.TemporaryDirectory(prefix='ev-benchmark-') as output_dir:
+        link_boundary_files(output_dir)
+        os.chdir(output_dir)
+        try:
+            for scale in scales:
+                ev_batch_runner._DATASET = scaled_dataset(base, scale, seed)
+                for part in parts:
+                    record = {'part': part, 'title': ev_batch_runner.ANALYSES[part][0], 'scale': scale,
+                              'rows': len(ev_batch_runner._DATASET)}
+                    record.update(measure_isolated(part, output_dir))
+                    if allocations:
+                        record.update(measure_isolated(part, output_dir, trace=True))
+                    records.append(record)
+                    print(f"Part {part:>2} x{scale:<3} {record['status']:<7} {record['seconds']:>8.2f}s  "
+                          f"peak RSS {record['peak_rss_mb']} MB  allocated {record.get('allocated_peak_mb')} MB", flush=True)
+        finally:
+            os.chdir(working_directory)
+            ev_batch_runner._DATASET = None
+
+    return records
+
+###############################################################################
+
+#                                  Comparison                                 #
+
+###############################################################################
+
+'''
+This function compares the records of a run with those of a baseline run and returns the regressions: the measurements of the same (part, scale)
+that grew by more than "threshold" (relative) and by more than the noise floor of the metric (absolute).
+'''
+def find_regressions(records, baseline_records, threshold=REGRESSION_THRESHOLD):
+    baseline = {(record['part'], record['scale']): record for record in baseline_records}
+    regressions = []
+    for record in records:
+        previous = baseline.get((record['part'], record['scale']))
+        if previous is None or record.get('status') != 'ok' or previous.get('status') != 'ok':
+            continue
+        for metric, floor in NOISE_FLOOR.items():
+            old, new = previous.get(metric), record.get(metric)
+            if old is None or new is None:
+                continue
+            if new - old > floor and new > old * (1 + threshold):
+                regressions.append({'part': record['part'], 'scale': record['scale'], 'metric': metric,
+                                    'baseline': old, 'current': new, 'change': round(new / old - 1, 3) if old else None})
+    return regressions
+
+'''
+This function returns the current git commit of the repository, or None outside a git checkout.
+'''
+def current_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+###############################################################################
+
+#                                 Command Line                                #
+
+###############################################################################
+
+'''
+The main function parses the command line, runs the benchmark, writes the results to a JSON file and, when a baseline is given, prints the
+regressions and exits with a non-zero status if there are any.
+'''
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure the time and memory of the EV analyses at several data sizes.')
+    parser.add_argument('parts', nargs='+', help="part numbers (1-11) or 'all'")
+    parser.add_argument('--scales', nargs='+', type=int, default=list(SCALES), help='replication factors of the dataset')
+    parser.add_argument('--data', default=DATASET_PATH, help='path of the dataset CSV file')
+    parser.add_argument('--output', default='benchmark.json', help='JSON file for the results')
+    parser.add_argument('--baseline', default=None, help='JSON file of an earlier run to compare with')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD, help='relative increase reported as a regression')
+    parser.add_argument('--no-allocations', action='store_true', help='skip the (slower) tracemalloc runs')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the perturbation of the replicated copies')
+    args = parser.parse_args(argv)
+
+    path = os.path.abspath(args.data)
+    output = os.path.abspath(args.output)
+    records = run_benchmark(parse_parts(args.parts), args.scales, path, not args.no_allocations, args.seed)
+
+    # Save the results:
+    results = {
+        'commit': current_commit(),
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.platform(),
+        'cpus': os.cpu_count(),
+        'data': path,
+        'scales': args.scales,
+        'results': records,
+    }
+    with open(output, 'w', encoding='utf-8') as file:
+        json.dump(results, file, indent=2)
+    print(f"Results saved to {output}")
+
+    # Compare with the baseline:
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            regressions = find_regressions(records, json.load(file)['results'], args.threshold)
+        for regression in regressions:
+            print(f"Regression: part {regression['part']} x{regression['scale']} {regression['metric']}: "
+                  f"{regression['baseline']} -> {regression['current']}")
+        if regressions:
+            return 1
+        print("No regressions.")
+
+    return 0
+
+# Run the main function
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,187 @@
+'''
+Category Plots:
+
+Overview:
+     The stacked bars of the comparative analysis (one bar per city or county, one segment per EV type) and the model trends of the temporal analysis
+     (one line per model) are drawn by pandas with one artist per bar segment or line: hundreds of cities or models give thousands of artists, which
+     dominate the drawing time and crowd the chart beyond reading. Above a number of categories, this module draws them in a scalable mode instead:
+     - the categories are ordered by their total count, and those beyond the top N are summed into a single "Other" category,
+     - the bars are split into pages of a fixed number of bars, each page being its own figure (and so its own image file when saved),
+     - all the segments of a page are drawn as one PolyCollection, and all the lines as one LineCollection, whatever their number.
+     stacked_bars() and count_lines() switch to the scalable mode automatically, and draw with pandas as before for tables with few categories.
+     The settings live in CATEGORY_PLOTS, so they can be changed (and become part of the figure cache keys) in one place.
+'''
+
+# Import necessary libraries:
+import numpy as np                     # for the vertices of the bars and lines
+import pandas as pd                    # for the count tables
+from ev_lazy_imports import lazy_import   # for importing the plotting libraries on first use
+
+# Plotting libraries, imported on first use:
+plt = lazy_import('matplotlib.pyplot')                # for data visualization
+mcollections = lazy_import('matplotlib.collections')  # for drawing all bars (or lines) as one artist
+mlines = lazy_import('matplotlib.lines')              # for the legend of the line collections
+mpatches = lazy_import('matplotlib.patches')          # for the legend of the bar collections
+
+# Settings of the scalable mode:
+# - threshold: number of bars, segments or lines above which a table is drawn in the scalable mode,
+# - bars_per_page: number of bars drawn on each page (figure),
+# - top_bars: number of bars kept before the rest is summed into "Other" (two full pages by default; None keeps every bar, spread over as many
+#   pages as needed, which costs a drawing per page),
+# - top_segments: number of segments per bar kept before the rest is summed into "Other",
+# - top_lines: number of lines kept before the rest is summed into "Other",
+# - page_figsize: size of each page.
+CATEGORY_PLOTS = {'threshold': 40, 'bars_per_page': 50, 'top_bars': 99, 'top_segments': 20, 'top_lines': 20, 'page_figsize': (14, 8)}
+
+# Label of the category summing the categories beyond the top N:
+OTHER_LABEL = 'Other'
+
+###############################################################################
+
+#                                  Count Tables                               #
+
+###############################################################################
+
+'''
+This function orders the rows of a count table by their total, from the largest to the smallest, and sums the rows beyond the first "top_n" into
+one "Other" row (no row is summed when top_n is None). The labels become strings, so "Other" fits any index.
+'''
+def roll_up_other(table, top_n=None, label=OTHER_LABEL):
+    totals = table.sum(axis=1).to_numpy()
+    ordered = table.iloc[np.argsort(-totals, kind='stable')]
+    ordered.index = ordered.index.astype(str)
+    if top_n is None or len(ordered) <= top_n:
+        return ordered
+    other = ordered.iloc[top_n:].sum().to_frame(label).T
+    return pd.concat([ordered.iloc[:top_n], other])
+
+'''
+This function splits a table into pages of at most "size" rows.
+'''
+def pages(table, size):
+    return [table.iloc[start:start + size] for start in range(0, len(table), size)] or [table]
+
+# Sample the colors of a colormap for a number of categories (the way pandas colors a plot given a colormap):
+def category_colors(colormap, count):
+    return plt.get_cmap(colormap)(np.linspace(0, 1, count))
+
+###############################################################################
+
+#                               Collection Drawing                            #
+
+###############################################################################
+
+'''
+This function draws a table as stacked bars (one bar per row, one segment per column) on the given axes, with all the segments in a single
+PolyCollection. The vertices of every segment are computed at once from the cumulative sums of the rows; empty segments are left out.
+The height of the axis follows the regular bars, so an "Other" bar summing hundreds of rows does not flatten them.
+'''
+def stacked_bar_collection(ax, table, colors, width=0.8):
+    values = table.to_numpy(dtype='float64')
+    tops = values.cumsum(axis=1)
+    bottoms = tops - values
+    positions = np.arange(len(table))
+
+    # Four corners per segment: (left, bottom), (left, top), (right, top), (right, bottom):
+    xs = np.broadcast_to((positions[:, None] + np.array([-1, -1, 1, 1]) * width / 2)[:, None, :], values.shape + (4,))
+    ys = np.stack([bottoms, tops, tops, bottoms], axis=-1)
+    vertices = np.stack([xs, ys], axis=-1).reshape(-1, 4, 2)
+    facecolors = np.tile(colors, (len(table), 1))
+    drawn = values.ravel() > 0
+
+    ax.add_collection(mcollections.PolyCollection(vertices[drawn], facecolors=facecolors[drawn], edgecolors='none'))
+    ax.set_xlim(-0.5, len(table) - 0.5)
+
+    # The axis fits the regular bars; a taller "Other" bar is cut at the top of the axis and labelled with its total:
+    totals = tops[:, -1] if tops.size else np.zeros(len(table))
+    regular = totals[table.index != OTHER_LABEL]
+    limit = max(float(regular.max()) if regular.size else float(totals.max(initial=0.0)), 1.0) * 1.05
+    ax.set_ylim(0, limit)
+    for position, total in zip(positions[totals > limit], totals[totals > limit]):
+        ax.annotate(f"{total:,.0f}", (position, limit), xytext=(0, -3), textcoords='offset points', ha='center', va='top', rotation=90,
+                    bbox={'boxstyle': 'round', 'facecolor': 'white', 'alpha': 0.8})
+    ax.set_xticks(positions, [str(label) for label in table.index], rotation=45, ha='right')
+    ax.legend(handles=[mpatches.Patch(color=color, label=str(column)) for column, color in zip(table.columns, colors)],
+              bbox_to_anchor=(1.05, 1), loc='upper left')
+
+'''
+This function draws every column of a table as a line over its index on the given axes, with all the lines in a single LineCollection and all
+their markers in a single scatter.
+'''
+def line_collection(ax, table, colors):
+    x = table.index.to_numpy(dtype='float64')
+    values = table.to_numpy(dtype='float64').T
+    segments = np.stack([np.broadcast_to(x, values.shape), values], axis=-1)
+
+    ax.add_collection(mcollections.LineCollection(segments, colors=colors, linewidths=1.5))
+    ax.scatter(np.broadcast_to(x, values.shape).ravel(), values.ravel(), c=np.repeat(colors, len(x), axis=0), s=16, zorder=3)
+    ax.autoscale_view()
+    ax.legend(handles=[mlines.Line2D([], [], color=color, marker='o', label=str(column)) for column, color in zip(table.columns, colors)],
+              bbox_to_anchor=(1.05, 1), loc='upper left', ncol=2)
+
+###############################################################################
+
+#                                Automatic Switch                             #
+
+###############################################################################
+
+# Add the title and axis labels of a chart and place its legend title:
+def label_axes(ax, title, xlabel, ylabel, legend_title):
+    ax.set_title(title)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    if ax.get_legend() is not None:
+        ax.get_legend().set_title(legend_title)
+
+'''
+This function draws a count table as stacked bars (one bar per row, one segment per column) and returns the figures drawn. Tables with at most
+CATEGORY_PLOTS['threshold'] rows and columns are drawn by pandas on one figure. Larger tables are drawn in the scalable mode: the segments beyond
+the top ones become "Other", the rows are ordered by their total with those beyond the top ones summed into "Other", and the bars are drawn page
+by page as collections, one figure per page.
+'''
+def stacked_bars(table, title, xlabel, ylabel, legend_title, colormap, figsize=(14, 8)):
+    settings = CATEGORY_PLOTS
+    if len(table) <= settings['threshold'] and len(table.columns) <= settings['threshold']:
+        ax = table.plot(kind='bar', stacked=True, figsize=figsize, colormap=colormap)
+        ax.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
+        ax.tick_params(axis='x', labelrotation=45)
+        plt.setp(ax.get_xticklabels(), ha='right')
+        label_axes(ax, title, xlabel, ylabel, legend_title)
+        ax.figure.tight_layout()
+        return [ax.figure]
+
+    if len(table.columns) > settings['threshold']:
+        table = roll_up_other(table.T, settings['top_segments']).T
+    table = roll_up_other(table, settings['top_bars'])
+    colors = category_colors(colormap, len(table.columns))
+
+    figures = []
+    table_pages = pages(table, settings['bars_per_page'])
+    for number, page in enumerate(table_pages, 1):
+        figure, ax = plt.subplots(figsize=settings['page_figsize'])
+        stacked_bar_collection(ax, page, colors)
+        page_title = title if len(table_pages) == 1 else f"{title} (page {number} of {len(table_pages)})"
+        label_axes(ax, page_title, xlabel, ylabel, legend_title)
+        figure.tight_layout()
+        figures.append(figure)
+    return figures
+
+'''
+This function draws every column of a count table as a line over its index (e.g. one line per model over the model years) and returns the figures
+drawn. Tables with at most CATEGORY_PLOTS['threshold'] columns are drawn by pandas; larger ones keep the top columns by total count, sum the rest
+into "Other", and draw all the lines as one collection.
+'''
+def count_lines(table, title, xlabel, ylabel, legend_title, colormap, figsize=(14, 8)):
+    settings = CATEGORY_PLOTS
+    if len(table.columns) <= settings['threshold']:
+        ax = table.plot(kind='line', marker='o', colormap=colormap, figsize=figsize)
+        ax.legend(bbox_to_anchor=(1.05, 1), loc='upper left', ncol=2)
+    else:
+        table = roll_up_other(table.T, settings['top_lines']).T
+        _, ax = plt.subplots(figsize=figsize)
+        line_collection(ax, table, category_colors(colormap, len(table.columns)))
+
+    label_axes(ax, title, xlabel, ylabel, legend_title)
+    ax.grid(True)
+    ax.figure.tight_layout()
+    return [ax.figure]
@@ -0,0 +1,188 @@
+'''
+Memory-Mapped Column Store:
+
+Overview:
+     This module writes the dataset as one NumPy .npy file per column, so that any number of processes can map the columns they need instead of
+     each parsing (or unpickling) its own copy. The files of a mapped column are shared through the operating system's page cache, and a column
+     that an analysis never touches is never read from disk.
+     - Numeric columns are stored at their native width (int16 Model Year, int64 DOL Vehicle ID, ...). Nullable integer columns keep their values
+       (0 where missing) and a boolean mask file of the missing entries.
+     - Text columns (County, City, Make, Model, Electric Utility, but also VIN and Vehicle Location) are dictionary-encoded: a file of integer
+       codes (the narrowest type pandas uses for the number of distinct values, -1 where missing) and a JSON dictionary of the distinct values.
+     load_column_store() memory-maps the requested columns read-only and wraps them in a DataFrame without copying: NumPy arrays for the numeric
+     columns, IntegerArrays over the value and mask maps for the nullable ones, and Categoricals over the code maps for the text columns (so the
+     VIN and Vehicle Location strings come back as categoricals rather than strings). The store is kept next to the CSV file and rebuilt when the
+     file changes, like the Parquet cache.
+
+Usage:
+     python ev_column_store.py --data Electric_Vehicle_Population_Data.csv
+'''
+
+# Import necessary libraries:
+import argparse                        # for the command line interface
+import json                            # for the manifest and the dictionaries
+import os                              # for the store paths
+import re                              # for file names derived from column names
+import shutil                          # for replacing an outdated store
+import numpy as np                     # for the column files
+import pandas as pd                    # for data manipulation
+from ev_data_loader import DATASET_PATH, file_hash, load_dataset, schema_key, set_dataset_version   # for the typed dataset
+
+# Version of the store layout, bumped whenever the stored content changes meaning:
+STORE_FORMAT_VERSION = 1
+
+###############################################################################
+
+#                                Writing the Store                            #
+
+###############################################################################
+
+'''
+This function returns the directory of the column store of a CSV file (written next to it).
+'''
+def store_directory(path=DATASET_PATH):
+    return os.path.splitext(path)[0] + '.columns'
+
+'''
+This function returns the stem of the files of a column: its position in the schema and its name reduced to letters, digits and underscores.
+'''
+def column_stem(number, column):
+    return f"{number:02d}_" + re.sub(r'[^0-9A-Za-z]+', '_', column).strip('_')
+
+'''
+This function writes one column into the store directory and returns its manifest entry.
+'''
+def write_column(directory, stem, series):
+    dtype = series.dtype
+    if isinstance(dtype, pd.CategoricalDtype) or not pd.api.types.is_numeric_dtype(dtype):
+        # Text: dictionary of the distinct values and their codes (-1 where missing):
+        categorical = series.array if isinstance(dtype, pd.CategoricalDtype) else series.astype('category').array
+        np.save(os.path.join(directory, stem + '.npy'), categorical.codes)
+        with open(os.path.join(directory, stem + '.dictionary.json'), 'w', encoding='utf-8') as file:
+            json.dump(categorical.categories.tolist(), file)
+        return {'kind': 'dictionary', 'file': stem + '.npy', 'dictionary': stem + '.dictionary.json'}
+
+    if isinstance(dtype, pd.api.extensions.ExtensionDtype):
+        # Nullable integers: values at their native width (0 where missing) and the mask of the missing entries:
+        np.save(os.path.join(directory, stem + '.npy'), series.to_numpy(dtype=dtype.numpy_dtype, na_value=0))
+        np.save(os.path.join(directory, stem + '.mask.npy'), series.isna().to_numpy())
+        return {'kind': 'nullable', 'file': stem + '.npy', 'mask': stem + '.mask.npy', 'dtype': str(dtype)}
+
+    np.save(os.path.join(directory, stem + '.npy'), series.to_numpy())
+    return {'kind': 'numeric', 'file': stem + '.npy', 'dtype': str(dtype)}
+
+'''
+This function writes the column store of a CSV file from its typed DataFrame and returns the manifest. The files are written to a temporary
+directory that replaces the old store once complete, so an interrupted run never leaves a half-written store behind.
+'''
+def write_column_store(path=DATASET_PATH, directory=None):
+    directory = directory or store_directory(path)
+    df = load_dataset(path)
+    building = directory + '.tmp'
+    shutil.rmtree(building, ignore_errors=True)
+    os.makedirs(building)
+
+    columns = {column: write_column(building, column_stem(number, column), df[column]) for number, column in enumerate(df.columns)}
+    stat = os.stat(path)
+    manifest = {
+        'format': STORE_FORMAT_VERSION,
+        'source': os.path.basename(path),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': df.attrs['dataset_version'],
+        'schema': schema_key(),
+        'rows': len(df),
+        'columns': columns,
+    }
+    with open(os.path.join(building, 'manifest.json'), 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=2)
+
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(building, directory)
+    return manifest
+
+'''
+This function returns the manifest of the column store when it was written from the current content of the CSV file with the current schema and
+layout, or None when the store has to be rebuilt. Matching size and modification time are trusted directly; otherwise the content hash decides.
+'''
+def read_valid_manifest(path, directory):
+    try:
+        with open(os.path.join(directory, 'manifest.json'), encoding='utf-8') as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        return None
+
+    stat = os.stat(path)
+    if manifest.get('format') != STORE_FORMAT_VERSION or manifest.get('schema') != schema_key() or manifest.get('size') != stat.st_size:
+        return None
+    if manifest.get('mtime_ns') == stat.st_mtime_ns or manifest.get('sha256') == file_hash(path):
+        return manifest
+    return None
+
+'''
+This function returns the manifest of an up-to-date column store of a CSV file, writing the store first when it is missing or outdated.
+'''
+def build_column_store(path=DATASET_PATH, directory=None):
+    directory = directory or store_directory(path)
+    return read_valid_manifest(path, directory) or write_column_store(path, directory)
+
+###############################################################################
+
+#                                Mapping the Store                            #
+
+###############################################################################
+
+'''
+This function memory-maps one stored column read-only and wraps it as a pandas array without copying it.
+'''
+def map_column(directory, entry):
+    values = np.load(os.path.join(directory, entry['file']), mmap_mode='r')
+    if entry['kind'] == 'dictionary':
+        with open(os.path.join(directory, entry['dictionary']), encoding='utf-8') as file:
+            categories = json.load(file)
+        return pd.Categorical.from_codes(values, dtype=pd.CategoricalDtype(categories), validate=False)
+    if entry['kind'] == 'nullable':
+        mask = np.load(os.path.join(directory, entry['mask']), mmap_mode='r')
+        return pd.arrays.IntegerArray(values, mask)
+    return values
+
+'''
+This function loads the requested columns (all by default) of the dataset from its column store, written first when needed. The columns are
+memory-mapped, so they are only read from disk as they are used, and processes mapping the same store share one copy in the page cache. The
+DataFrame carries the same dataset version as load_dataset() gives the CSV file, so cached results are shared between the two.
+'''
+def load_column_store(path=DATASET_PATH, columns=None, directory=None):
+    directory = directory or store_directory(path)
+    manifest = build_column_store(path, directory)
+    columns = list(columns or manifest['columns'])
+
+    df = pd.DataFrame({column: map_column(directory, manifest['columns'][column]) for column in columns}, copy=False)
+    return set_dataset_version(df, manifest['sha256'])
+
+###############################################################################
+
+#                                 Command Line                                #
+
+###############################################################################
+
+'''
+The main function builds (or checks) the column store of a CSV file and prints the files of every column with their sizes.
+'''
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Write the EV dataset as memory-mappable column files.')
+    parser.add_argument('--data', default=DATASET_PATH, help='path of the dataset CSV file')
+    parser.add_argument('--directory', default=None, help='directory of the column store (default: next to the CSV file)')
+    args = parser.parse_args(argv)
+
+    directory = args.directory or store_directory(args.data)
+    manifest = build_column_store(args.data, directory)
+    print(f"Column store {directory}: {manifest['rows']} rows")
+    for column, entry in manifest['columns'].items():
+        files = [entry[key] for key in ('file', 'mask', 'dictionary') if key in entry]
+        size = sum(os.path.getsize(os.path.join(directory, name)) for name in files)
+        print(f"    {column:<52} {entry['kind']:<10} {size / 1e6:>8.2f} MB  {', '.join(files)}")
+    return 0
+
+# Run the main function
+if __name__ == "__main__":
+    raise SystemExit(main())
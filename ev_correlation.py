@@ -0,0 +1,307 @@
+'''
+Correlation Engine:
+
+Overview:
+     Part 8 and Part 9 both draw correlation heatmaps of the numeric features (Part 8 of seven chosen columns, Part 9 of all of them). This module
+     computes every pairwise correlation from one scan of the data with a covariance accumulator:
+     - For p columns it keeps four p x p float64 matrices: the number of rows where both columns are present, the sum of each column over those
+       rows, the sum of its squares over those rows, and the sum of the cross products. With the 0/1 presence mask M and the values X (missing
+       values set to 0) they are M'M, X'M, (X*X)'M and X'X, i.e. four matrix products per chunk. Because the sums are restricted to the rows where
+       both columns are present, this is the same pairwise-complete handling of missing values as pandas' corr().
+     - Every column is shifted by a fixed value (its mean in the first chunk) before it is accumulated, so the sums of squares of large values
+       such as DOL Vehicle IDs do not lose their precision. Accumulators with different shifts are re-shifted exactly when they are merged.
+     - Inputs of any numeric type (float32 included) are accumulated in float64. Chunks, files or shards can be accumulated separately and merged.
+     Pearson correlations of any subset of the accumulated columns are read from the one accumulator. Spearman correlations are Pearson
+     correlations of the average ranks (a rank pass before the accumulation); like pandas, a pair of columns whose missing values do not line up is
+     re-ranked over the rows where both are present. The correlation matrices of a loaded dataset are cached per dataset version (the CACHE_SIZE
+     most recently used ones), so the second heatmap does not scan the rows again; DataFrames without a version (filtered or modified copies)
+     are accumulated every time.
+'''
+
+# Import necessary libraries:
+from collections import OrderedDict    # for the least recently used cache
+import numpy as np                     # for numerical operations
+import pandas as pd                    # for data manipulation
+from ev_data_loader import DATASET_PATH, DATASET_SCHEMA   # for the dataset location and column types
+from ev_aggregations import dataset_version                # for the version of the data held by a DataFrame
+
+# Correlation methods supported by the engine:
+METHODS = ('pearson', 'spearman')
+
+# Maximum number of cached results:
+CACHE_SIZE = 32
+
+# Cached results of loaded datasets: (dataset version, method, columns) -> accumulator (Pearson) or matrix (Spearman):
+_CACHE = OrderedDict()
+
+###############################################################################
+
+#                                  Accumulator                                #
+
+###############################################################################
+
+'''
+This class accumulates the pairwise-complete sums needed for the covariances and correlations of a set of columns (see the overview).
+'''
+class CorrelationAccumulator:
+    def __init__(self, columns):
+        self.columns = list(columns)
+        size = len(self.columns)
+        self.shift = None
+        self.count = np.zeros((size, size))
+        self.sums = np.zeros((size, size))         # sums[i, j]: sum of column i over the rows where columns i and j are present
+        self.squares = np.zeros((size, size))      # squares[i, j]: sum of column i squared over the same rows
+        self.products = np.zeros((size, size))     # products[i, j]: sum of column i times column j
+
+    # Add a chunk of rows (a DataFrame holding the columns, or an array with one column per accumulated column):
+    def update(self, values):
+        if isinstance(values, pd.DataFrame):
+            values = values[self.columns].to_numpy(dtype='float64', na_value=np.nan)
+        values = np.asarray(values, dtype='float64')
+        present = ~np.isnan(values)
+        if self.shift is None:
+            # Shift every column by its mean in the first chunk (0 for a column without values):
+            with np.errstate(invalid='ignore'):
+                counts = present.sum(axis=0)
+                self.shift = np.where(counts > 0, np.nansum(values, axis=0) / np.maximum(counts, 1), 0.0)
+        shifted = np.where(present, values - self.shift, 0.0)
+        mask = present.astype('float64')
+        self.count += mask.T @ mask
+        self.sums += shifted.T @ mask
+        self.squares += (shifted * shifted).T @ mask
+        self.products += shifted.T @ shifted
+        return self
+
+    # Move the sums to another shift: every value x - a becomes (x - a) + d with d = a - b:
+    def _reshift(self, shift):
+        delta = self.shift - shift
+        row, col = delta[:, None], delta[None, :]
+        self.products += row * self.sums.T + col * self.sums + row * col * self.count
+        self.squares += 2 * row * self.sums + row * row * self.count
+        self.sums += row * self.count
+        self.shift = shift
+
+    # Combine with an accumulator of the same columns built on other rows:
+    def merge(self, other):
+        if other.columns != self.columns:
+            raise ValueError("Only accumulators of the same columns can be merged.")
+        if other.shift is None:
+            return self
+        if self.shift is None:
+            self.shift = other.shift.copy()
+        other = other.copy()
+        other._reshift(self.shift)
+        self.count += other.count
+        self.sums += other.sums
+        self.squares += other.squares
+        self.products += other.products
+        return self
+
+    def copy(self):
+        duplicate = CorrelationAccumulator(self.columns)
+        duplicate.shift = None if self.shift is None else self.shift.copy()
+        for name in ('count', 'sums', 'squares', 'products'):
+            setattr(duplicate, name, getattr(self, name).copy())
+        return duplicate
+
+    # Positions of a subset of the accumulated columns:
+    def _positions(self, columns):
+        columns = self.columns if columns is None else list(columns)
+        missing = [column for column in columns if column not in self.columns]
+        if missing:
+            raise KeyError(f"Columns not accumulated: {missing}")
+        return columns, [self.columns.index(column) for column in columns]
+
+    # Centered sums of the pairs of a subset of the columns (co-moment, and the two sums of squared deviations over the same rows):
+    def _centered(self, columns):
+        columns, positions = self._positions(columns)
+        grid = np.ix_(positions, positions)
+        count, sums, squares, products = self.count[grid], self.sums[grid], self.squares[grid], self.products[grid]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            comoment = products - sums * sums.T / count
+            deviations = squares - sums * sums / count
+        return columns, count, comoment, deviations
+
+    # Pairwise-complete sample covariances (like pandas' cov(); pairs with fewer than 2 rows are NaN):
+    def covariance(self, columns=None):
+        columns, count, comoment, _ = self._centered(columns)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            covariance = np.where(count > 1, comoment / (count - 1), np.nan)
+        return pd.DataFrame(covariance, index=columns, columns=columns)
+
+    # Pairwise-complete Pearson correlations (like pandas' corr(); constant pairs and pairs without rows are NaN):
+    def pearson(self, columns=None):
+        columns, count, comoment, deviations = self._centered(columns)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            denominator = np.sqrt(deviations * deviations.T)
+            correlation = np.where((count > 0) & (denominator > 0), comoment / denominator, np.nan)
+        return pd.DataFrame(np.clip(correlation, -1.0, 1.0), index=columns, columns=columns)
+
+###############################################################################
+
+#                                 Accumulation                                #
+
+###############################################################################
+
+'''
+This function returns the numeric columns of a DataFrame (the columns that pandas' corr(numeric_only=True) would use).
+'''
+def numeric_columns(df):
+    return list(df.select_dtypes(include='number').columns)
+
+'''
+This function returns the numeric columns of a CSV file: the columns of its header that the declared schema types as numbers (the same columns
+numeric_columns() gives for the loaded file).
+'''
+def file_numeric_columns(path=DATASET_PATH):
+    header = pd.read_csv(path, nrows=0).columns
+    return [column for column in header if column in DATASET_SCHEMA and pd.api.types.is_numeric_dtype(pd.Series(dtype=DATASET_SCHEMA[column]))]
+
+'''
+This function accumulates the given columns of a loaded DataFrame, converting at most "chunksize" rows to float64 at a time.
+'''
+def accumulate_frame(df, columns, chunksize=100_000):
+    accumulator = CorrelationAccumulator(columns)
+    for start in range(0, len(df), chunksize):
+        accumulator.update(df[columns].iloc[start:start + chunksize])
+    return accumulator
+
+'''
+This function reads the given columns of a CSV file (all its numeric columns by default) in chunks and accumulates them, so only one chunk is in
+memory at any time. With "ranks" (a dictionary column -> RankTable) the average ranks are accumulated instead of the values.
+'''
+def accumulate_csv(path=DATASET_PATH, columns=None, chunksize=100_000, ranks=None):
+    columns = file_numeric_columns(path) if columns is None else list(columns)
+    dtypes = {column: DATASET_SCHEMA[column] for column in columns if column in DATASET_SCHEMA}
+    accumulator = CorrelationAccumulator(columns)
+    for chunk in pd.read_csv(path, usecols=columns, dtype=dtypes, chunksize=chunksize):
+        if ranks:
+            chunk = pd.DataFrame({column: ranks[column].rank(chunk[column]) for column in columns})
+        accumulator.update(chunk)
+    return accumulator
+
+###############################################################################
+
+#                                    Ranks                                    #
+
+###############################################################################
+
+'''
+This class holds the distinct values of a column with their average rank (ties share the mean of their ranks, like pandas' rank()). It is built
+from value counts, so the rank pass over a streamed file only keeps one entry per distinct value.
+'''
+class RankTable:
+    def __init__(self):
+        self.counts = pd.Series(dtype='int64')
+
+    def update(self, values):
+        counts = pd.Series(values).dropna().astype('float64').value_counts()
+        self.counts = self.counts.add(counts, fill_value=0).astype('int64')
+        return self
+
+    # Average rank of every distinct value: the rows before it plus the mean of 1..count:
+    def table(self):
+        counts = self.counts.sort_index()
+        before = counts.cumsum() - counts
+        return counts.index.to_numpy(dtype='float64'), (before + (counts + 1) / 2).to_numpy(dtype='float64')
+
+    # Average rank of every value (the values must have been counted by update(); missing values stay NaN):
+    def rank(self, values):
+        values = pd.Series(values).to_numpy(dtype='float64', na_value=np.nan)
+        distinct, average = self.table()
+        present = ~np.isnan(values)
+        ranks = np.full(len(values), np.nan)
+        ranks[present] = average[np.searchsorted(distinct, values[present])]
+        return ranks
+
+'''
+This function builds the RankTable of every given column of a CSV file (all its numeric columns by default) in one chunked pass.
+'''
+def rank_tables(path=DATASET_PATH, columns=None, chunksize=100_000):
+    columns = file_numeric_columns(path) if columns is None else list(columns)
+    dtypes = {column: DATASET_SCHEMA[column] for column in columns if column in DATASET_SCHEMA}
+    tables = {column: RankTable() for column in columns}
+    for chunk in pd.read_csv(path, usecols=columns, dtype=dtypes, chunksize=chunksize):
+        for column in columns:
+            tables[column].update(chunk[column])
+    return tables
+
+'''
+This function computes the Spearman correlations of the columns of a loaded DataFrame: the Pearson correlations of their average ranks, except for
+the pairs whose missing values do not line up, which are re-ranked over the rows where both columns are present (as pandas does).
+'''
+def spearman_frame(df, columns, chunksize=100_000):
+    ranks = df[columns].astype('float64').rank()
+    accumulator = accumulate_frame(ranks, columns, chunksize)
+    correlation = accumulator.pearson()
+
+    # Re-rank the pairs that do not share the same present rows:
+    present = np.diag(accumulator.count)
+    for i, first in enumerate(columns):
+        for j in range(i + 1, len(columns)):
+            if accumulator.count[i, j] != present[i] or accumulator.count[i, j] != present[j]:
+                pair = df[[first, columns[j]]].astype('float64').dropna().rank()
+                correlation.iloc[i, j] = correlation.iloc[j, i] = pair.corr().iloc[0, 1] if len(pair) else np.nan
+
+    return correlation
+
+###############################################################################
+
+#                                 Correlations                                #
+
+###############################################################################
+
+'''
+This function returns the correlation matrix of some columns of a loaded DataFrame (all its numeric columns by default), with the "pearson" or
+"spearman" method, like df[columns].corr(method). The first call accumulates every numeric column of the data at once and caches the result per
+dataset version, so later calls for any subset of those columns do not scan the rows again.
+'''
+def correlation_matrix(df, columns=None, method='pearson'):
+    if method not in METHODS:
+        raise ValueError(f"Unknown correlation method: {method} (expected one of {METHODS})")
+    accumulated = numeric_columns(df)
+    columns = accumulated if columns is None else list(columns)
+    version = dataset_version(df)
+    if not set(columns) <= set(accumulated) or version is None:
+        accumulated = columns
+
+    # DataFrames without a version are accumulated every time, without caching:
+    key = (version, method, tuple(accumulated))
+    cached = _CACHE.get(key) if version is not None else None
+    if cached is None:
+        cached = accumulate_frame(df, accumulated) if method == 'pearson' else spearman_frame(df, accumulated)
+        if version is not None:
+            _CACHE[key] = cached
+    if version is not None:
+        # Keep the least recently used results within CACHE_SIZE:
+        _CACHE.move_to_end(key)
+        while len(_CACHE) > CACHE_SIZE:
+            _CACHE.popitem(last=False)
+
+    return cached.pearson(columns) if method == 'pearson' else cached.loc[columns, columns].copy()
+
+'''
+This function computes the correlation matrix of some columns of a CSV file (all its numeric columns by default) while reading it in chunks (the
+file is never fully loaded). The
+Spearman method reads the file twice: a rank pass that counts the distinct values of every column, then the accumulation of their average ranks.
+Streamed Spearman correlations rank every column over all its values, so they only equal pandas' for pairs whose missing values line up.
+'''
+def streaming_correlation_matrix(path=DATASET_PATH, columns=None, method='pearson', chunksize=100_000):
+    if method not in METHODS:
+        raise ValueError(f"Unknown correlation method: {method} (expected one of {METHODS})")
+    columns = file_numeric_columns(path) if columns is None else list(columns)
+    ranks = rank_tables(path, columns, chunksize) if method == 'spearman' else None
+    return accumulate_csv(path, columns, chunksize, ranks).pearson()
+
+'''
+This function drops the cached correlations of one dataset (or all of them when no DataFrame is given).
+'''
+def invalidate(df=None):
+    if df is None:
+        _CACHE.clear()
+        return
+    version = dataset_version(df)
+    if version is None:
+        return
+    for key in [key for key in _CACHE if key[0] == version]:
+        del _CACHE[key]
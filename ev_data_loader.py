@@ -0,0 +1,274 @@
+'''
+Dataset Loader:
+
+Overview:
+     This module loads the "Electric Vehicle Population Data" dataset with a declared schema instead of letting pandas guess the column types.
+     Low-cardinality text columns (County, City, State, Make, Model, Electric Vehicle Type, CAFV Eligibility and Electric Utility) are read as
+     categoricals, years and districts use the smallest integer type that fits, and columns that contain missing values use pandas nullable
+     integers so that no column silently falls back to float64. A memory report shows how many bytes each column saves compared to the untyped
+     pd.read_csv result.
+     The first load also writes a Parquet copy of the typed DataFrame next to the CSV, keyed by the file size, modification time and SHA-256
+     hash of the CSV. Later loads read that binary copy (only the requested columns) and the copy is rebuilt whenever the CSV changes.
+'''
+
+# Import necessary libraries:
+import hashlib                         # for hashing the source CSV
+import json                            # for the cache metadata file
+import os                              # for file sizes, times and paths
+import weakref                         # for telling the versioned DataFrames apart from their copies
+import pandas as pd                    # for data manipulation
+
+###############################################################################
+
+#                                Dataset Schema                               #
+
+###############################################################################
+
+# Default location of the dataset:
+DATASET_PATH = 'Electric_Vehicle_Population_Data.csv'
+
+# Declared column types of the dataset:
+'''
+Categoricals are used for the text columns that repeat a small set of values, plain integers are used for columns that never have missing values,
+and nullable integers ("Int8", "Int16", ...) are used for the columns where missing values occur. The free-text columns (VIN and Vehicle Location)
+are kept as strings because almost every value is distinct.
+'''
+DATASET_SCHEMA = {
+    'VIN (1-10)': 'string',
+    'County': 'category',
+    'City': 'category',
+    'State': 'category',
+    'Postal Code': 'Int32',
+    'Model Year': 'int16',
+    'Make': 'category',
+    'Model': 'category',
+    'Electric Vehicle Type': 'category',
+    'Clean Alternative Fuel Vehicle (CAFV) Eligibility': 'category',
+    'Electric Range': 'Int16',
+    'Base MSRP': 'Int32',
+    'Legislative District': 'Int8',
+    'DOL Vehicle ID': 'int64',
+    'Vehicle Location': 'string',
+    'Electric Utility': 'category',
+    '2020 Census Tract': 'Int64',
+}
+
+###############################################################################
+
+#                                 Dataset Cache                               #
+
+###############################################################################
+
+# Version of the cache layout, bumped whenever the cached content changes meaning:
+CACHE_FORMAT_VERSION = 1
+
+'''
+This function returns the paths of the Parquet cache and of its metadata file for a given CSV file. Both are written next to the CSV.
+'''
+def cache_paths(path):
+    stem = os.path.splitext(path)[0]
+    return stem + '.cache.parquet', stem + '.cache.json'
+
+'''
+This function computes the SHA-256 hash of a file, reading it in blocks so that large extracts are never held in memory at once.
+'''
+def file_hash(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+'''
+This function returns the key that identifies the declared schema, so that a cache written with an older schema is never reused.
+'''
+def schema_key():
+    text = json.dumps({'version': CACHE_FORMAT_VERSION, 'schema': DATASET_SCHEMA}, sort_keys=True)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+'''
+This function checks whether the cache of a CSV file is still valid. Matching size and modification time are trusted directly; when only the time
+differs (for example after a copy) the content hash decides, and the metadata is refreshed so the next check is cheap again.
+It returns the cache metadata when the cache can be used and None when it has to be rebuilt.
+'''
+def read_valid_cache_metadata(path):
+    cache_path, meta_path = cache_paths(path)
+    if not (os.path.exists(cache_path) and os.path.exists(meta_path)):
+        return None
+
+    # Read the metadata stored with the cache:
+    try:
+        with open(meta_path, encoding='utf-8') as file:
+            metadata = json.load(file)
+    except (OSError, ValueError):
+        return None
+
+    # Compare the schema, size and modification time of the source file:
+    stat = os.stat(path)
+    if metadata.get('schema') != schema_key() or metadata.get('size') != stat.st_size:
+        return None
+    if metadata.get('mtime_ns') == stat.st_mtime_ns:
+        return metadata
+
+    # Fall back to the content hash when only the modification time changed:
+    if metadata.get('sha256') != file_hash(path):
+        return None
+    metadata['mtime_ns'] = stat.st_mtime_ns
+    with open(meta_path, 'w', encoding='utf-8') as file:
+        json.dump(metadata, file, indent=2)
+    return metadata
+
+'''
+This function writes the Parquet cache of a typed DataFrame together with its metadata. The files are first written under temporary names and then
+renamed, so an interrupted run never leaves a half-written cache behind.
+'''
+def write_cache(path, df):
+    cache_path, meta_path = cache_paths(path)
+    stat = os.stat(path)
+    metadata = {
+        'source': os.path.basename(path),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': file_hash(path),
+        'schema': schema_key(),
+        'rows': len(df),
+    }
+
+    # Write the binary copy and its metadata:
+    df.to_parquet(cache_path + '.tmp', index=False)
+    with open(meta_path + '.tmp', 'w', encoding='utf-8') as file:
+        json.dump(metadata, file, indent=2)
+    os.replace(cache_path + '.tmp', cache_path)
+    os.replace(meta_path + '.tmp', meta_path)
+
+    return metadata
+
+'''
+This function reports whether a Parquet engine (pyarrow) is installed. Without it the loader simply parses the CSV file on every run.
+'''
+def cache_available():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+###############################################################################
+
+#                                Dataset Loading                              #
+
+###############################################################################
+
+'''
+This function parses the CSV file with the declared schema. Only the requested columns are parsed when "columns" is given, and any column that is
+not part of the schema keeps the type pandas infers for it.
+'''
+def read_csv_typed(path=DATASET_PATH, columns=None):
+    # Restrict the schema to the columns that will be parsed:
+    dtypes = DATASET_SCHEMA if columns is None else {column: DATASET_SCHEMA[column] for column in columns if column in DATASET_SCHEMA}
+
+    # Read the CSV file into a typed pandas DataFrame:
+    return pd.read_csv(path, usecols=columns, dtype=dtypes)
+
+'''
+This function loads the dataset with the declared schema. When the Parquet cache is valid only the requested columns are read from it; otherwise
+the whole CSV file is parsed once, the cache is (re)written and the requested columns are returned. Passing use_cache=False always parses the CSV.
+The returned DataFrame carries the version of the data it was loaded from (the SHA-256 hash of the CSV file) in df.attrs['dataset_version'],
+which lets cached results computed on it be told apart from results computed on another release of the file.
+'''
+def load_dataset(path=DATASET_PATH, columns=None, use_cache=True):
+    if not use_cache or not cache_available():
+        df = read_csv_typed(path, columns)
+        return set_dataset_version(df, file_hash(path))
+
+    # Load from the binary cache when it matches the source file:
+    cache_path, _ = cache_paths(path)
+    metadata = read_valid_cache_metadata(path)
+    if metadata is not None:
+        return set_dataset_version(pd.read_parquet(cache_path, columns=columns), metadata['sha256'])
+
+    # Otherwise parse the full CSV file and rebuild the cache:
+    df = read_csv_typed(path)
+    metadata = write_cache(path, df)
+    df = df if columns is None else df[list(columns)]
+
+    return set_dataset_version(df, metadata['sha256'])
+
+# DataFrames given a version by set_dataset_version(), by object id. pandas copies df.attrs to every copy of a DataFrame (filtered, or with a
+# column assigned), so the version only belongs to the DataFrame it was set on; the entries are weak references, removed when the DataFrame is
+# freed, so a new DataFrame that reuses its id is never taken for it:
+_VERSIONED_FRAMES = {}
+
+'''
+This function records the version of the data a DataFrame holds, together with its number of rows. Only this DataFrame carries the version:
+its copies inherit the attrs, but get_dataset_version() returns None for them.
+'''
+def set_dataset_version(df, version):
+    df.attrs['dataset_version'] = version
+    df.attrs['dataset_rows'] = len(df)
+    frame_id = id(df)
+    _VERSIONED_FRAMES[frame_id] = weakref.ref(df, lambda _, frame_id=frame_id: _VERSIONED_FRAMES.pop(frame_id, None))
+    return df
+
+'''
+This function returns the version of the data a DataFrame holds, or None when the DataFrame was not given one by set_dataset_version() (for
+example a copy of a versioned DataFrame, filtered or with a column assigned), or when its version was cleared.
+'''
+def get_dataset_version(df):
+    reference = _VERSIONED_FRAMES.get(id(df))
+    if reference is None or reference() is not df or df.attrs.get('dataset_rows') != len(df):
+        return None
+    return df.attrs.get('dataset_version')
+
+'''
+This function removes the version of a DataFrame, to be called when a versioned DataFrame is modified in place (results cached for its version
+no longer describe it).
+'''
+def clear_dataset_version(df):
+    _VERSIONED_FRAMES.pop(id(df), None)
+    df.attrs.pop('dataset_version', None)
+    df.attrs.pop('dataset_rows', None)
+    return df
+
+'''
+This function compares the memory usage of the untyped DataFrame returned by a bare pd.read_csv with the typed DataFrame returned by load_dataset().
+It returns a table with the bytes used by each column before and after, the bytes saved and the reduction factor, followed by a "Total" row.
+'''
+def memory_report(df_untyped, df_typed):
+    # Measure the deep memory usage of each column (including the string payloads):
+    before = df_untyped.memory_usage(index=False, deep=True)
+    after = df_typed.memory_usage(index=False, deep=True).reindex(before.index)
+
+    # Build the per-column report:
+    report = pd.DataFrame({
+        'Type Before': df_untyped.dtypes.astype(str),
+        'Type After': df_typed.dtypes.reindex(before.index).astype(str),
+        'Bytes Before': before,
+        'Bytes After': after,
+    })
+    report.loc['Total'] = ['', '', before.sum(), after.sum()]
+    report['Bytes Saved'] = report['Bytes Before'] - report['Bytes After']
+    report['Reduction Factor'] = (report['Bytes Before'] / report['Bytes After']).round(2)
+
+    return report
+
+'''
+This function loads the dataset twice, once without and once with the declared schema, and prints the memory report so the savings can be checked
+on a new extract of the data.
+'''
+def print_memory_report(path=DATASET_PATH):
+    # Load the dataset with and without the declared schema:
+    df_untyped = pd.read_csv(path)
+    df_typed = load_dataset(path, use_cache=False)
+
+    # Print the memory report:
+    report = memory_report(df_untyped, df_typed)
+    print("\n\n\nMemory Usage per Column (bytes):")
+    print(report.to_string())
+    print("\n")
+
+    return report
+
+# Print the memory report when the module is run directly:
+if __name__ == "__main__":
+    print_memory_report()
@@ -0,0 +1,153 @@
+'''
+Density Plots:
+
+Overview:
+     Scatter plots and pair plots draw one marker per row, so their rendering time grows linearly with the dataset. This module draws the same
+     relationships as rasterized densities instead: the points are binned into a 2D grid with one vectorized NumPy histogram per hue category, and
+     each grid is drawn as a single image (transparent where there are no points, more opaque where there are many, on a logarithmic scale).
+     The drawing cost then depends on the grid size only. scatter_or_density() and pairplot_or_density() switch to the density mode automatically
+     when the data has more rows than a configurable threshold.
+'''
+
+# Import necessary libraries:
+import numpy as np                     # for numerical operations
+from ev_lazy_imports import lazy_import   # for importing the plotting libraries on first use
+
+# Plotting libraries, imported on first use:
+plt = lazy_import('matplotlib.pyplot')        # for data visualization
+mcolors = lazy_import('matplotlib.colors')    # for single-color transparent colormaps
+mpatches = lazy_import('matplotlib.patches')  # for the legend of the density images
+sns = lazy_import('seaborn')                  # for the palettes and the regular scatter / pair plots
+
+# Number of rows above which scatter and pair plots are drawn as densities:
+DENSITY_ROW_THRESHOLD = 50_000
+
+# Number of bins of the density grid along each axis (scatter plots and pair plot panels):
+DENSITY_BINS = 120
+PAIRPLOT_BINS = 50
+
+# Lowest opacity of a cell holding at least one point, so isolated points stay visible like a scatter marker:
+MIN_OPACITY = 0.3
+
+###############################################################################
+
+#                                 Density Grids                               #
+
+###############################################################################
+
+'''
+This function converts a column to a float64 array (missing values become NaN).
+'''
+def as_float_array(values):
+    return values.to_numpy(dtype='float64', na_value=np.nan)
+
+'''
+This function returns the (min, max) range of the finite values of an array, widened a little when all the values are equal.
+'''
+def value_range(values):
+    finite = values[np.isfinite(values)]
+    if len(finite) == 0:
+        return (0.0, 1.0)
+    low, high = float(finite.min()), float(finite.max())
+    return (low - 0.5, high + 0.5) if low == high else (low, high)
+
+'''
+This function bins the points (x, y) into a grid of counts over the given ranges, skipping points with a missing coordinate.
+'''
+def density_grid(x, y, bins=DENSITY_BINS, ranges=None):
+    ranges = ranges or (value_range(x), value_range(y))
+    keep = np.isfinite(x) & np.isfinite(y)
+    counts, _, _ = np.histogram2d(x[keep], y[keep], bins=bins, range=ranges)
+    return counts, ranges
+
+'''
+This function draws a grid of counts as one image in a single color, with an opacity that grows with the logarithm of the count (from MIN_OPACITY
+for a single point to fully opaque for the densest cell). Empty cells are transparent.
+'''
+def draw_density(ax, counts, ranges, color, label=None):
+    colormap = mcolors.LinearSegmentedColormap.from_list(str(label), [(*color[:3], 0.0), (*color[:3], 1.0)])
+    intensity = np.log1p(counts.T)
+    if intensity.max() > 0:
+        intensity = np.where(intensity > 0, MIN_OPACITY + (1 - MIN_OPACITY) * intensity / intensity.max(), 0)
+    ax.imshow(np.ma.masked_equal(intensity, 0), origin='lower', aspect='auto', interpolation='nearest', cmap=colormap,
+              vmin=0, vmax=1, extent=(*ranges[0], *ranges[1]))
+
+'''
+This function draws the density of y against x on the given axes, with one grid and one color per hue category when "hue" is given.
+'''
+def density_plot(ax, data, x, y, hue=None, palette='viridis', bins=DENSITY_BINS):
+    x_values, y_values = as_float_array(data[x]), as_float_array(data[y])
+    ranges = (value_range(x_values), value_range(y_values))
+
+    if hue is None:
+        counts, _ = density_grid(x_values, y_values, bins, ranges)
+        draw_density(ax, counts, ranges, sns.color_palette(palette, 1)[0])
+    else:
+        # One grid per hue category, all over the same ranges:
+        categories = data[hue].dropna().unique()
+        colors = sns.color_palette(palette, len(categories))
+        codes = data[hue].to_numpy()
+        for category, color in zip(categories, colors):
+            members = codes == category
+            counts, _ = density_grid(x_values[members], y_values[members], bins, ranges)
+            draw_density(ax, counts, ranges, color, category)
+        ax.legend(handles=[mpatches.Patch(color=color, label=str(category)) for category, color in zip(categories, colors)],
+                  title=hue, bbox_to_anchor=(1.05, 1), loc='upper left')
+
+    ax.set_xlim(ranges[0])
+    ax.set_ylim(ranges[1])
+    ax.set_xlabel(x)
+    ax.set_ylabel(y)
+
+###############################################################################
+
+#                               Automatic Switch                              #
+
+###############################################################################
+
+'''
+This function draws a scatter plot of y against x, or its density when the data has more rows than "threshold".
+'''
+def scatter_or_density(data, x, y, hue=None, palette='viridis', threshold=DENSITY_ROW_THRESHOLD, ax=None, **scatter_kws):
+    ax = ax or plt.gca()
+    if len(data) > threshold:
+        density_plot(ax, data, x, y, hue, palette)
+    else:
+        sns.scatterplot(data=data, x=x, y=y, hue=hue, palette=palette, ax=ax, **scatter_kws)
+        if hue is not None:
+            ax.legend(title=hue, bbox_to_anchor=(1.05, 1), loc='upper left')
+    return ax
+
+'''
+This function draws a matrix of the pairwise relationships of the given columns: a histogram of each column on the diagonal and the density of
+each pair elsewhere. It is the density counterpart of sns.pairplot and returns its figure.
+'''
+def density_pairplot(data, columns, bins=PAIRPLOT_BINS):
+    figure, axes = plt.subplots(len(columns), len(columns), figsize=(2.5 * len(columns), 2.5 * len(columns)), squeeze=False)
+    values = {column: as_float_array(data[column]) for column in columns}
+    color = sns.color_palette()[0]
+
+    for row, y in enumerate(columns):
+        for col, x in enumerate(columns):
+            ax = axes[row][col]
+            if row == col:
+                finite = values[x][np.isfinite(values[x])]
+                counts, edges = np.histogram(finite, bins=20, range=value_range(finite))
+                ax.stairs(counts, edges, fill=True, color=color)
+            else:
+                ranges = (value_range(values[x]), value_range(values[y]))
+                counts, _ = density_grid(values[x], values[y], bins, ranges)
+                draw_density(ax, counts, ranges, color)
+            ax.set_xlabel(x if row == len(columns) - 1 else '')
+            ax.set_ylabel(y if col == 0 else '')
+
+    figure.tight_layout()
+    return figure
+
+'''
+This function draws a pair plot of the given columns with seaborn, or its density counterpart when the data has more rows than "threshold".
+'''
+def pairplot_or_density(data, columns, threshold=DENSITY_ROW_THRESHOLD, **pairplot_kws):
+    if len(data) > threshold:
+        return density_pairplot(data, columns)
+    return sns.pairplot(data[columns].astype('float64'), **pairplot_kws).figure
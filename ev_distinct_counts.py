@@ -0,0 +1,268 @@
+'''
+Approximate Distinct Counts:
+
+Overview:
+     "How many distinct models, makes, postal codes or VIN prefixes per county (or city, legislative district, model year)?" needs a groupby-nunique
+     over the whole frame, whose cost and memory grow with the data. This module answers it with HyperLogLog sketches: one array of 2^precision
+     small registers per group, whatever the number of rows or distinct values.
+     - Every value column is hashed once, in one vectorized pass: pd.util.hash_array gives a 64-bit hash per value (categorical columns hash their
+       categories only and pick the hash of each row by its code). The first "precision" bits of a hash choose a register, and the register keeps
+       the largest rank seen, the rank being the number of leading zeros of the remaining bits plus one. The leading zeros of all the hashes are
+       counted at once by smearing the highest set bit to the right and counting the set bits (popcount). The registers of all the groups are
+       updated with a single np.maximum.at call.
+     - The estimate is the standard HyperLogLog estimate (with linear counting for small cardinalities). Its relative standard error is
+       1.04 / sqrt(2^precision): about 1.6% with the default precision of 12 (4 KB per group and column).
+     - Sketches merge by taking the largest value of every register, so the sketches of separate months, files or shards (even with different
+       groups) are unioned without losing anything compared with a sketch of all their rows. save() and load() write and read a sketch as .npz.
+     streaming_distinct_counts() builds the sketches while reading the CSV file in chunks, so memory stays flat for any extract.
+
+Usage:
+     python ev_distinct_counts.py --group-by County --exact
+     python ev_distinct_counts.py --group-by "Model Year" --save sketches/2024-05
+     python ev_distinct_counts.py --group-by "Model Year" --merge sketches/2024-04 sketches/2024-05
+'''
+
+# Import necessary libraries:
+import argparse                        # for the command line interface
+import json                            # for the metadata of saved sketches
+import os                              # for the sketch files
+import time                            # for timing the reports
+import numpy as np                     # for the registers
+import pandas as pd                    # for hashing and grouping the values
+from ev_data_loader import DATASET_PATH, DATASET_SCHEMA, load_dataset   # for the dataset and its types
+
+# Columns whose distinct values are counted, and columns the counts are grouped by:
+DISTINCT_COLUMNS = ['VIN (1-10)', 'Model', 'Make', 'Postal Code']
+GROUP_COLUMNS = ['County', 'City', 'Legislative District', 'Model Year']
+
+# Default precision (number of index bits) of the sketches: 2^12 registers per group:
+PRECISION = 12
+
+# Number of set bits of every byte (for NumPy versions without np.bitwise_count):
+POPCOUNT_TABLE = np.array([bin(byte).count('1') for byte in range(256)], dtype=np.uint8)
+
+###############################################################################
+
+#                                    Hashing                                  #
+
+###############################################################################
+
+'''
+This function returns the 64-bit hash of every row of a column and a mask of the rows that hold a value. Values are hashed through their text, so
+a column hashes the same whether it is loaded as a categorical, a number or a string, and sketches of different sources can be merged.
+'''
+def hash_column(series):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes = series.cat.codes.to_numpy()
+        category_hashes = pd.util.hash_array(np.asarray(series.cat.categories.astype(str), dtype=object), categorize=False)
+        return category_hashes[np.maximum(codes, 0)], codes >= 0
+    # (hashing the values directly is faster than letting hash_array factorize them first, since most values are distinct)
+    present = series.notna().to_numpy()
+    hashes = np.zeros(len(series), dtype=np.uint64)
+    hashes[present] = pd.util.hash_array(np.asarray(series[present].astype(str), dtype=object), categorize=False)
+    return hashes, present
+
+# Number of set bits of every value of a uint64 array:
+def popcount(values):
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(values)
+    return POPCOUNT_TABLE[values.view(np.uint8)].reshape(len(values), 8).sum(axis=1)
+
+'''
+This function splits hashes into their register (the first "precision" bits) and their rank: the number of leading zeros of the other bits plus
+one. The leading zeros are counted by smearing the highest set bit over all the lower bits and counting the bits left unset.
+'''
+def register_ranks(hashes, precision=PRECISION):
+    registers = (hashes >> np.uint64(64 - precision)).astype(np.intp)
+    rest = hashes << np.uint64(precision)
+    for shift in (1, 2, 4, 8, 16, 32):
+        rest |= rest >> np.uint64(shift)
+    leading_zeros = 64 - popcount(rest).astype(np.int64)
+    return registers, np.minimum(leading_zeros, 64 - precision).astype(np.uint8) + 1
+
+###############################################################################
+
+#                                    Sketches                                 #
+
+###############################################################################
+
+'''
+This class holds one HyperLogLog sketch per group: a (groups x 2^precision) array of registers and the labels of the groups. It counts the distinct
+values of one column ("column") per value of another ("group_by", or a single group "All" when it is None).
+'''
+class GroupedHyperLogLog:
+    def __init__(self, column, group_by=None, precision=PRECISION):
+        self.column = column
+        self.group_by = group_by
+        self.precision = precision
+        self.labels = pd.Index([])
+        self.registers = np.zeros((0, 2 ** precision), dtype=np.uint8)
+
+    '''
+    This function adds the rows of a chunk: the hashes of the values (see hash_column) with the groups of the rows. Rows without a value or group
+    are skipped.
+    '''
+    def update(self, hashes, present, groups=None):
+        if groups is None:
+            codes, labels = np.zeros(len(hashes), dtype=np.intp), pd.Index(['All'])
+        else:
+            codes, labels = pd.factorize(groups, sort=True)
+            labels = pd.Index(np.asarray(labels))
+        keep = present & (codes >= 0)
+        registers, ranks = register_ranks(hashes[keep], self.precision)
+
+        chunk = GroupedHyperLogLog(self.column, self.group_by, self.precision)
+        chunk.labels = labels
+        chunk.registers = np.zeros((len(labels), 2 ** self.precision), dtype=np.uint8)
+        np.maximum.at(chunk.registers, (codes[keep], registers), ranks)
+        self.merge(chunk)
+
+    # Union with another sketch of the same column, grouping and precision (registers of the same group take their largest value):
+    def merge(self, other):
+        if (self.column, self.group_by, self.precision) != (other.column, other.group_by, other.precision):
+            raise ValueError("Only sketches of the same column, grouping and precision can be merged.")
+        labels = self.labels.union(other.labels) if len(self.labels) else other.labels
+        registers = np.zeros((len(labels), 2 ** self.precision), dtype=np.uint8)
+        for sketch in (self, other):
+            rows = labels.get_indexer(sketch.labels)
+            registers[rows] = np.maximum(registers[rows], sketch.registers)
+        self.labels, self.registers = labels, registers
+
+    '''
+    This function returns the estimated number of distinct values of every group: the HyperLogLog estimate alpha * m^2 / sum(2^-register), or
+    the linear counting estimate m * ln(m / empty registers) when it is below 2.5 m and some registers are still empty.
+    '''
+    def estimate(self):
+        m = 2 ** self.precision
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.exp2(-self.registers.astype(np.float64)), axis=1)
+        empty = np.count_nonzero(self.registers == 0, axis=1)
+        linear = m * np.log(m / np.maximum(empty, 1))
+        estimates = np.where((raw <= 2.5 * m) & (empty > 0), linear, raw)
+        return pd.Series(np.round(estimates).astype(np.int64), index=self.labels.rename(self.group_by), name=self.column)
+
+    # Relative standard error of the estimates:
+    def standard_error(self):
+        return 1.04 / np.sqrt(2 ** self.precision)
+
+    '''
+    This function saves the sketch to a .npz file: the registers and, as JSON, the column, grouping, precision and group labels.
+    '''
+    def save(self, path):
+        metadata = {'column': self.column, 'group_by': self.group_by, 'precision': self.precision, 'labels': self.labels.tolist()}
+        np.savez_compressed(path, registers=self.registers, metadata=np.array(json.dumps(metadata, default=int)))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            metadata = json.loads(str(data['metadata']))
+            sketch = cls(metadata['column'], metadata['group_by'], metadata['precision'])
+            sketch.labels = pd.Index(metadata['labels'])
+            sketch.registers = data['registers']
+        return sketch
+
+###############################################################################
+
+#                                 Distinct Counts                             #
+
+###############################################################################
+
+'''
+This function builds one sketch per value column from a DataFrame (or a chunk of the CSV file), hashing every column once, and merges them into
+the given sketches when there are any.
+'''
+def build_sketches(df, group_by=None, columns=DISTINCT_COLUMNS, precision=PRECISION, sketches=None):
+    sketches = sketches if sketches is not None else {column: GroupedHyperLogLog(column, group_by, precision) for column in columns}
+    groups = None if group_by is None else df[group_by]
+    for column in columns:
+        hashes, present = hash_column(df[column])
+        sketches[column].update(hashes, present, groups)
+    return sketches
+
+'''
+This function turns sketches into a table of estimated distinct counts: one row per group and one column per value column.
+'''
+def estimates_table(sketches):
+    return pd.DataFrame({column: sketch.estimate() for column, sketch in sketches.items()}).fillna(0).astype('int64')
+
+'''
+This function estimates the number of distinct values of each column per group of a loaded DataFrame.
+'''
+def distinct_counts(df, group_by=None, columns=DISTINCT_COLUMNS, precision=PRECISION):
+    return estimates_table(build_sketches(df, group_by, columns, precision))
+
+'''
+This function builds the sketches while reading the CSV file in chunks (only one chunk and the sketches are in memory at any time) and returns
+them, so they can be saved or merged with those of other files.
+'''
+def streaming_distinct_counts(path=DATASET_PATH, group_by=None, columns=DISTINCT_COLUMNS, chunksize=100_000, precision=PRECISION):
+    sketches = {column: GroupedHyperLogLog(column, group_by, precision) for column in columns}
+    usecols = list(dict.fromkeys([*columns, *([group_by] if group_by else [])]))
+    dtypes = {column: DATASET_SCHEMA[column] for column in usecols if column in DATASET_SCHEMA}
+    for chunk in pd.read_csv(path, usecols=usecols, dtype=dtypes, chunksize=chunksize):
+        build_sketches(chunk, group_by, columns, precision, sketches)
+    return sketches
+
+# File of the sketch of one column inside a directory of saved sketches:
+def sketch_file(directory, column):
+    return os.path.join(directory, column.replace(' ', '_').replace('(', '').replace(')', '') + '.npz')
+
+###############################################################################
+
+#                                 Command Line                                #
+
+###############################################################################
+
+'''
+The main function builds the sketches of the dataset (streaming it in chunks) or unions saved sketches, prints the estimated distinct counts per
+group, optionally next to the exact counts of a groupby-nunique, and can save the sketches for later unions.
+'''
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Estimate the distinct models, makes, postal codes and VIN prefixes per region with HyperLogLog.')
+    parser.add_argument('--data', default=DATASET_PATH, help='path of the dataset CSV file')
+    parser.add_argument('--group-by', default='County', help=f"column to group by (one of {', '.join(GROUP_COLUMNS)}, or 'none')")
+    parser.add_argument('--columns', nargs='+', default=DISTINCT_COLUMNS, help='columns whose distinct values are counted')
+    parser.add_argument('--precision', type=int, default=PRECISION, help='index bits of the sketches (4 to 18)')
+    parser.add_argument('--chunksize', type=int, default=100_000, help='rows read from the CSV file at a time')
+    parser.add_argument('--merge', nargs='+', default=None, metavar='DIRECTORY', help='union saved sketches instead of reading the dataset')
+    parser.add_argument('--save', default=None, metavar='DIRECTORY', help='directory to save the sketches to')
+    parser.add_argument('--exact', action='store_true', help='also compute the exact counts (groupby-nunique) for comparison')
+    args = parser.parse_args(argv)
+    group_by = None if args.group_by.lower() == 'none' else args.group_by
+    if not 4 <= args.precision <= 18:
+        parser.error('--precision must be between 4 and 18.')
+
+    start = time.perf_counter()
+    if args.merge:
+        sketches = {column: GroupedHyperLogLog.load(sketch_file(args.merge[0], column)) for column in args.columns}
+        for directory in args.merge[1:]:
+            for column in args.columns:
+                sketches[column].merge(GroupedHyperLogLog.load(sketch_file(directory, column)))
+    else:
+        sketches = streaming_distinct_counts(args.data, group_by, args.columns, args.chunksize, args.precision)
+    estimates = estimates_table(sketches)
+    seconds = time.perf_counter() - start
+
+    print(f"Estimated distinct values per {group_by or 'dataset'} (relative standard error "
+          f"{next(iter(sketches.values())).standard_error():.1%}, {seconds:.2f}s):")
+    print(estimates.to_string())
+
+    if args.exact and not args.merge:
+        df = load_dataset(args.data, list(dict.fromkeys([*args.columns, *([group_by] if group_by else [])])))
+        exact = df.groupby(group_by, observed=True)[args.columns].nunique() if group_by else df[args.columns].nunique().to_frame('All').T
+        errors = (estimates - exact.reindex(estimates.index).to_numpy()).abs() / exact.reindex(estimates.index).clip(lower=1).to_numpy()
+        print("\nExact distinct values:")
+        print(exact.to_string())
+        print("\nLargest relative error per column:")
+        print(errors.max().to_string())
+
+    if args.save:
+        os.makedirs(args.save, exist_ok=True)
+        for column, sketch in sketches.items():
+            sketch.save(sketch_file(args.save, column))
+        print(f"\nSketches saved to {args.save}")
+    return 0
+
+# Run the main function
+if __name__ == "__main__":
+    raise SystemExit(main())
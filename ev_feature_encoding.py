@@ -0,0 +1,178 @@
+'''
+Sparse Feature Encoding:
+
+Overview:
+     This module one-hot encodes categorical features (Make and Model by default) into a compressed sparse row (CSR) matrix instead of the dense
+     frame of boolean columns produced by pd.get_dummies. Every row has at most one non-zero per encoded feature, so the memory and the file size
+     grow with the number of rows and not with rows x categories. The category-to-column vocabulary is stable (sorted) and can be saved to JSON and
+     reused to encode new data with exactly the same columns. The matrix is written to a .npz file using the same layout as scipy.sparse.save_npz,
+     so downstream jobs can load it with scipy.sparse.load_npz or with load_encoding() below.
+'''
+
+# Import necessary libraries:
+import json                            # for saving the vocabulary
+import numpy as np                     # for numerical operations
+import pandas as pd                    # for data manipulation
+
+# Default categorical features to encode and the column identifying each row:
+ENCODED_FEATURES = ['Make', 'Model']
+ROW_KEY = 'DOL Vehicle ID'
+
+###############################################################################
+
+#                                  Vocabulary                                 #
+
+###############################################################################
+
+'''
+This function builds the vocabulary of the encoding: for each feature, the sorted list of its distinct non-missing values. The position of a value
+in the vocabulary (plus the offset of its feature) is the index of its one-hot column.
+'''
+def build_vocabulary(df, features=ENCODED_FEATURES):
+    vocabulary = {}
+    for feature in features:
+        values = df[feature].dropna().unique()
+        vocabulary[feature] = sorted(str(value) for value in values)
+    return vocabulary
+
+'''
+This function returns the names of the one-hot columns of a vocabulary, using the same "<feature>_<value>" naming as pd.get_dummies.
+'''
+def vocabulary_columns(vocabulary):
+    return [f"{feature}_{value}" for feature, values in vocabulary.items() for value in values]
+
+'''
+These functions save a vocabulary to a JSON file and load it back, so that new data can be encoded with the columns of an earlier run.
+'''
+def save_vocabulary(vocabulary, path):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(vocabulary, file, indent=2)
+
+def load_vocabulary(path):
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+###############################################################################
+
+#                                Sparse Encoding                              #
+
+###############################################################################
+
+'''
+This class holds a one-hot encoding in CSR form: "indptr" gives, for each row, the range of its entries in "indices" (the one-hot column numbers),
+and "data" holds the values of those entries (always 1). The row keys and the vocabulary are kept with the matrix so the encoding can be joined back
+to the dataset and reused on new data.
+'''
+class SparseEncoding:
+    def __init__(self, indptr, indices, data, shape, vocabulary, row_keys=None):
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.shape = tuple(shape)
+        self.vocabulary = vocabulary
+        self.row_keys = row_keys
+
+    @property
+    def columns(self):
+        return vocabulary_columns(self.vocabulary)
+
+    @property
+    def nnz(self):
+        return len(self.indices)
+
+    @property
+    def nbytes(self):
+        row_keys_bytes = 0 if self.row_keys is None else self.row_keys.nbytes
+        return self.indptr.nbytes + self.indices.nbytes + self.data.nbytes + row_keys_bytes
+
+    # Expand the first rows into a dense DataFrame (for display only):
+    def head(self, n=5):
+        n = min(n, self.shape[0])
+        dense = np.zeros((n, self.shape[1]), dtype=np.uint8)
+        for row in range(n):
+            dense[row, self.indices[self.indptr[row]:self.indptr[row + 1]]] = self.data[self.indptr[row]:self.indptr[row + 1]]
+        index = None if self.row_keys is None else pd.Index(self.row_keys[:n], name=ROW_KEY)
+        return pd.DataFrame(dense, columns=self.columns, index=index)
+
+    # Convert to a scipy.sparse CSR matrix (scipy is only needed for this conversion):
+    def to_scipy(self):
+        from scipy import sparse
+        return sparse.csr_matrix((self.data, self.indices, self.indptr), shape=self.shape)
+
+'''
+This function one-hot encodes the given features of a DataFrame into a SparseEncoding using a vocabulary (built from the data when none is given).
+The column of each value is found with one vectorized categorical lookup per feature; values that are missing or not in the vocabulary get no
+column, and their count is returned so unseen categories in new data can be reported.
+'''
+def sparse_one_hot(df, vocabulary=None, row_key=ROW_KEY):
+    if vocabulary is None:
+        vocabulary = build_vocabulary(df)
+    features = list(vocabulary)
+
+    # Look up the one-hot column of every value, feature by feature (-1 for missing or unknown values):
+    codes = np.empty((len(df), len(features)), dtype=np.int32)
+    unknown = {}
+    offset = 0
+    for position, feature in enumerate(features):
+        values = df[feature].astype('string')
+        feature_codes = pd.Categorical(values, categories=vocabulary[feature]).codes.astype(np.int32)
+        unknown[feature] = int(((feature_codes < 0) & values.notna().to_numpy()).sum())
+        codes[:, position] = np.where(feature_codes >= 0, feature_codes + offset, -1)
+        offset += len(vocabulary[feature])
+
+    # Keep the valid entries in row-major order, which is exactly the CSR layout:
+    valid = codes >= 0
+    indices = codes[valid]
+    indptr = np.zeros(len(df) + 1, dtype=np.int32 if valid.sum() < np.iinfo(np.int32).max else np.int64)
+    np.cumsum(valid.sum(axis=1), out=indptr[1:])
+    data = np.ones(len(indices), dtype=np.uint8)
+
+    row_keys = df[row_key].to_numpy() if row_key in df.columns else None
+    encoding = SparseEncoding(indptr, indices, data, (len(df), offset), vocabulary, row_keys)
+
+    return encoding, unknown
+
+###############################################################################
+
+#                                Saving / Loading                             #
+
+###############################################################################
+
+'''
+This function writes a SparseEncoding to a compressed .npz file (with the same keys as scipy.sparse.save_npz, plus the row keys) and writes its
+vocabulary to a JSON file next to it.
+'''
+def save_encoding(encoding, path, vocabulary_path=None):
+    arrays = {
+        'indices': encoding.indices,
+        'indptr': encoding.indptr,
+        'format': np.array(b'csr'),
+        'shape': np.array(encoding.shape),
+        'data': encoding.data,
+    }
+    if encoding.row_keys is not None:
+        arrays['row_keys'] = encoding.row_keys
+    np.savez_compressed(path, **arrays)
+
+    # Save the vocabulary next to the matrix:
+    if vocabulary_path is None:
+        vocabulary_path = vocabulary_path_for(path)
+    save_vocabulary(encoding.vocabulary, vocabulary_path)
+
+'''
+This function reads a SparseEncoding written by save_encoding().
+'''
+def load_encoding(path, vocabulary_path=None):
+    if vocabulary_path is None:
+        vocabulary_path = vocabulary_path_for(path)
+    with np.load(path) as arrays:
+        row_keys = arrays['row_keys'] if 'row_keys' in arrays.files else None
+        return SparseEncoding(arrays['indptr'], arrays['indices'], arrays['data'], arrays['shape'],
+                              load_vocabulary(vocabulary_path), row_keys)
+
+'''
+This function returns the default vocabulary file of an encoding file ("<name>.npz" -> "<name>_vocabulary.json").
+'''
+def vocabulary_path_for(path):
+    stem = path[:-4] if path.endswith('.npz') else path
+    return stem + '_vocabulary.json'
@@ -0,0 +1,98 @@
+'''
+Figure Cache:
+
+Overview:
+     The heaviest figures of the analyses (stacked bars over every city and county, trends over every model) are redrawn on every run, even when the
+     counts behind them have not changed. This module keeps the rendered images of such figures in a cache directory, keyed by a SHA-256 hash of the
+     aggregated table a figure is drawn from and of everything else that changes its look: the plot parameters given by the caller, the matplotlib
+     style in effect (the rcParams that affect a PNG image) and the matplotlib version. A changed count or parameter gives a new key, so an entry never needs invalidating, while
+     an unchanged figure is served from its PNG files without being drawn again. Each entry is a small JSON index of the PNG files of its figures
+     (several when a figure is paged), written last so a half-written entry is never used.
+'''
+
+# Import necessary libraries:
+import hashlib                         # for the cache keys
+import json                            # for the entry indexes
+import os                              # for the cache paths
+import pandas as pd                    # for hashing the aggregated tables
+from ev_lazy_imports import lazy_import   # for importing matplotlib on first use
+
+# matplotlib, imported on first use (only by the parts that plot):
+matplotlib = lazy_import('matplotlib')   # for the style and version in the cache keys
+
+# Where cached figures are kept, and whether the cache is used at all:
+FIGURE_CACHE = {'directory': 'figure_cache', 'enabled': True}
+
+# Version of the cache layout, bumped whenever the cached content changes meaning:
+CACHE_FORMAT_VERSION = 1
+
+# rcParams left out of the cache keys (by name prefix): settings of the backend, the window and the interactive tools, and of the output formats
+# other than PNG, none of which change a PNG image:
+NON_VISUAL_RCPARAMS = ('backend', 'interactive', 'toolbar', 'webagg.', 'savefig.directory', 'figure.raise_window', 'keymap.', 'tk.', 'macosx.',
+                       'animation.', 'pdf.', 'ps.', 'svg.', 'pgf.', 'docstring.')
+
+###############################################################################
+
+#                                   Cache Keys                                #
+
+###############################################################################
+
+'''
+This function returns the cache key of a figure: a SHA-256 hash of the aggregated table (or Series) it is drawn from, index and column labels
+included, and of its plot parameters, the matplotlib style in effect (without NON_VISUAL_RCPARAMS) and the matplotlib version.
+'''
+def figure_key(table, parameters):
+    table = table.to_frame() if isinstance(table, pd.Series) else table
+    digest = hashlib.sha256()
+    digest.update(pd.util.hash_pandas_object(table, index=True).to_numpy().tobytes())
+    description = {
+        'format': CACHE_FORMAT_VERSION,
+        'columns': [str(column) for column in table.columns],
+        'dtypes': [str(dtype) for dtype in table.dtypes],
+        'parameters': parameters,
+        'style': sorted((name, repr(value)) for name, value in matplotlib.rcParams.items() if not name.startswith(NON_VISUAL_RCPARAMS)),
+        'matplotlib': matplotlib.__version__,
+    }
+    digest.update(json.dumps(description, sort_keys=True, default=repr).encode('utf-8'))
+    return digest.hexdigest()
+
+###############################################################################
+
+#                                  Cache Entries                              #
+
+###############################################################################
+
+# Path of the index of a cache entry:
+def index_path(key):
+    return os.path.join(FIGURE_CACHE['directory'], key + '.json')
+
+'''
+This function returns the PNG files cached for a key, or None when the key has no complete entry (or the cache is disabled).
+'''
+def cached_files(key):
+    if not FIGURE_CACHE['enabled']:
+        return None
+    try:
+        with open(index_path(key), encoding='utf-8') as file:
+            names = json.load(file)['files']
+    except (OSError, ValueError, KeyError):
+        return None
+    files = [os.path.join(FIGURE_CACHE['directory'], name) for name in names]
+    return files if all(os.path.exists(path) for path in files) else None
+
+'''
+This function saves figures as the PNG files of a cache entry (one per figure, cropped like the saved figures of the analyses) and returns their
+paths. The index is written last, under a temporary name, so an interrupted run never leaves an entry that points to missing files.
+'''
+def store_figures(key, figures):
+    os.makedirs(FIGURE_CACHE['directory'], exist_ok=True)
+    names = []
+    for number, figure in enumerate(figures, 1):
+        names.append(f"{key}_{number:02d}.png")
+        figure.savefig(os.path.join(FIGURE_CACHE['directory'], names[-1]), bbox_inches='tight')
+
+    building = index_path(key) + '.tmp'
+    with open(building, 'w', encoding='utf-8') as file:
+        json.dump({'format': CACHE_FORMAT_VERSION, 'files': names}, file)
+    os.replace(building, index_path(key))
+    return [os.path.join(FIGURE_CACHE['directory'], name) for name in names]
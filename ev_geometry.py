@@ -0,0 +1,177 @@
+'''
+Geometry Store:
+
+Overview:
+     This module parses the Census boundary files used for the choropleth maps once, and keeps them ready for fast redraws:
+     - Every boundary file is indexed by its FIPS code (5 digits for counties, 11 digits for census tracts), as an integer.
+     - Simplified copies of the geometries are prepared at several tolerances (in degrees), since a state-wide map does not need every vertex of
+       the 5m / 500k boundary files.
+     - The indexed and simplified GeoDataFrames are cached as GeoParquet files next to the source file (rebuilt when the source changes) and kept
+       in memory for the rest of the session, so a redraw never parses the JSON again.
+     The EVs are joined to the regions through the "2020 Census Tract" column: its first 5 digits are the county FIPS code, and the full 11 digits
+     are the tract FIPS code. Counts are aligned to the boundaries through the FIPS index instead of a merge on names.
+'''
+
+# Import necessary libraries:
+import json                            # for the cache metadata file
+import os                              # for file sizes, times and paths
+import numpy as np                     # for numerical operations
+import pandas as pd                    # for data manipulation
+from ev_data_loader import cache_available, file_hash   # for hashing the source file and checking the Parquet engine
+from ev_lazy_imports import lazy_import                 # for importing geopandas only when a map is drawn
+
+# geopandas (with shapely and pyproj) is imported on first use, so importing this module stays cheap:
+gpd = lazy_import('geopandas')         # for reading and plotting the boundaries
+
+# Default boundary files of each level (Census cartographic boundary files):
+BOUNDARY_FILES = {
+    'county': 'gz_2010_us_050_00_5m.json',
+    'tract': 'cb_2020_53_tract_500k.shp',
+}
+
+# Number of digits of the FIPS code of each level (taken from the start of the 11-digit census tract):
+FIPS_DIGITS = {'county': 5, 'tract': 11}
+
+# Simplification tolerances prepared for every boundary file (0 keeps the original geometries):
+SIMPLIFY_TOLERANCES = (0.0, 0.005, 0.02)
+
+# Boundaries already loaded in this session: (path, tolerance) -> GeoDataFrame:
+_STORE = {}
+
+###############################################################################
+
+#                                  Boundaries                                 #
+
+###############################################################################
+
+'''
+This function returns the FIPS code of every region of a boundary file as an integer. Newer files have a GEOID column with the code itself; older
+ones (like the gz_2010 files) have a GEO_ID column such as "0500000US53033" whose part after "US" is the code.
+'''
+def boundary_fips(gdf):
+    if 'GEOID' in gdf.columns:
+        codes = gdf['GEOID'].astype(str)
+    else:
+        codes = gdf['GEO_ID'].astype(str).str.split('US').str[-1]
+    return pd.to_numeric(codes, errors='coerce').astype('Int64')
+
+'''
+This function returns the paths of the cached copy of a boundary file at one tolerance and of the cache metadata.
+'''
+def store_paths(path, tolerance):
+    stem = os.path.splitext(path)[0]
+    return f"{stem}.simplified-{tolerance:g}.parquet", stem + '.geometry.json'
+
+'''
+This function checks whether the cached copies of a boundary file still match the source file (same size and modification time, or same content).
+'''
+def store_is_valid(path):
+    _, meta_path = store_paths(path, 0)
+    if not os.path.exists(meta_path):
+        return False
+    with open(meta_path, encoding='utf-8') as file:
+        metadata = json.load(file)
+    if metadata.get('tolerances') != list(SIMPLIFY_TOLERANCES):
+        return False
+    if not all(os.path.exists(store_paths(path, tolerance)[0]) for tolerance in SIMPLIFY_TOLERANCES):
+        return False
+    stat = os.stat(path)
+    if metadata.get('size') == stat.st_size and metadata.get('mtime_ns') == stat.st_mtime_ns:
+        return True
+    return metadata.get('size') == stat.st_size and metadata.get('sha256') == file_hash(path)
+
+'''
+This function parses a boundary file, indexes it by FIPS code, prepares the simplified copies and caches them (when a Parquet engine is installed).
+It returns the copies by tolerance.
+'''
+def build_store(path):
+    gdf = gpd.read_file(path)
+    gdf.index = pd.Index(boundary_fips(gdf), name='FIPS')
+    gdf = gdf[gdf.index.notna()]
+
+    # Prepare the simplified copies:
+    copies = {}
+    for tolerance in SIMPLIFY_TOLERANCES:
+        simplified = gdf.copy()
+        if tolerance:
+            simplified['geometry'] = simplified.geometry.simplify(tolerance, preserve_topology=True)
+        copies[tolerance] = simplified
+
+    # Cache them next to the source file:
+    if cache_available():
+        for tolerance, simplified in copies.items():
+            simplified.to_parquet(store_paths(path, tolerance)[0])
+        stat = os.stat(path)
+        with open(store_paths(path, 0)[1], 'w', encoding='utf-8') as file:
+            json.dump({'source': os.path.basename(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                       'sha256': file_hash(path), 'tolerances': list(SIMPLIFY_TOLERANCES)}, file, indent=2)
+
+    return copies
+
+'''
+This function returns the boundaries of a level ("county" or "tract") indexed by FIPS code, simplified with the closest prepared tolerance. They come
+from memory when already loaded in this session, otherwise from the GeoParquet cache, and the boundary file is only parsed when neither is available.
+'''
+def load_boundaries(level='county', tolerance=0.005, path=None):
+    path = path or BOUNDARY_FILES[level]
+    tolerance = min(SIMPLIFY_TOLERANCES, key=lambda prepared: abs(prepared - tolerance))
+    if (path, tolerance) in _STORE:
+        return _STORE[(path, tolerance)]
+
+    # Read the cached copy, or parse and prepare the boundary file:
+    if cache_available() and store_is_valid(path):
+        gdf = gpd.read_parquet(store_paths(path, tolerance)[0])
+        _STORE[(path, tolerance)] = gdf
+    else:
+        for prepared, gdf in build_store(path).items():
+            _STORE[(path, prepared)] = gdf
+
+    return _STORE[(path, tolerance)]
+
+###############################################################################
+
+#                                 Region Counts                               #
+
+###############################################################################
+
+'''
+This function returns the FIPS code of the region of every EV, derived from its 2020 census tract (missing when the tract is missing).
+'''
+def region_fips(df, level='county'):
+    tracts = df['2020 Census Tract']
+    return tracts // 10 ** (FIPS_DIGITS['tract'] - FIPS_DIGITS[level])
+
+'''
+This function counts the EVs of every region of a level, indexed by FIPS code.
+'''
+def region_counts(df, level='county'):
+    return region_fips(df, level).value_counts().rename('Number_of_EVs')
+
+'''
+This function returns the state FIPS codes of the regions with EVs (the first 2 digits of their FIPS codes).
+'''
+def count_states(counts, level='county'):
+    return np.unique(counts.index.to_numpy(dtype='int64') // 10 ** (FIPS_DIGITS[level] - 2))
+
+'''
+This function attaches the EV counts to the boundaries through their FIPS index (regions without EVs get 0). With "state_fips" (one state FIPS
+code, for example 53 for Washington, or a list of them) only the regions of those states are kept.
+'''
+def join_counts(boundaries, counts, level='county', state_fips=None):
+    gdf = boundaries
+    if state_fips is not None:
+        gdf = gdf[np.isin(np.asarray(gdf.index // 10 ** (FIPS_DIGITS[level] - 2)), np.atleast_1d(state_fips))]
+    gdf = gdf.copy()
+    gdf['Number_of_EVs'] = counts.reindex(gdf.index).fillna(0).to_numpy()
+    return gdf
+
+'''
+This function draws the choropleth map of the EV counts of a level on the given axes, using the cached (and simplified) boundaries. The map
+covers every state with EVs in the data, unless "state_fips" restricts it to some states (see join_counts()).
+'''
+def plot_choropleth(df, ax, level='county', tolerance=0.005, state_fips=None, path=None, cmap='viridis'):
+    counts = region_counts(df, level)
+    state_fips = count_states(counts, level) if state_fips is None else state_fips
+    gdf = join_counts(load_boundaries(level, tolerance, path), counts, level, state_fips)
+    gdf.plot(column='Number_of_EVs', cmap=cmap, linewidth=0.4, ax=ax, edgecolor='0.8', legend=True)
+    return gdf
@@ -0,0 +1,124 @@
+'''
+Streaming Heavy Hitters:
+
+Overview:
+     The top cities, counties, makes and models of the analyses come from value_counts(), which holds the exact count of every distinct value in
+     memory. On national-scale extracts the number of distinct cities, postal codes or models grows with the data, so this module ranks them in
+     bounded memory while the CSV file is read in chunks, with two mergeable accumulators per column:
+     - A Misra-Gries summary (the deterministic counterpart of Space-Saving; the two keep the same counters) of at most "capacity" counters. Each
+       chunk is counted exactly with one value_counts() call and added to the counters; when more than "capacity" values are counted, the
+       (capacity + 1)-th largest count is subtracted from every counter and the counters that drop to zero are removed. The amounts subtracted are
+       added up in "decrement", so the count kept for a value is a lower bound of its true count and the true count is at most decrement more.
+       decrement never exceeds rows / (capacity + 1), and any value with a larger true count is guaranteed to be kept.
+     - A count-min sketch of the same values (a "depth" x "width" table of counters updated at one hashed column per row), whose estimate of a
+       value is never below its true count. It tightens the upper bound of the kept values: min(count + decrement, count-min estimate).
+     top() ranks the kept values by their lower bound and flags the values that are guaranteed to belong to the top N: their lower bound is at least
+     the upper bound of every value ranked below them (kept or not). When the column has at most "capacity" distinct values nothing is subtracted,
+     so the counts are exact and equal to value_counts(). Summaries built on separate shards (files or chunks read by separate processes) combine
+     with merge() with the same guarantees, as long as they were created with the same settings.
+'''
+
+# Import necessary libraries:
+import numpy as np                     # for numerical operations
+import pandas as pd                    # for counting the values of a chunk and hashing them
+
+# Default number of counters of a summary, and size of the count-min sketch:
+CAPACITY = 1000
+SKETCH_WIDTH = 2 ** 14
+SKETCH_DEPTH = 4
+
+###############################################################################
+
+#                                 Accumulators                                #
+
+###############################################################################
+
+'''
+This class is a count-min sketch of the counts of a stream of values. Row r hashes every value with its own hash key (pd.util.hash_array) to one
+of "width" columns, and the estimate of a value is the smallest of its "depth" counters, which is never below its true count (and above it by
+at most e/width of the rows with probability 1 - exp(-depth)).
+'''
+class CountMinSketch:
+    def __init__(self, width=SKETCH_WIDTH, depth=SKETCH_DEPTH):
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype=np.int64)
+
+    # Column of every value in each row of the table (hash keys are 16 characters long):
+    def _columns(self, values):
+        values = np.asarray(values, dtype=object)
+        return [pd.util.hash_array(values, hash_key=f"ev-count-min-{row:03d}") % self.width for row in range(self.depth)]
+
+    # Add the counts of a Series indexed by value:
+    def update_counts(self, counts):
+        for row, columns in enumerate(self._columns(counts.index)):
+            np.add.at(self.table[row], columns.astype(np.intp), counts.to_numpy(dtype=np.int64))
+
+    def merge(self, other):
+        if (self.width, self.depth) != (other.width, other.depth):
+            raise ValueError("Only count-min sketches of the same width and depth can be merged.")
+        self.table += other.table
+
+    def estimate(self, values):
+        if len(values) == 0:
+            return np.zeros(0, dtype=np.int64)
+        return np.min([self.table[row][columns.astype(np.intp)] for row, columns in enumerate(self._columns(values))], axis=0)
+
+'''
+This class keeps the heavy hitters of one column: a Misra-Gries summary of at most "capacity" counters with the total it subtracted, backed by a
+count-min sketch of the same values. Missing values are not counted, like value_counts().
+'''
+class HeavyHitters:
+    def __init__(self, capacity=CAPACITY, width=SKETCH_WIDTH, depth=SKETCH_DEPTH):
+        self.capacity = capacity
+        self.count = 0
+        self.decrement = 0
+        self.counters = pd.Series(dtype='int64')
+        self.backstop = CountMinSketch(width, depth)
+
+    def update(self, values):
+        counts = pd.Series(values).value_counts()
+        # (categorical columns also list their categories that do not occur in the chunk)
+        counts = counts[counts > 0]
+        counts.index = counts.index.astype(object)
+        self.count += int(counts.sum())
+        self.backstop.update_counts(counts)
+        self._add(counts)
+
+    def merge(self, other):
+        if self.capacity != other.capacity:
+            raise ValueError("Only heavy hitter summaries of the same capacity can be merged.")
+        self.count += other.count
+        self.decrement += other.decrement
+        self.backstop.merge(other.backstop)
+        self._add(other.counters)
+
+    # Add counts to the counters, then subtract the (capacity + 1)-th largest count when there are too many counters:
+    def _add(self, counts):
+        combined = self.counters.add(counts, fill_value=0).astype('int64')
+        if len(combined) > self.capacity:
+            cut = int(np.partition(combined.to_numpy(), len(combined) - self.capacity - 1)[len(combined) - self.capacity - 1])
+            combined = combined[combined > cut] - cut
+            self.decrement += cut
+        self.counters = combined
+
+    # Guaranteed bound on the error of every count, as a number of rows and as a fraction of the rows:
+    def error_bound(self):
+        return self.decrement
+
+    def relative_error_bound(self):
+        return self.decrement / self.count if self.count else 0.0
+
+    '''
+    This function returns the top n values by count, from the largest to the smallest: their count (a lower bound of the true count, exact when
+    nothing was subtracted), an upper bound of their true count, and whether they are guaranteed to belong to the true top n.
+    '''
+    def top(self, n=20):
+        ranked = self.counters.sort_values(ascending=False, kind='stable')
+        lower = ranked.to_numpy()
+        upper = np.minimum(lower + self.decrement, self.backstop.estimate(ranked.index))
+
+        # Highest count any value ranked below the top n can have (decrement for the values no longer kept):
+        outside = max(int(upper[n:].max(initial=0)), self.decrement)
+        return pd.DataFrame({'Count': lower[:n], 'Upper Bound': upper[:n], 'Guaranteed': lower[:n] >= outside},
+                            index=pd.Index(ranked.index[:n], name=ranked.index.name))
@@ -0,0 +1,169 @@
+'''
+Start-up Time Measurement:
+
+Overview:
+     This script measures how long the analysis script takes to start, each time in a fresh Python interpreter (so nothing is already imported):
+     - the import of assignment1_1212214, with its slowest direct imports as reported by Python's own "-X importtime" option,
+     - for each requested part, the time from the start of the interpreter until the part begins (imports and loading its columns), the time of the
+       part itself, and which of the heavy plotting and geospatial libraries (matplotlib, seaborn, geopandas, scipy) were imported by the end.
+     The text-only parts (3, 4 and 5) should start in under a second and never import the heavy libraries; the script exits with a non-zero status
+     when a part takes longer than the target to start. Plotting parts are run with the non-GUI "Agg" backend and their figures are saved to a
+     temporary directory, like the other files the parts write.
+
+Usage:
+     python ev_import_time.py
+     python ev_import_time.py 3 4 5 6 --target 1.0 --top 15
+'''
+
+# Import necessary libraries:
+import argparse                        # for the command line interface
+import json                            # for the measurements printed by the child interpreter
+import os                              # for the dataset path and the environment of the child interpreter
+import subprocess                      # for running every measurement in a fresh interpreter
+import sys                             # for the path of the Python interpreter
+import tempfile                        # for the files written by the parts
+import time                            # for the start time of the child interpreter
+
+from ev_benchmark import link_boundary_files   # for the boundary files of the spatial analysis
+from ev_data_loader import DATASET_PATH        # for the default dataset
+
+# Module whose import is measured:
+MAIN_MODULE = 'assignment1_1212214'
+
+# Parts measured by default (the parts that only print and write CSV files):
+TEXT_PARTS = ('3', '4', '5')
+
+# Libraries that only the plotting (and map) parts should import:
+HEAVY_MODULES = ('matplotlib', 'seaborn', 'geopandas', 'shapely', 'pyproj', 'scipy')
+
+# Start-up time (in seconds) that a part should stay under:
+TARGET_SECONDS = 1.0
+
+# Code run by the child interpreter to measure one part (the start time of the process is passed in by the parent):
+PART_CODE = '''
+import contextlib, io, json, sys, time
+started = time.time()
+import assignment1_1212214 as analysis
+from ev_data_loader import load_dataset
+imported = time.time()
+analysis.FIGURE_OUTPUT['directory'] = sys.argv[3]
+df = load_dataset(sys.argv[2], analysis.ANALYSIS_COLUMNS[sys.argv[1]])
+loaded = time.time()
+with contextlib.redirect_stdout(io.StringIO()):
+    analysis.ANALYSES[sys.argv[1]][1](df)
+finished = time.time()
+print(json.dumps({'started': started, 'imported': imported, 'loaded': loaded, 'finished': finished,
+                  'modules': [name for name in sys.argv[4].split(',') if name in sys.modules]}))
+'''
+
+###############################################################################
+
+#                                 Measurements                                #
+
+###############################################################################
+
+'''
+This function runs Python code in a fresh interpreter started in "directory" (with this repository on its module path and the Agg backend) and
+returns the completed process and the time.time() just before it was started.
+'''
+def run_fresh(arguments, directory):
+    environment = dict(os.environ, MPLBACKEND='Agg')
+    environment['PYTHONPATH'] = os.pathsep.join(filter(None, [os.path.dirname(os.path.abspath(__file__)), os.environ.get('PYTHONPATH')]))
+    launched = time.time()
+    process = subprocess.run([sys.executable, *arguments], cwd=directory, env=environment, capture_output=True, text=True)
+    if process.returncode != 0:
+        raise RuntimeError(f"The measurement failed:\n{process.stderr}")
+    return process, launched
+
+'''
+This function parses the report of "python -X importtime" and returns the cumulative import time (in seconds) of the imports at one nesting depth
+(0 for the top-level imports, 1 for the modules those import directly, ...), from the slowest to the fastest.
+'''
+def parse_importtime(report, depth=0):
+    times = {}
+    for line in report.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # The report indents every nested import by two spaces per level, after the separating space:
+        name = name[1:]
+        if (len(name) - len(name.lstrip(' '))) // 2 == depth:
+            times[name.strip()] = int(cumulative) / 1e6
+    return sorted(times.items(), key=lambda item: item[1], reverse=True)
+
+'''
+This function measures the import of a module in a fresh interpreter: its total time, the slowest of the imports it makes directly, and which
+heavy libraries it imported.
+'''
+def measure_import(module=MAIN_MODULE, directory='.', top=10):
+    code = f"import sys, json; import {module}; print(json.dumps([name for name in {list(HEAVY_MODULES)!r} if name in sys.modules]))"
+    process, _ = run_fresh(['-X', 'importtime', '-c', code], directory)
+    direct = parse_importtime(process.stderr, depth=1)
+    return {
+        'module': module,
+        'seconds': round(dict(parse_importtime(process.stderr)).get(module, 0.0), 3),
+        'modules': json.loads(process.stdout.splitlines()[-1]),
+        'slowest': [(name, round(seconds, 3)) for name, seconds in direct[:top]],
+    }
+
+'''
+This function runs one part in a fresh interpreter and returns its start-up time (from the launch of the interpreter until the part begins), split
+into the interpreter itself, the imports and the loading of the dataset, together with the time of the part and the heavy libraries it imported.
+'''
+def measure_part(part, path=DATASET_PATH):
+    with tempfile.TemporaryDirectory(prefix='ev-import-time-') as directory:
+        link_boundary_files(directory)
+        process, launched = run_fresh(['-c', PART_CODE, part, os.path.abspath(path), directory, ','.join(HEAVY_MODULES)], directory)
+    times = json.loads(process.stdout.splitlines()[-1])
+    return {
+        'part': part,
+        'startup_seconds': round(times['loaded'] - launched, 3),
+        'interpreter_seconds': round(times['started'] - launched, 3),
+        'import_seconds': round(times['imported'] - times['started'], 3),
+        'load_seconds': round(times['loaded'] - times['imported'], 3),
+        'part_seconds': round(times['finished'] - times['loaded'], 3),
+        'modules': times['modules'],
+    }
+
+###############################################################################
+
+#                                 Command Line                                #
+
+###############################################################################
+
+'''
+The main function parses the command line, prints the import profile of the analysis script and the start-up time of every requested part, and
+exits with a non-zero status when a part takes longer than the target to start.
+'''
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure the start-up time of the EV analyses in fresh interpreters.')
+    parser.add_argument('parts', nargs='*', default=list(TEXT_PARTS), help='part numbers (1-11) to start (default: the text-only parts)')
+    parser.add_argument('--data', default=DATASET_PATH, help='path of the dataset CSV file')
+    parser.add_argument('--target', type=float, default=TARGET_SECONDS, help='start-up time (seconds) a part should stay under')
+    parser.add_argument('--top', type=int, default=10, help='number of slowest imports to list')
+    args = parser.parse_args(argv)
+
+    # Import profile of the analysis script:
+    result = measure_import(top=args.top, directory=tempfile.gettempdir())
+    print(f"import {result['module']}: {result['seconds']:.3f}s, heavy libraries imported: {', '.join(result['modules']) or 'none'}")
+    for name, seconds in result['slowest']:
+        print(f"    {seconds:>7.3f}s  {name}")
+
+    # Start-up time of each part:
+    slow = []
+    for part in args.parts:
+        result = measure_part(part, args.data)
+        print(f"Part {part:>2}: started in {result['startup_seconds']:.3f}s (interpreter {result['interpreter_seconds']:.3f}s, "
+              f"imports {result['import_seconds']:.3f}s, dataset {result['load_seconds']:.3f}s), ran in {result['part_seconds']:.3f}s, "
+              f"heavy libraries imported: {', '.join(result['modules']) or 'none'}")
+        if result['startup_seconds'] > args.target:
+            slow.append(part)
+
+    if slow:
+        print(f"Parts slower to start than {args.target:.2f}s: {', '.join(slow)}")
+        return 1
+    return 0
+
+# Run the main function
+if __name__ == "__main__":
+    raise SystemExit(main())
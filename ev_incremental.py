@@ -0,0 +1,391 @@
+'''
+Incremental Updates:
+
+Overview:
+     The Washington DOL republishes the dataset regularly and most rows do not change between releases. This module keeps a snapshot of the last
+     ingested release together with the aggregates computed from it, and brings them up to date from a new release without recomputing them:
+     1. The new CSV file is compared with the snapshot by DOL Vehicle ID. Every row is summarized by a 64-bit hash of its values, so the rows that
+        were inserted, deleted or updated (same ID, different hash) are found with vectorized key and hash comparisons.
+     2. Only the changed rows touch the aggregates: the old version of deleted and updated rows is subtracted and the new version of inserted and
+        updated rows is added to
+        - the County x City x Electric Vehicle Type and Model Year x Model x Electric Vehicle Type counts (the group-bys prefetched by the
+          analyses, from which the city, county, model and year counts are rolled up),
+        - exact value-count histograms of the numerical features, from which the descriptive statistics of Part 5 (including the quartiles)
+          are read exactly, so deletions are supported,
+        - the sparse one-hot encoding of Part 3: the rows of changed IDs are dropped from the CSR matrix and their new version is appended.
+          Categories seen for the first time are added to the vocabulary and the existing column numbers are remapped.
+     Hashing the new file is linear in its size, but the work on the aggregates grows with the number of changed rows only. The snapshot is stored
+     in a directory (Parquet and JSON files, plus the .npz encoding) and needs a Parquet engine (pyarrow). Later runs that load the same release
+     (the menu, the batch runner) read the stored counts with seed_from_snapshot() and answer their counts without scanning the rows.
+
+     Usage: python ev_incremental.py NEW_CSV [--snapshot DIRECTORY]
+'''
+
+# Import necessary libraries:
+import argparse                        # for the command line options
+import json                            # for the snapshot metadata and histograms
+import os                              # for the snapshot paths
+import numpy as np                     # for numerical operations
+import pandas as pd                    # for data manipulation
+from ev_data_loader import DATASET_PATH, cache_available, get_dataset_version, load_dataset   # for loading releases with the declared schema
+from ev_aggregations import store_counts                                # for answering the analyses' counts from the snapshot
+from ev_feature_encoding import ENCODED_FEATURES, SparseEncoding, build_vocabulary, load_encoding, save_encoding, sparse_one_hot
+from ev_missing_values import weighted_describe                         # for the statistics of the histograms
+
+# Column identifying each vehicle:
+ROW_KEY = 'DOL Vehicle ID'
+
+# Group-bys kept up to date (the ones prefetched by the analyses):
+COUNT_KEYS = {
+    'locations': ['County', 'City', 'Electric Vehicle Type'],
+    'models': ['Model Year', 'Model', 'Electric Vehicle Type'],
+}
+
+# Numerical features of the descriptive statistics:
+NUMERICAL_FEATURES = ['Model Year', 'Electric Range', 'Base MSRP']
+
+# Default snapshot directory:
+SNAPSHOT_DIRECTORY = os.path.splitext(DATASET_PATH)[0] + '.snapshot'
+
+###############################################################################
+
+#                                   Aggregates                                #
+
+###############################################################################
+
+'''
+This function returns a 64-bit hash of the values of every row (the same values always give the same hash).
+'''
+def row_hashes(df):
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+'''
+This function counts the rows of every combination of the given columns, with missing values as their own group. Categorical columns are counted by
+their values (not their codes), so counts of different releases, whose categories differ, can be added and subtracted.
+'''
+def count_rows(df, keys):
+    frame = df[keys].astype({key: object for key in keys if isinstance(df[key].dtype, pd.CategoricalDtype)})
+    return frame.groupby(keys, dropna=False, sort=False).size()
+
+'''
+This function counts the values of a numerical column (missing values are left out).
+'''
+def value_histogram(values):
+    return values.dropna().astype('float64').value_counts()
+
+'''
+This function adds counts to (sign=1) or subtracts them from (sign=-1) stored counts, dropping the groups that fall to zero.
+'''
+def combine_counts(stored, changes, sign=1):
+    # Concatenate and regroup (index alignment would not match groups whose key is missing):
+    combined = pd.concat([stored, sign * changes])
+    combined = combined.groupby(level=list(range(combined.index.nlevels)), dropna=False, sort=False).sum()
+    return combined[combined != 0].astype('int64')
+
+###############################################################################
+
+#                                   Snapshot                                  #
+
+###############################################################################
+
+'''
+This class holds the snapshot of one release: its rows and their hashes (by DOL Vehicle ID), the counts of COUNT_KEYS, the histograms of the
+numerical features and the sparse encoding.
+'''
+class Snapshot:
+    def __init__(self, version, rows, hashes, counts, histograms, encoding):
+        self.version = version
+        self.rows = rows
+        self.hashes = hashes
+        self.counts = counts
+        self.histograms = histograms
+        self.encoding = encoding
+
+    # Descriptive statistics in the layout of Part 5 (describe().transpose() plus the median), read exactly from the histograms:
+    def descriptive_statistics(self):
+        table = {}
+        for feature, histogram in self.histograms.items():
+            histogram = histogram.sort_index()
+            row = weighted_describe(histogram.index.to_numpy(dtype='float64'), histogram.to_numpy(dtype='int64'))
+            row['median'] = row['50%']
+            table[feature] = row
+        return pd.DataFrame(table).transpose()
+
+'''
+This function builds the snapshot of a release from scratch (used for the first release).
+'''
+def build_snapshot(df, encoded_features=ENCODED_FEATURES):
+    check_unique_keys(df)
+    encoding, _ = sparse_one_hot(df, build_vocabulary(df, encoded_features))
+    return Snapshot(get_dataset_version(df) or '', df.reset_index(drop=True), row_hashes(df),
+                    {name: count_rows(df, keys) for name, keys in COUNT_KEYS.items()},
+                    {feature: value_histogram(df[feature]) for feature in NUMERICAL_FEATURES},
+                    encoding)
+
+'''
+This function checks that every row has its own DOL Vehicle ID, since the rows of two releases are matched by it.
+'''
+def check_unique_keys(df):
+    if not df[ROW_KEY].is_unique:
+        raise ValueError(f"The {ROW_KEY} column has duplicate values; rows cannot be matched between releases.")
+
+###############################################################################
+
+#                                    Deltas                                   #
+
+###############################################################################
+
+'''
+This class holds the differences between a snapshot and a new release: the rows of the new release that were inserted or updated (new version),
+and the rows of the snapshot that were deleted or updated (old version).
+'''
+class Delta:
+    def __init__(self, inserted, deleted, updated_old, updated_new):
+        self.inserted = inserted
+        self.deleted = deleted
+        self.updated_old = updated_old
+        self.updated_new = updated_new
+
+    # Rows whose old version leaves the aggregates, and rows whose new version enters them:
+    @property
+    def removed(self):
+        return pd.concat([self.deleted, self.updated_old], ignore_index=True)
+
+    @property
+    def added(self):
+        return pd.concat([self.inserted, self.updated_new], ignore_index=True)
+
+    def summary(self):
+        return {'inserted': len(self.inserted), 'updated': len(self.updated_new), 'deleted': len(self.deleted)}
+
+'''
+This function compares a new release with a snapshot by DOL Vehicle ID and returns the Delta between them, plus the hashes of the new rows.
+'''
+def diff(snapshot, df):
+    check_unique_keys(df)
+    old_keys, new_keys = snapshot.rows[ROW_KEY].to_numpy(), df[ROW_KEY].to_numpy()
+    new_hashes = row_hashes(df)
+
+    # Match the keys of both releases:
+    order = np.argsort(old_keys, kind='stable')
+    positions = np.searchsorted(old_keys[order], new_keys)
+    positions = np.minimum(positions, len(old_keys) - 1) if len(old_keys) else positions
+    matched = (old_keys[order][positions] == new_keys) if len(old_keys) else np.zeros(len(new_keys), dtype=bool)
+    old_rows = order[positions[matched]]
+
+    # Matched rows whose values changed are updates; unmatched rows on either side are inserts and deletes:
+    changed = snapshot.hashes[old_rows] != new_hashes[matched]
+    kept = np.zeros(len(old_keys), dtype=bool)
+    kept[old_rows] = True
+
+    delta = Delta(inserted=df[~matched],
+                  deleted=snapshot.rows[~kept],
+                  updated_old=snapshot.rows.iloc[old_rows[changed]],
+                  updated_new=df[matched].iloc[np.flatnonzero(changed)])
+    return delta, new_hashes
+
+'''
+This function updates the CSR encoding of a snapshot: the rows of the removed IDs are dropped, the vocabulary is extended with the categories of the
+added rows that it does not know yet, and the added rows are encoded and appended.
+'''
+def update_encoding(encoding, removed_keys, added):
+    # Extend the vocabulary and remap the existing column numbers:
+    old_vocabulary = encoding.vocabulary
+    vocabulary = {feature: sorted(set(values) | set(added[feature].dropna().astype(str).unique()))
+                  for feature, values in old_vocabulary.items()}
+    remap = np.concatenate([[0]] + [offset_of(vocabulary, feature) + np.searchsorted(np.array(vocabulary[feature], dtype=str),
+                                                                                     np.array(values, dtype=str))
+                                    for feature, values in old_vocabulary.items()])[1:].astype(np.int32)
+
+    # Keep the rows whose ID was not removed:
+    keep = ~np.isin(encoding.row_keys, removed_keys)
+    lengths = np.diff(encoding.indptr)
+    entries = np.repeat(keep, lengths)
+    indices = remap[encoding.indices[entries]]
+
+    # Append the encoded added rows:
+    appended, _ = sparse_one_hot(added, vocabulary)
+    indptr = np.concatenate([[0], np.cumsum(lengths[keep]), np.cumsum(np.diff(appended.indptr)) + entries.sum()])
+    indptr = indptr.astype(np.int32 if indptr[-1] < np.iinfo(np.int32).max else np.int64)
+    rows = int(keep.sum()) + appended.shape[0]
+
+    return SparseEncoding(indptr, np.concatenate([indices, appended.indices]),
+                          np.concatenate([encoding.data[entries], appended.data]), (rows, appended.shape[1]), vocabulary,
+                          np.concatenate([encoding.row_keys[keep], appended.row_keys]))
+
+'''
+This function returns the number of the first one-hot column of a feature in a vocabulary.
+'''
+def offset_of(vocabulary, feature):
+    offset = 0
+    for name, values in vocabulary.items():
+        if name == feature:
+            return offset
+        offset += len(values)
+    raise KeyError(feature)
+
+'''
+This function applies a Delta to a snapshot: the aggregates are updated from the changed rows only, and the snapshot rows and hashes become those
+of the new release (whose version is given).
+'''
+def apply_delta(snapshot, delta, df, new_hashes, version):
+    removed, added = delta.removed, delta.added
+
+    # Counts and histograms: subtract the old version of the changed rows and add the new one:
+    for name, keys in COUNT_KEYS.items():
+        counts = combine_counts(snapshot.counts[name], count_rows(removed, keys), sign=-1)
+        snapshot.counts[name] = combine_counts(counts, count_rows(added, keys))
+    for feature in NUMERICAL_FEATURES:
+        histogram = combine_counts(snapshot.histograms[feature], value_histogram(removed[feature]), sign=-1)
+        snapshot.histograms[feature] = combine_counts(histogram, value_histogram(added[feature]))
+
+    # Encoding: drop the removed IDs and append the added rows:
+    snapshot.encoding = update_encoding(snapshot.encoding, removed[ROW_KEY].to_numpy(), added)
+
+    # The new release becomes the snapshot:
+    snapshot.rows = df.reset_index(drop=True)
+    snapshot.hashes = new_hashes
+    snapshot.version = version
+    return snapshot
+
+###############################################################################
+
+#                                Saving / Loading                             #
+
+###############################################################################
+
+'''
+This function returns the paths of the files of a snapshot directory.
+'''
+def snapshot_paths(directory=SNAPSHOT_DIRECTORY):
+    return {name: os.path.join(directory, file) for name, file in {
+        'metadata': 'snapshot.json',
+        'rows': 'rows.parquet',
+        'histograms': 'histograms.json',
+        'encoding': 'encoding.npz',
+        **{name: f'counts_{name}.parquet' for name in COUNT_KEYS},
+    }.items()}
+
+'''
+This function writes a snapshot to a directory.
+'''
+def save_snapshot(snapshot, directory=SNAPSHOT_DIRECTORY):
+    if not cache_available():
+        raise RuntimeError("Saving a snapshot needs a Parquet engine: pip install pyarrow")
+    os.makedirs(directory, exist_ok=True)
+    paths = snapshot_paths(directory)
+
+    snapshot.rows.assign(_row_hash=snapshot.hashes).to_parquet(paths['rows'], index=False)
+    for name in COUNT_KEYS:
+        snapshot.counts[name].rename('count').reset_index().to_parquet(paths[name], index=False)
+    with open(paths['histograms'], 'w', encoding='utf-8') as file:
+        json.dump({feature: {'values': histogram.index.tolist(), 'counts': histogram.tolist()}
+                   for feature, histogram in snapshot.histograms.items()}, file)
+    save_encoding(snapshot.encoding, paths['encoding'])
+    with open(paths['metadata'], 'w', encoding='utf-8') as file:
+        json.dump({'version': snapshot.version, 'rows': len(snapshot.rows)}, file, indent=2)
+
+'''
+This function reads a snapshot written by save_snapshot(), or returns None when the directory holds no snapshot.
+'''
+def load_snapshot(directory=SNAPSHOT_DIRECTORY):
+    paths = snapshot_paths(directory)
+    if not os.path.exists(paths['metadata']):
+        return None
+    with open(paths['metadata'], encoding='utf-8') as file:
+        metadata = json.load(file)
+
+    rows = pd.read_parquet(paths['rows'])
+    hashes = rows.pop('_row_hash').to_numpy()
+    counts = read_counts(paths)
+    with open(paths['histograms'], encoding='utf-8') as file:
+        histograms = {feature: pd.Series(stored['counts'], index=pd.Index(stored['values'], dtype='float64'), dtype='int64')
+                      for feature, stored in json.load(file).items()}
+
+    return Snapshot(metadata['version'], rows, hashes, counts, histograms, load_encoding(paths['encoding']))
+
+# Read the stored counts of a snapshot:
+def read_counts(paths):
+    return {name: pd.read_parquet(paths[name]).set_index(keys)['count'].rename(None) for name, keys in COUNT_KEYS.items()}
+
+###############################################################################
+
+#                                Seeding Counts                               #
+
+###############################################################################
+
+'''
+This function stores the counts of a snapshot held in memory as the prefetched group-bys of the DataFrame of the same release, so the analyses
+answer their city, county, model and year counts from them without scanning the rows. The counts only live in this process (see
+seed_from_snapshot() for the counts saved with a snapshot).
+'''
+def seed_aggregations(snapshot, df):
+    if get_dataset_version(df) != snapshot.version:
+        raise ValueError("The DataFrame does not hold the release of the snapshot.")
+    for name, keys in COUNT_KEYS.items():
+        store_counts(df, keys, snapshot.counts[name])
+
+'''
+This function stores the counts saved with the snapshot of a dataset file (in the snapshot directory next to it, unless "directory" is given) as
+the prefetched group-bys of a DataFrame loaded from that file, when the snapshot holds the same release. Only the metadata and the counts are read,
+not the rows. It returns whether the counts were used.
+'''
+def seed_from_snapshot(df, path=DATASET_PATH, directory=None):
+    paths = snapshot_paths(directory or os.path.splitext(path)[0] + '.snapshot')
+    version = get_dataset_version(df)
+    if version is None or not cache_available() or not os.path.exists(paths['metadata']):
+        return False
+    with open(paths['metadata'], encoding='utf-8') as file:
+        if json.load(file)['version'] != version:
+            return False
+
+    for name, counts in read_counts(paths).items():
+        store_counts(df, COUNT_KEYS[name], counts)
+    return True
+
+###############################################################################
+
+#                                    Update                                   #
+
+###############################################################################
+
+'''
+This function brings the snapshot of a directory up to date with a new release of the dataset and saves it. The first call (no snapshot yet) builds
+the snapshot from scratch. It returns the snapshot, the loaded new release and the number of inserted, updated and deleted rows (callers that go on
+to analyze the release in the same process can pass them to seed_aggregations()).
+'''
+def update_snapshot(path=DATASET_PATH, directory=SNAPSHOT_DIRECTORY):
+    df = load_dataset(path)
+    snapshot = load_snapshot(directory)
+
+    if snapshot is None:
+        snapshot = build_snapshot(df)
+        changes = {'inserted': len(df), 'updated': 0, 'deleted': 0}
+    elif snapshot.version == get_dataset_version(df):
+        changes = {'inserted': 0, 'updated': 0, 'deleted': 0}
+    else:
+        delta, new_hashes = diff(snapshot, df)
+        snapshot = apply_delta(snapshot, delta, df, new_hashes, get_dataset_version(df) or '')
+        changes = delta.summary()
+
+    save_snapshot(snapshot, directory)
+    return snapshot, df, changes
+
+'''
+This function is the command line entry point: it updates the snapshot from a new release and prints the changes and the updated statistics.
+'''
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Apply a new release of the EV dataset to the stored snapshot and its aggregates.')
+    parser.add_argument('path', nargs='?', default=DATASET_PATH, help='CSV file of the new release')
+    parser.add_argument('--snapshot', default=SNAPSHOT_DIRECTORY, help='snapshot directory')
+    args = parser.parse_args(argv)
+
+    snapshot, _, changes = update_snapshot(args.path, args.snapshot)
+    print(f"Inserted: {changes['inserted']}, updated: {changes['updated']}, deleted: {changes['deleted']}")
+    print("\nDescriptive Statistics:")
+    print(snapshot.descriptive_statistics())
+    return 0
+
+# Run the main function
+if __name__ == "__main__":
+    raise SystemExit(main())
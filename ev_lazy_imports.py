@@ -0,0 +1,65 @@
+'''
+Lazy Imports:
+
+Overview:
+     matplotlib, seaborn and geopandas (with shapely, pyproj and scipy behind them) take most of the start-up time of the analysis script, although
+     the text-only parts (feature encoding, normalization, descriptive statistics) never draw anything. lazy_import() returns a stand-in for a
+     module that imports the real module on the first attribute access, so the modules can keep their usual "plt." / "sns." / "gpd." code while
+     only the parts that actually plot pay for the plotting and geospatial stacks.
+     Attributes are always looked up on the real module (never copied to the stand-in), so functions replaced on the module later (for example by
+     ev_profiling) are seen through it as well.
+'''
+
+# Import necessary libraries:
+import importlib                       # for importing the real module
+import sys                             # for the modules already imported
+
+###############################################################################
+
+#                                 Lazy Modules                                #
+
+###############################################################################
+
+'''
+This class stands in for a module that has not been imported yet. The module is imported by the first attribute access (or by load()).
+'''
+class LazyModule:
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    '''
+    This function imports the module (once) and returns it.
+    '''
+    def load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def loaded(self):
+        return self._module is not None or self._name in sys.modules
+
+    def __getattr__(self, attribute):
+        return getattr(self.load(), attribute)
+
+    def __dir__(self):
+        return dir(self.load())
+
+    def __repr__(self):
+        state = 'loaded' if self.loaded() else 'not loaded'
+        return f"<lazy module '{self._name}' ({state})>"
+
+'''
+This function returns the module itself when it has already been imported, and a LazyModule standing in for it otherwise.
+'''
+def lazy_import(name):
+    if name in sys.modules:
+        return sys.modules[name]
+    return LazyModule(name)
+
+'''
+This function returns the names of the given modules that are imported in this process (used to check that a part did not load the plotting or
+geospatial stack).
+'''
+def loaded_modules(names):
+    return [name for name in names if name in sys.modules]
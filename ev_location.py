@@ -0,0 +1,133 @@
+'''
+Vehicle Locations:
+
+Overview:
+     The "Vehicle Location" column holds WKT points such as "POINT (-122.30839 47.610365)". This module turns the whole column into two contiguous
+     float arrays (longitude and latitude) without a per-row Python loop or regular expression:
+     1. The structure of every value is checked at once with NumPy string functions ("POINT (" prefix, ")" suffix, exactly two spaces).
+     2. The valid values are joined into one text, the "POINT (" and ")" markers are removed with two str.replace calls, and the remaining
+        "lon lat" pairs are converted by NumPy's C number parser in a single call.
+     Values that are missing stay NaN; values that do not have the expected structure (or whose numbers cannot be parsed) are reported as
+     malformed, also with NaN coordinates. The parsed arrays are cached in a .npz file next to the dataset cache, keyed by the dataset version.
+'''
+
+# Import necessary libraries:
+import os                              # for the cache path
+import warnings                        # for the fast parser's end-of-data warning
+import numpy as np                     # for numerical operations
+import pandas as pd                    # for data manipulation
+from ev_data_loader import DATASET_PATH, cache_paths, get_dataset_version, load_dataset   # for the dataset, its version and its cache location
+
+# Column holding the WKT points and the markers around their coordinates:
+LOCATION_COLUMN = 'Vehicle Location'
+POINT_PREFIX = 'POINT ('
+POINT_SUFFIX = ')'
+
+###############################################################################
+
+#                                   Parsing                                   #
+
+###############################################################################
+
+'''
+This function converts WKT points that passed the structure check into an (n, 2) array of coordinates. The fast path joins them into one text and
+uses NumPy's C number parser; if any coordinate is not a number it falls back to splitting every point on its space (with NumPy string functions)
+and pandas' vectorized conversion, which turns the bad coordinates into NaN so they can be reported.
+'''
+def parse_coordinates(points):
+    text = '\n'.join(points.tolist()).replace(POINT_PREFIX, '').replace(POINT_SUFFIX, '')
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        try:
+            numbers = np.fromstring(text, sep=' ')
+            if len(numbers) == 2 * len(points):
+                return numbers.reshape(-1, 2)
+        except (ValueError, DeprecationWarning):
+            pass
+
+    # Slow but safe path: split every point into its two coordinates:
+    inner = np.char.replace(np.char.replace(points, POINT_PREFIX, ''), POINT_SUFFIX, '')
+    parts = np.char.partition(inner, ' ')
+    pairs = np.empty((len(points), 2), dtype='float64')
+    pairs[:, 0] = pd.to_numeric(pd.Series(parts[:, 0]), errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+    pairs[:, 1] = pd.to_numeric(pd.Series(parts[:, 2]), errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+    return pairs
+
+'''
+This function parses a Series of WKT points into longitude and latitude arrays of the given dtype. It returns the two arrays and a report with the
+number of rows, missing values and malformed values, plus the positions of the malformed rows.
+'''
+def parse_points(locations, dtype='float64'):
+    missing = locations.isna().to_numpy()
+    values = locations.fillna('').to_numpy(dtype=str)
+
+    # Check the structure of every value at once:
+    structured = (np.char.startswith(values, POINT_PREFIX) & np.char.endswith(values, POINT_SUFFIX)
+                  & (np.char.count(values, ' ') == 2))
+    valid = structured & ~missing
+
+    # Parse the coordinates of the valid values in one call:
+    pairs = parse_coordinates(values[valid])
+
+    longitude = np.full(len(values), np.nan, dtype=dtype)
+    latitude = np.full(len(values), np.nan, dtype=dtype)
+    longitude[valid] = pairs[:, 0]
+    latitude[valid] = pairs[:, 1]
+
+    # Rows that are neither missing nor parsed are malformed:
+    malformed = ~missing & (np.isnan(longitude) | np.isnan(latitude))
+    report = {
+        'rows': len(values),
+        'missing': int(missing.sum()),
+        'malformed': int(malformed.sum()),
+        'malformed_rows': np.flatnonzero(malformed),
+    }
+    return longitude, latitude, report
+
+###############################################################################
+
+#                                    Cache                                    #
+
+###############################################################################
+
+'''
+This function returns the path of the cached coordinate arrays of a dataset file.
+'''
+def locations_cache_path(path=DATASET_PATH):
+    return os.path.splitext(cache_paths(path)[0])[0] + '.locations.npz'
+
+'''
+This function returns the longitude and latitude arrays of the dataset (and the parse report). They are read from the cache when it was written for
+the same version of the data; otherwise the column is parsed (from "df" when given, else from the dataset file) and the cache is rewritten.
+'''
+def load_locations(path=DATASET_PATH, df=None, dtype='float64'):
+    if df is None:
+        df = load_dataset(path, columns=[LOCATION_COLUMN])
+    version = get_dataset_version(df) or ''
+    cache_path = locations_cache_path(path)
+
+    # Read the cached arrays when they belong to this version of the data:
+    if version and os.path.exists(cache_path):
+        with np.load(cache_path) as cached:
+            if str(cached['version']) == version and len(cached['longitude']) == len(df):
+                report = {'rows': len(df), 'missing': int(cached['missing']), 'malformed': len(cached['malformed_rows']),
+                          'malformed_rows': cached['malformed_rows']}
+                return cached['longitude'].astype(dtype), cached['latitude'].astype(dtype), report
+
+    # Otherwise parse the column and cache the result:
+    longitude, latitude, report = parse_points(df[LOCATION_COLUMN], dtype)
+    if version:
+        np.savez(cache_path, version=np.array(version), longitude=longitude, latitude=latitude,
+                 missing=np.array(report['missing']), malformed_rows=report['malformed_rows'])
+
+    return longitude, latitude, report
+
+'''
+This function prints the parse report of the vehicle locations, with a few of the malformed values.
+'''
+def print_location_report(df, report, examples=5):
+    print("\n\n\nVehicle Location Parsing:")
+    print(f"Rows: {report['rows']}, missing: {report['missing']}, malformed: {report['malformed']}")
+    if report['malformed']:
+        print("Examples of malformed values:")
+        print(df[LOCATION_COLUMN].iloc[report['malformed_rows'][:examples]])
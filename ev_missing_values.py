@@ -0,0 +1,232 @@
+'''
+Missing Value Strategy Engine:
+
+Overview:
+     This module compares missing value strategies (mean imputation, median imputation, mode imputation, group-wise imputation and row removal)
+     without copying the dataset once per strategy. A single scan over the numeric columns records, for each column, its null mask and its
+     observed values as sorted (value, count) pairs. Every strategy is then described by the extra (fill value, count) pairs it adds to those
+     observed values, so its summary statistics (the same rows as DataFrame.describe()) are computed from a few small arrays. A full DataFrame
+     for a strategy is only built when materialize() is called.
+'''
+
+# Import necessary libraries:
+import numpy as np                     # for numerical operations
+import pandas as pd                    # for data manipulation
+
+# Rows of the summary statistics (same layout as DataFrame.describe()):
+SUMMARY_ROWS = ['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max']
+
+###############################################################################
+
+#                                Column Profiles                              #
+
+###############################################################################
+
+'''
+This class holds what the engine knows about one numeric column after the scan: the column itself (not copied), its null mask, its observed values
+as sorted unique values with their counts, and the same for the rows that have no missing value in any column (used by "Drop Rows").
+'''
+class ColumnProfile:
+    def __init__(self, name, series, complete_rows):
+        self.name = name
+        self.series = series
+        self.mask = series.isna().to_numpy()
+        self.missing = int(self.mask.sum())
+
+        # Observed values as sorted (value, count) pairs:
+        observed = series.to_numpy(dtype='float64', na_value=np.nan)
+        self.values, self.counts = np.unique(observed[~self.mask], return_counts=True)
+
+        # Observed values of the rows kept by "Drop Rows":
+        self.complete_values, self.complete_counts = np.unique(observed[complete_rows], return_counts=True)
+
+    @property
+    def mean(self):
+        return float(np.dot(self.values, self.counts) / self.counts.sum()) if len(self.values) else np.nan
+
+    @property
+    def median(self):
+        return weighted_quantile(self.values, self.counts, 0.5)
+
+    @property
+    def mode(self):
+        return float(self.values[np.argmax(self.counts)]) if len(self.values) else np.nan
+
+###############################################################################
+
+#                               Weighted Statistics                           #
+
+###############################################################################
+
+'''
+This function returns the q-quantile of a multiset given as sorted unique values and their counts, with the same linear interpolation as pandas.
+'''
+def weighted_quantile(values, counts, q):
+    total = counts.sum()
+    if total == 0:
+        return np.nan
+
+    # Position of the quantile in the (virtually) expanded sorted values:
+    position = q * (total - 1)
+    lower, upper = int(np.floor(position)), int(np.ceil(position))
+    ends = np.cumsum(counts)
+    lower_value = values[np.searchsorted(ends, lower, side='right')]
+    upper_value = values[np.searchsorted(ends, upper, side='right')]
+
+    return float(lower_value + (upper_value - lower_value) * (position - lower))
+
+'''
+This function computes the describe() statistics of a multiset given as sorted (value, count) pairs.
+'''
+def weighted_describe(values, counts):
+    total = int(counts.sum())
+    if total == 0:
+        return pd.Series([0] + [np.nan] * 7, index=SUMMARY_ROWS, dtype='float64')
+
+    # Moments of the multiset:
+    mean = float(np.dot(values, counts) / total)
+    std = float(np.sqrt(np.dot(counts, (values - mean) ** 2) / (total - 1))) if total > 1 else np.nan
+
+    return pd.Series([total, mean, std, values[0],
+                      weighted_quantile(values, counts, 0.25),
+                      weighted_quantile(values, counts, 0.50),
+                      weighted_quantile(values, counts, 0.75),
+                      values[-1]], index=SUMMARY_ROWS, dtype='float64')
+
+###############################################################################
+
+#                                   Strategies                                #
+
+###############################################################################
+
+'''
+A fill strategy is a function that receives a ColumnProfile and the DataFrame, and returns either a single value used for every missing entry of
+the column, or an array with one value per missing row (in row order) when the fill differs from row to row. The built-in strategies below fill
+with a single constant; group_mean_fill() builds a strategy that fills each row with the mean of its group.
+'''
+def mean_fill(profile, df):
+    return profile.mean
+
+def median_fill(profile, df):
+    return profile.median
+
+def mode_fill(profile, df):
+    return profile.mode
+
+def group_mean_fill(group_column):
+    def fill(profile, df):
+        group_means = profile.series.groupby(df[group_column], observed=True).mean()
+
+        # Fill each missing row with the mean of its group, or the column mean when its group has no observed value:
+        missing_groups = df[group_column][profile.mask]
+        return missing_groups.map(group_means).astype('float64').fillna(profile.mean).to_numpy()
+    return fill
+
+# Strategies compared by default (None marks "Drop Rows", which removes rows instead of filling them):
+DEFAULT_STRATEGIES = {
+    'Mean Imputation': mean_fill,
+    'Median Imputation': median_fill,
+    'Drop Rows': None,
+}
+
+###############################################################################
+
+#                                 Strategy Engine                             #
+
+###############################################################################
+
+'''
+This class compares missing value strategies on a DataFrame. The constructor performs the single scan of the numeric columns; statistics of each
+strategy are computed on first use and kept, and full DataFrames are only built by materialize(). Extra strategies (for example mode_fill or
+group_mean_fill('Make')) can be passed to the constructor or added later with add_strategy().
+'''
+class MissingValueStrategies:
+    def __init__(self, df, strategies=None):
+        self.df = df
+        self.strategies = dict(DEFAULT_STRATEGIES if strategies is None else strategies)
+        self.numeric_columns = list(df.select_dtypes(include='number').columns)
+
+        # Rows without any missing value (the rows kept by "Drop Rows"):
+        complete_rows = np.ones(len(df), dtype=bool)
+        for column in df.columns:
+            complete_rows &= df[column].notna().to_numpy()
+        self.complete_rows = complete_rows
+
+        # Scan the numeric columns once:
+        self.profiles = {column: ColumnProfile(column, df[column], complete_rows) for column in self.numeric_columns}
+        self._fills = {}
+        self._summaries = {}
+
+    def add_strategy(self, name, fill):
+        self.strategies[name] = fill
+        self._summaries.pop(name, None)
+        self._fills = {key: value for key, value in self._fills.items() if key[0] != name}
+
+    @property
+    def names(self):
+        return ['Original'] + list(self.strategies)
+
+    # Fill of one strategy and column (a single value or one value per missing row):
+    def fill(self, strategy, column):
+        key = (strategy, column)
+        if key not in self._fills:
+            self._fills[key] = self.strategies[strategy](self.profiles[column], self.df)
+        return self._fills[key]
+
+    # Fill of one strategy and column as sorted (value, count) pairs:
+    def fill_values(self, strategy, column):
+        profile = self.profiles[column]
+        if profile.missing == 0:
+            return np.empty(0), np.empty(0, dtype=profile.counts.dtype)
+        fills = self.fill(strategy, column)
+        if np.ndim(fills) == 0:
+            return np.array([fills], dtype='float64'), np.array([profile.missing], dtype=profile.counts.dtype)
+        return np.unique(np.asarray(fills, dtype='float64'), return_counts=True)
+
+    # Observed and filled values of one strategy and column, as sorted (value, count) pairs:
+    def weighted_values(self, strategy, column):
+        profile = self.profiles[column]
+        if strategy == 'Original':
+            return profile.values, profile.counts
+        if self.strategies[strategy] is None:
+            return profile.complete_values, profile.complete_counts
+
+        extra_values, extra_counts = self.fill_values(strategy, column)
+        values = np.concatenate([profile.values, extra_values])
+        counts = np.concatenate([profile.counts, extra_counts])
+        order = np.argsort(values, kind='stable')
+        return values[order], counts[order]
+
+    # Summary statistics of one strategy (same layout as DataFrame.describe() on the numeric columns):
+    def summary(self, strategy):
+        if strategy not in self._summaries:
+            columns = {}
+            for column in self.numeric_columns:
+                values, counts = self.weighted_values(strategy, column)
+                columns[column] = weighted_describe(values, counts)
+            self._summaries[strategy] = pd.DataFrame(columns)
+        return self._summaries[strategy]
+
+    def summaries(self):
+        return {strategy: self.summary(strategy) for strategy in self.names}
+
+    # Build the full DataFrame of one strategy (only when it is really needed):
+    def materialize(self, strategy):
+        if strategy == 'Original':
+            return self.df.copy()
+        if self.strategies[strategy] is None:
+            return self.df[self.complete_rows]
+
+        df_strategy = self.df.copy()
+        for column in self.numeric_columns:
+            profile = self.profiles[column]
+            if profile.missing == 0:
+                continue
+            fills = self.fill(strategy, column)
+            filled = df_strategy[column].astype('float64')
+            if np.ndim(fills) == 0:
+                filled = filled.fillna(fills)
+            else:
+                filled[profile.mask] = fills
+            df_strategy[column] = filled
+        return df_strategy
@@ -0,0 +1,239 @@
+'''
+Analysis Profiling:
+
+Overview:
+     This module measures where the time of an analysis goes without editing the analysis itself. profile_part() runs one part and records:
+     - its wall time and CPU time,
+     - the high-water mark of the resident memory (RSS) during the part (on Linux the mark is reset before the part; elsewhere the peak of the
+       whole process is reported),
+     - how the wall time splits into rendering, I/O and compute. While the part runs, the plotting entry points (matplotlib.pyplot and seaborn
+       functions, Axes and Figure methods, pandas and geopandas plot()) and the I/O entry points (to_csv / read_csv, Parquet, geopandas read_file,
+       NumPy .npz files) are wrapped with timers, and the remaining time is compute. Only the outermost wrapped call is timed (a depth counter
+       skips the nested ones), so seaborn calling pyplot, or savefig writing a file, is never counted twice.
+     Every run is appended to profile.jsonl and profile.csv in the log directory and, on request, the part is also run under cProfile and its
+     statistics are written to part<NN>.prof (readable with pstats, snakeviz, or flameprof / gprof2dot for flame graphs).
+'''
+
+# Import necessary libraries:
+import cProfile                        # for the optional per-part profile dump
+import csv                             # for the CSV log
+import datetime                        # for the time stamp of a run
+import functools                       # for wrapping the timed functions
+import importlib                       # for importing the plotting libraries before a part starts
+import inspect                         # for finding the functions to wrap
+import json                            # for the JSON log
+import os                              # for the log paths
+import sys                             # for the platform (units of ru_maxrss)
+import time                            # for wall and CPU times
+import traceback                       # for reporting failed parts
+
+try:
+    import resource                    # for the peak RSS (not available on Windows)
+except ImportError:
+    resource = None
+
+import numpy as np                     # for the .npz I/O entry points
+import pandas as pd                    # for the I/O and plotting entry points
+import pandas.plotting
+
+# Fields of the CSV log (the JSON log holds the same records):
+LOG_FIELDS = ['timestamp', 'part', 'title', 'status', 'wall_seconds', 'cpu_seconds', 'compute_seconds', 'render_seconds', 'io_seconds',
+              'peak_rss_mb', 'profile', 'error']
+
+# Time spent in the outermost wrapped calls of the running part, and the current nesting depth of wrapped calls:
+_STATE = {'depth': 0, 'render': 0.0, 'io': 0.0}
+
+###############################################################################
+
+#                                Timed Entry Points                           #
+
+###############################################################################
+
+'''
+This function wraps a function so the time of its outermost calls is added to a category ("render" or "io") of the running part.
+'''
+def timed(category, function):
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if _STATE['depth']:
+            return function(*args, **kwargs)
+        _STATE['depth'] += 1
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _STATE[category] += time.perf_counter() - start
+            _STATE['depth'] -= 1
+    return wrapper
+
+'''
+This function lists the (owner, name) pairs of the entry points of each category. Modules contribute their public functions and classes their
+public methods; geopandas is only included when it is installed. The plotting and geospatial libraries are imported here (the analysis script
+imports them lazily), so that their import time is not charged to the first part that plots and their functions can be wrapped before it runs.
+'''
+def entry_points():
+    points = {'render': [], 'io': []}
+    plt, sns, axes, figure = (importlib.import_module(name) for name in ('matplotlib.pyplot', 'seaborn', 'matplotlib.axes', 'matplotlib.figure'))
+
+    # Plotting: pyplot and seaborn functions, Axes and Figure methods, and the plot() accessors
+    for module in (plt, sns):
+        points['render'] += [(module, name) for name, value in vars(module).items()
+                             if not name.startswith('_') and inspect.isfunction(value)]
+    # (only the methods the classes define themselves: matplotlib compares some inherited methods by identity to detect overrides)
+    for cls in (axes.Axes, figure.Figure):
+        points['render'] += [(cls, name) for name, value in vars(cls).items()
+                             if not name.startswith('_') and inspect.isfunction(value)]
+    points['render'].append((pandas.plotting.PlotAccessor, '__call__'))
+
+    # I/O: CSV, Parquet and .npz files:
+    points['io'] += [(pd, 'read_csv'), (pd, 'read_parquet'), (pd.core.generic.NDFrame, 'to_csv'), (pd.DataFrame, 'to_parquet'),
+                     (np, 'load'), (np, 'save'), (np, 'savez'), (np, 'savez_compressed')]
+
+    # geopandas, when installed:
+    try:
+        geopandas = importlib.import_module('geopandas')
+    except ImportError:
+        geopandas = None
+    if geopandas is not None:
+        points['io'] += [(geopandas, 'read_file'), (geopandas, 'read_parquet'), (geopandas.GeoDataFrame, 'to_parquet')]
+        plotting = getattr(geopandas, 'plotting', None)
+        if hasattr(plotting, 'GeoplotAccessor'):
+            points['render'].append((plotting.GeoplotAccessor, '__call__'))
+
+    return points
+
+'''
+This function replaces every entry point with its timed wrapper and returns the list of replaced attributes, so restore() can put them back.
+'''
+def install():
+    replaced = []
+    for category, points in entry_points().items():
+        for owner, name in points:
+            # Only plain functions are wrapped (not accessors, properties or classes):
+            original = inspect.getattr_static(owner, name, None)
+            if not (inspect.isfunction(original) or inspect.isbuiltin(original)):
+                continue
+            replaced.append((owner, name, original, name in vars(owner)))
+            setattr(owner, name, timed(category, getattr(owner, name)))
+    return replaced
+
+def restore(replaced):
+    for owner, name, original, own in reversed(replaced):
+        if own:
+            setattr(owner, name, original)
+        else:
+            delattr(owner, name)
+
+###############################################################################
+
+#                                    Memory                                   #
+
+###############################################################################
+
+'''
+This function resets the RSS high-water mark of the process where the system allows it (Linux), and reports whether it did.
+'''
+def reset_peak_rss():
+    try:
+        with open('/proc/self/clear_refs', 'w') as file:
+            file.write('5')
+        return True
+    except OSError:
+        return False
+
+'''
+This function returns the RSS high-water mark of the process in MB (VmHWM on Linux, ru_maxrss elsewhere), or None where it cannot be measured.
+'''
+def peak_rss_mb():
+    try:
+        with open('/proc/self/status') as file:
+            for line in file:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 ** 2 if sys.platform == 'darwin' else 1024)
+
+###############################################################################
+
+#                                   Profiling                                 #
+
+###############################################################################
+
+'''
+This function runs one part with the timed entry points installed (and under cProfile when asked) and returns its record. The record is appended
+to the logs in "directory" (not written when directory is None). An exception raised by the part is logged and then raised again.
+'''
+def profile_part(part, title, function, df, directory='profile', cprofile=False):
+    if directory is not None:
+        os.makedirs(directory, exist_ok=True)
+    profile_path = os.path.join(directory or '.', f"part{int(part):02d}.prof") if cprofile else None
+
+    # Run the part with its entry points timed:
+    _STATE.update(depth=0, render=0.0, io=0.0)
+    replaced = install()
+    reset_peak_rss()
+    profiler = cProfile.Profile() if cprofile else None
+    status, error, failure = 'ok', None, None
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        if profiler is not None:
+            profiler.enable()
+        function(df)
+    except Exception as exception:
+        status, error, failure = 'failed', traceback.format_exc(), exception
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+        restore(replaced)
+
+    # Build and save the record:
+    if profiler is not None:
+        profiler.dump_stats(profile_path)
+    peak = peak_rss_mb()
+    record = {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'part': part,
+        'title': title,
+        'status': status,
+        'wall_seconds': round(wall, 4),
+        'cpu_seconds': round(cpu, 4),
+        'compute_seconds': round(max(wall - _STATE['render'] - _STATE['io'], 0.0), 4),
+        'render_seconds': round(_STATE['render'], 4),
+        'io_seconds': round(_STATE['io'], 4),
+        'peak_rss_mb': None if peak is None else round(peak, 1),
+        'profile': profile_path,
+        'error': error,
+    }
+    if directory is not None:
+        write_record(record, directory)
+
+    if failure is not None:
+        raise failure
+    return record
+
+'''
+This function appends a record to profile.jsonl (one JSON object per line) and profile.csv (with a header when the file is new).
+'''
+def write_record(record, directory):
+    with open(os.path.join(directory, 'profile.jsonl'), 'a', encoding='utf-8') as file:
+        file.write(json.dumps(record) + '\n')
+    csv_path = os.path.join(directory, 'profile.csv')
+    new_file = not os.path.exists(csv_path)
+    with open(csv_path, 'a', newline='', encoding='utf-8') as file:
+        writer = csv.DictWriter(file, fieldnames=LOG_FIELDS)
+        if new_file:
+            writer.writeheader()
+        writer.writerow(record)
+
+'''
+This function prints a one-line summary of a record.
+'''
+def print_record(record):
+    print(f"[profile] Part {record['part']} {record['title']}: {record['wall_seconds']:.2f}s wall, {record['cpu_seconds']:.2f}s CPU "
+          f"(compute {record['compute_seconds']:.2f}s, render {record['render_seconds']:.2f}s, I/O {record['io_seconds']:.2f}s), "
+          f"peak RSS {record['peak_rss_mb']} MB")
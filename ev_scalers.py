@@ -0,0 +1,146 @@
+'''
+Feature Scalers:
+
+Overview:
+     This module provides min-max, standard (z-score) and robust (median / interquartile range) scalers for the numerical features of Part 4.
+     A scaler is fitted once with vectorized NumPy reductions over all its columns, saved to a small JSON file, and later loaded to transform new
+     data (for example a monthly increment) against that frozen fit without reloading the history. Transforms scale one column at a time into
+     a new array (the DataFrame is never written to) and return only the scaled columns (as float32) plus a row key, and transform_csv() applies a scaler to a CSV file chunk by chunk.
+'''
+
+# Import necessary libraries:
+import abc                             # for the abstract base of the scalers
+import json                            # for saving fitted scalers
+import numpy as np                     # for numerical operations
+import pandas as pd                    # for data manipulation
+from ev_data_loader import DATASET_SCHEMA, clear_dataset_version   # for the column types of the dataset, and versions of modified data
+
+# Default numerical features and row key:
+NUMERICAL_FEATURES = ['Model Year', 'Electric Range', 'Base MSRP']
+ROW_KEY = 'DOL Vehicle ID'
+
+###############################################################################
+
+#                                    Scalers                                  #
+
+###############################################################################
+
+'''
+This class is the base of the scalers: every scaler transforms a column as (value - center) / scale, and only differs in how it computes the center
+and the scale of each column when it is fitted. It cannot be instantiated itself.
+'''
+class Scaler(abc.ABC):
+    kind = None
+
+    def __init__(self, columns=NUMERICAL_FEATURES, center=None, scale=None):
+        self.columns = list(columns)
+        self.center = None if center is None else np.asarray(center, dtype='float64')
+        self.scale = None if scale is None else np.asarray(scale, dtype='float64')
+
+    # Fit the center and scale of every column in one vectorized pass:
+    def fit(self, df):
+        values = df[self.columns].to_numpy(dtype='float64', na_value=np.nan)
+        self.center, self.scale = self.statistics(values)
+        # A constant column would divide by zero; it is left centered but unscaled:
+        self.scale = np.where(self.scale == 0, 1.0, self.scale)
+        return self
+
+    # Center and scale of every column of a (rows x columns) float64 array:
+    @abc.abstractmethod
+    def statistics(self, values):
+        pass
+
+    # Scale the columns of a DataFrame, returning the row key and the scaled columns as float32 (one column is worked on at a time, in float64
+    # so that large centers such as years keep their precision; the subtraction gives a new array, since to_numpy() may return a read-only view
+    # of the DataFrame's own data):
+    def transform(self, df, row_key=ROW_KEY, dtype='float32'):
+        scaled = {} if row_key not in df.columns else {row_key: df[row_key].to_numpy()}
+        for position, column in enumerate(self.columns):
+            values = df[column].to_numpy(dtype='float64', na_value=np.nan) - self.center[position]
+            values /= self.scale[position]
+            scaled[column] = values.astype(dtype, copy=False)
+        return pd.DataFrame(scaled, index=df.index)
+
+    # Scale the columns of a DataFrame in place (the columns become float32, and the DataFrame loses its dataset version):
+    def transform_inplace(self, df, dtype='float32'):
+        for column, values in self.transform(df, row_key=None, dtype=dtype).items():
+            df[column] = values
+        return clear_dataset_version(df)
+
+    def fit_transform(self, df, row_key=ROW_KEY, dtype='float32'):
+        return self.fit(df).transform(df, row_key, dtype)
+
+    # Turn scaled values back into the original units:
+    def inverse_transform(self, df_scaled):
+        original = df_scaled.copy()
+        for position, column in enumerate(self.columns):
+            original[column] = df_scaled[column].astype('float64') * self.scale[position] + self.center[position]
+        return original
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump({'kind': self.kind, 'columns': self.columns,
+                       'center': self.center.tolist(), 'scale': self.scale.tolist()}, file, indent=2)
+
+'''
+Min-Max scaling: (value - min) / (max - min), so the fitted values lie between 0 and 1.
+'''
+class MinMaxScaler(Scaler):
+    kind = 'minmax'
+
+    def statistics(self, values):
+        minimum = np.nanmin(values, axis=0)
+        return minimum, np.nanmax(values, axis=0) - minimum
+
+'''
+Standard scaling: (value - mean) / std, with the sample standard deviation like pandas' std().
+'''
+class StandardScaler(Scaler):
+    kind = 'standard'
+
+    def statistics(self, values):
+        return np.nanmean(values, axis=0), np.nanstd(values, axis=0, ddof=1)
+
+'''
+Robust scaling: (value - median) / (75th percentile - 25th percentile), which outliers such as very high Base MSRP values barely affect.
+'''
+class RobustScaler(Scaler):
+    kind = 'robust'
+
+    def statistics(self, values):
+        lower, median, upper = np.nanpercentile(values, [25, 50, 75], axis=0)
+        return median, upper - lower
+
+# Scaler classes by kind (used when loading a saved scaler):
+SCALERS = {scaler.kind: scaler for scaler in (MinMaxScaler, StandardScaler, RobustScaler)}
+
+'''
+This function loads a scaler saved with Scaler.save().
+'''
+def load_scaler(path):
+    with open(path, encoding='utf-8') as file:
+        fitted = json.load(file)
+    return SCALERS[fitted['kind']](fitted['columns'], fitted['center'], fitted['scale'])
+
+###############################################################################
+
+#                                 Chunked Apply                               #
+
+###############################################################################
+
+'''
+This function applies a fitted scaler to a CSV file chunk by chunk and writes only the row key and the scaled columns to the output CSV file, so
+new data can be normalized against a frozen fit with memory bounded by the chunk size.
+'''
+def transform_csv(scaler, input_path, output_path, chunksize=100_000, row_key=ROW_KEY, float_format='%.6g'):
+    columns = [row_key] + scaler.columns
+    dtypes = {column: DATASET_SCHEMA[column] for column in columns if column in DATASET_SCHEMA}
+    rows = 0
+
+    # Read, scale and append one chunk at a time:
+    for number, chunk in enumerate(pd.read_csv(input_path, usecols=columns, dtype=dtypes, chunksize=chunksize)):
+        scaler.transform(chunk, row_key).to_csv(output_path, mode='w' if number == 0 else 'a', header=number == 0,
+                                                index=False, float_format=float_format)
+        rows += len(chunk)
+
+    return rows
@@ -0,0 +1,76 @@
+'''
+Dataset Session:
+
+Overview:
+     Most analyses read a handful of columns (the spatial analysis needs County, City, Electric Vehicle Type and the census tract, the temporal
+     analysis Model Year, Model and Electric Vehicle Type), but loading the whole dataset also parses the wide text columns such as
+     Vehicle Location and Electric Utility. Each analysis therefore declares the columns it reads (see ANALYSIS_COLUMNS in assignment1_1212214),
+     and a DatasetSession loads columns on demand: the first request reads only its columns, and later requests read just the columns that are
+     still missing and add them to the same DataFrame, so the menu never reads a column twice. Columns come from the Parquet cache (only the
+     requested columns are read from it), from the CSV file otherwise, or from the SQLite store when the session has a filter.
+'''
+
+# Import necessary libraries:
+import pandas as pd                    # for data manipulation
+from ev_data_loader import DATASET_PATH, DATASET_SCHEMA, get_dataset_version, load_dataset, set_dataset_version   # for loading the requested columns
+from ev_sqlite_store import load_subset                                 # for loading the requested columns of a filtered subset
+from ev_incremental import seed_from_snapshot                           # for the counts saved with the snapshot of the same release
+
+###############################################################################
+
+#                                Column Requests                              #
+
+###############################################################################
+
+'''
+This function returns the union of several column lists in schema order, or None (all columns) when any of them is None.
+'''
+def union_columns(column_lists):
+    column_lists = list(column_lists)
+    if any(columns is None for columns in column_lists):
+        return None
+    wanted = {column for columns in column_lists for column in columns}
+    return [column for column in DATASET_SCHEMA if column in wanted] + sorted(wanted - set(DATASET_SCHEMA))
+
+'''
+This function loads the given columns (all when columns is None) of the dataset, or of the rows matching a filter dictionary. When the snapshot
+of ev_incremental holds the loaded release, its saved counts are stored in the shared aggregation cache.
+'''
+def load_columns(path=DATASET_PATH, columns=None, filters=None):
+    if filters:
+        return load_subset(filters, columns, path=path)
+    df = load_dataset(path, columns)
+    seed_from_snapshot(df, path)
+    return df
+
+###############################################################################
+
+#                                   Session                                   #
+
+###############################################################################
+
+'''
+This class keeps the columns loaded so far in one DataFrame and adds the missing ones when an analysis asks for more. The rows of every load come
+in the same order (the order of the CSV file), so new columns are simply placed next to the loaded ones.
+'''
+class DatasetSession:
+    def __init__(self, path=DATASET_PATH, filters=None):
+        self.path = path
+        self.filters = filters
+        self.df = None
+
+    def loaded_columns(self):
+        return [] if self.df is None else list(self.df.columns)
+
+    '''
+    This function returns a DataFrame with the requested columns (all when columns is None), reading only the columns not loaded yet.
+    '''
+    def load(self, columns=None):
+        wanted = list(DATASET_SCHEMA) if columns is None else list(columns)
+        missing = [column for column in wanted if column not in self.loaded_columns()]
+        if missing:
+            new = load_columns(self.path, missing, self.filters)
+            self.df = new if self.df is None else set_dataset_version(pd.concat([self.df, new], axis=1), get_dataset_version(new))
+
+        # The columns in schema order, whatever order they were loaded in (the same data, so the same version):
+        return set_dataset_version(self.df[[column for column in DATASET_SCHEMA if column in wanted]], get_dataset_version(self.df))
@@ -0,0 +1,279 @@
+'''
+SQLite Query Store:
+
+Overview:
+     The analyses normally work on the whole dataset, so a report on a subset ("King County, 2020 and later, BEVs only") still loads every row.
+     This module ingests the CSV file once into a local SQLite database next to it (Python's sqlite3, no server), with a typed column per field of
+     the declared schema and an index on each column the reports filter by (County, City, Make, Model, Model Year, Electric Vehicle Type and
+     Postal Code). Then:
+     - load_subset() pushes a filter dictionary down as an SQL WHERE clause and returns only the matching rows, typed like load_dataset(), so
+       memory is bounded by the subset. The DataFrame remembers the database and the filter in df.attrs.
+     - database_counts() answers group counts with GROUP BY in the database. ev_aggregations uses it for DataFrames loaded by load_subset(), so
+       the counts of the analyses are computed by SQLite over the indexed rows instead of by pandas.
+     Filters use the same dictionaries as ev_aggregations: {column: condition}, where the condition is a single value, a list of values, or a
+     (low, high) tuple for an inclusive range (either bound may be None). On the command line they are written as COLUMN=VALUE,
+     COLUMN=VALUE1,VALUE2 or COLUMN=LOW..HIGH.
+     The database is rebuilt when the CSV file changes (size, modification time and SHA-256 hash are checked like the Parquet cache).
+
+Usage:
+     python ev_sqlite_store.py --filter County=King "Model Year=2020.." "Electric Vehicle Type=Battery Electric Vehicle (BEV)" --group-by Make
+'''
+
+# Import necessary libraries:
+import argparse                        # for the command line interface
+import os                              # for the database path
+import sqlite3                         # for the database
+import time                            # for timing the reports
+import pandas as pd                    # for data manipulation
+from ev_data_loader import DATASET_PATH, DATASET_SCHEMA, file_hash, schema_key, set_dataset_version   # for the dataset and its types
+
+# Table holding the rows of the dataset:
+TABLE = 'vehicles'
+
+# Columns the reports filter by, each with its own index:
+INDEXED_COLUMNS = ['County', 'City', 'Make', 'Model', 'Model Year', 'Electric Vehicle Type', 'Postal Code']
+
+# Number of CSV rows inserted per batch while ingesting:
+INGEST_CHUNKSIZE = 100_000
+
+###############################################################################
+
+#                                  Ingestion                                  #
+
+###############################################################################
+
+'''
+This function returns the path of the SQLite database of a CSV file (written next to it).
+'''
+def database_path(path=DATASET_PATH):
+    return os.path.splitext(path)[0] + '.sqlite'
+
+# Quote a column name as an SQL identifier:
+def quote(column):
+    return '"' + column.replace('"', '""') + '"'
+
+'''
+This function returns the SQLite type of a column of the declared schema (integers for the integer types, text for strings and categoricals).
+'''
+def sql_type(dtype):
+    return 'INTEGER' if dtype.lower().startswith('int') else 'REAL' if dtype.lower().startswith('float') else 'TEXT'
+
+'''
+This function reads the metadata stored in a database and returns it when the database was built from the current content of the CSV file with
+the current schema, or None when it has to be rebuilt. Matching size and modification time are trusted directly; otherwise the content hash decides.
+'''
+def read_valid_metadata(path, database):
+    if not os.path.exists(database):
+        return None
+    try:
+        with sqlite3.connect(database) as connection:
+            metadata = dict(connection.execute('SELECT key, value FROM metadata').fetchall())
+    except sqlite3.Error:
+        return None
+
+    stat = os.stat(path)
+    if metadata.get('schema') != schema_key() or metadata.get('size') != str(stat.st_size):
+        return None
+    if metadata.get('mtime_ns') == str(stat.st_mtime_ns) or metadata.get('sha256') == file_hash(path):
+        return metadata
+    return None
+
+'''
+This function converts a chunk of the typed DataFrame into rows of Python values for sqlite3 (missing values become NULL).
+'''
+def chunk_rows(chunk):
+    values = chunk.astype(object)
+    return values.where(chunk.notna(), None).itertuples(index=False, name=None)
+
+'''
+This function loads the CSV file into the SQLite database (in chunks, so memory stays flat) unless the database is already up to date, and returns
+its metadata. The database is written under a temporary name and then renamed, so an interrupted run never leaves a half-built database behind.
+'''
+def ingest(path=DATASET_PATH, database=None, chunksize=INGEST_CHUNKSIZE):
+    database = database or database_path(path)
+    metadata = read_valid_metadata(path, database)
+    if metadata is not None:
+        return metadata
+
+    building = database + '.tmp'
+    if os.path.exists(building):
+        os.remove(building)
+    columns = list(DATASET_SCHEMA)
+    rows = 0
+    connection = sqlite3.connect(building)
+    try:
+        # The file is only renamed into place once complete, so the journal can be skipped while building:
+        connection.execute('PRAGMA journal_mode = OFF')
+        connection.execute('PRAGMA synchronous = OFF')
+        definitions = ', '.join(f"{quote(column)} {sql_type(dtype)}" for column, dtype in DATASET_SCHEMA.items())
+        connection.execute(f"CREATE TABLE {TABLE} ({definitions})")
+        insert = f"INSERT INTO {TABLE} VALUES ({', '.join('?' * len(columns))})"
+        for chunk in pd.read_csv(path, usecols=columns, dtype=DATASET_SCHEMA, chunksize=chunksize):
+            connection.executemany(insert, chunk_rows(chunk[columns]))
+            rows += len(chunk)
+
+        # Index the filter columns once all rows are in, and collect the statistics of the query planner:
+        for number, column in enumerate(INDEXED_COLUMNS):
+            connection.execute(f"CREATE INDEX index_{number} ON {TABLE} ({quote(column)})")
+        connection.execute('ANALYZE')
+
+        stat = os.stat(path)
+        metadata = {'source': os.path.basename(path), 'size': str(stat.st_size), 'mtime_ns': str(stat.st_mtime_ns),
+                    'sha256': file_hash(path), 'schema': schema_key(), 'rows': str(rows)}
+        connection.execute('CREATE TABLE metadata (key TEXT PRIMARY KEY, value TEXT)')
+        connection.executemany('INSERT INTO metadata VALUES (?, ?)', metadata.items())
+        connection.commit()
+    finally:
+        connection.close()
+    os.replace(building, database)
+
+    return metadata
+
+###############################################################################
+
+#                                   Queries                                   #
+
+###############################################################################
+
+# Convert a filter value to a Python value sqlite3 can bind (NumPy scalars are not accepted):
+def sql_value(value):
+    return value.item() if hasattr(value, 'item') else value
+
+'''
+This function turns one or more filter dictionaries into an SQL WHERE clause (an empty string when there is no condition) and its parameters.
+The conditions of all dictionaries are combined with AND, in a fixed order so the same filter always gives the same clause.
+'''
+def where_clause(*filters):
+    conditions, parameters = [], []
+    for column, condition in sorted((item for spec in filters if spec for item in spec.items()), key=lambda item: (item[0], repr(item[1]))):
+        if isinstance(condition, list):
+            conditions.append(f"{quote(column)} IN ({', '.join('?' * len(condition))})")
+            parameters += [sql_value(value) for value in condition]
+        elif isinstance(condition, tuple):
+            low, high = condition
+            if low is not None:
+                conditions.append(f"{quote(column)} >= ?")
+                parameters.append(sql_value(low))
+            if high is not None:
+                conditions.append(f"{quote(column)} <= ?")
+                parameters.append(sql_value(high))
+        else:
+            conditions.append(f"{quote(column)} = ?")
+            parameters.append(sql_value(condition))
+    return (' WHERE ' + ' AND '.join(conditions) if conditions else ''), parameters
+
+# Open a database for reading only:
+def connect(database):
+    return sqlite3.connect(f"file:{database}?mode=ro", uri=True)
+
+'''
+This function gives the columns of a query result the types of the declared schema (categoricals only hold the values present in the subset).
+'''
+def typed_frame(df):
+    for column in df.columns:
+        dtype = DATASET_SCHEMA.get(column)
+        if dtype is not None:
+            df[column] = df[column].astype(dtype)
+    return df
+
+'''
+This function returns the rows of the dataset that match a filter dictionary, read from the SQLite database (ingested first when needed), with
+only the requested columns and in the order of the CSV file. The result is typed like load_dataset() and carries a dataset version of its own (the data version and the WHERE
+clause), plus the database and the filter in df.attrs so ev_aggregations can count its rows in the database.
+'''
+def load_subset(filters=None, columns=None, path=DATASET_PATH, database=None):
+    database = database or database_path(path)
+    metadata = ingest(path, database)
+    columns = list(columns or DATASET_SCHEMA)
+
+    where, parameters = where_clause(filters)
+    with connect(database) as connection:
+        df = pd.read_sql_query(f"SELECT {', '.join(map(quote, columns))} FROM {TABLE}{where} ORDER BY rowid", connection, params=parameters)
+    df = typed_frame(df)
+
+    set_dataset_version(df, f"{metadata['sha256']}:sqlite:{where}:{parameters!r}")
+    df.attrs['sqlite_database'] = database
+    df.attrs['sqlite_filters'] = dict(filters or {})
+    return df
+
+'''
+This function counts the rows of every combination of the given columns with a GROUP BY in the database, among the rows that match all of the
+filter dictionaries. It returns the same Series as df.groupby(keys, observed=True, dropna=dropna).size() on those rows (the keys typed like the
+dataset), sorted by the keys with missing values last.
+'''
+def database_counts(database, keys, filters=(), dropna=True):
+    keys = list(keys)
+    where, parameters = where_clause(*filters)
+    if dropna:
+        missing = ' AND '.join(f"{quote(key)} IS NOT NULL" for key in keys)
+        where = f"{where} AND {missing}" if where else f" WHERE {missing}"
+    columns = ', '.join(map(quote, keys))
+    order = ', '.join(f"{quote(key)} IS NULL, {quote(key)}" for key in keys)
+    with connect(database) as connection:
+        counts = pd.read_sql_query(f"SELECT {columns}, COUNT(*) AS size FROM {TABLE}{where} GROUP BY {columns} ORDER BY {order}",
+                                   connection, params=parameters)
+
+    counts = typed_frame(counts)
+    return counts.set_index(keys)['size'].astype('int64').rename(None)
+
+###############################################################################
+
+#                                 Command Line                                #
+
+###############################################################################
+
+'''
+This function parses a filter written on the command line (COLUMN=VALUE, COLUMN=VALUE1,VALUE2 or COLUMN=LOW..HIGH, where either bound may be left
+out) into a filter dictionary entry. Values of integer columns are converted to integers.
+'''
+def parse_filter(text):
+    column, separator, value = text.partition('=')
+    if not separator or column not in DATASET_SCHEMA:
+        raise ValueError(f"Invalid filter: {text!r}. Expected COLUMN=VALUE with one of the dataset's columns.")
+    convert = int if sql_type(DATASET_SCHEMA[column]) == 'INTEGER' else str
+    if '..' in value and convert is int:
+        low, high = value.split('..', 1)
+        return column, (convert(low) if low else None, convert(high) if high else None)
+    if ',' in value:
+        return column, [convert(item) for item in value.split(',')]
+    return column, convert(value)
+
+'''
+This function turns the filters given on the command line into one filter dictionary.
+'''
+def parse_filters(texts):
+    return dict(parse_filter(text) for text in texts or [])
+
+'''
+The main function ingests the dataset when needed and prints a filtered report: the number of matching rows and their counts grouped by the given
+columns, each with the time the database took to answer it.
+'''
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load the EV dataset into an indexed SQLite database and report on a filtered subset.')
+    parser.add_argument('--data', default=DATASET_PATH, help='path of the dataset CSV file')
+    parser.add_argument('--database', default=None, help='path of the SQLite database (default: next to the CSV file)')
+    parser.add_argument('--filter', nargs='+', default=[], help='filters: COLUMN=VALUE, COLUMN=VALUE1,VALUE2 or COLUMN=LOW..HIGH')
+    parser.add_argument('--group-by', nargs='+', default=['County'], help='columns to count the matching rows by')
+    args = parser.parse_args(argv)
+
+    try:
+        filters = parse_filters(args.filter)
+    except ValueError as error:
+        parser.error(str(error))
+    database = args.database or database_path(args.data)
+
+    start = time.perf_counter()
+    metadata = ingest(args.data, database)
+    print(f"Database {database}: {metadata['rows']} rows ({time.perf_counter() - start:.2f}s)")
+
+    start = time.perf_counter()
+    counts = database_counts(database, args.group_by, [filters], dropna=False)
+    seconds = time.perf_counter() - start
+    print(f"\nMatching rows: {int(counts.sum())}")
+    print(counts.sort_values(ascending=False, kind='stable').rename('count').to_string())
+    print(f"\nAnswered in {seconds * 1000:.1f} ms")
+    return 0
+
+# Run the main function
+if __name__ == "__main__":
+    raise SystemExit(main())
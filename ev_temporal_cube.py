@@ -0,0 +1,181 @@
+'''
+Temporal Cube:
+
+Overview:
+     The temporal analysis draws the registrations of every model per model year, but computes no adoption metrics from them. This module gathers
+     the yearly counts of every series (every value of Model, Make, Electric Vehicle Type and County) into one cube, stored as a sparse integer
+     array in coordinate (COO) form: the series, the year and the count of every non-zero cell. The years run over the whole range without gaps,
+     so a year without registrations is a zero and the growth of the year after it is measured against that zero.
+     metrics() expands the cube to a dense (series x years) integer matrix once and computes the metrics of all the series together with NumPy,
+     whatever their number:
+     - Count: registrations of the model year,
+     - Cumulative: registrations up to and including the model year,
+     - YoY Growth: change from the year before, as a fraction of the year before (missing when the year before has no registrations),
+     - Share: fraction of the registrations of the model year within the same dimension (e.g. the share of a make among all makes),
+     - Rolling Mean: average registrations over the last "window" years (fewer at the start of the range).
+     top_movers() ranks the series of one dimension by their change, growth or change of share in a given year (so it needs at least two years).
+     Data without any model year gives an empty cube (no series and no years), whose metrics are an empty table.
+     The counts come from ev_aggregations.group_counts(), so they are shared with the other analyses (and computed by SQLite for a subset).
+
+Usage:
+     from ev_temporal_cube import build_cube
+     cube = build_cube(df)
+     cube.metrics().loc['Make']
+     cube.top_movers('Model', 2023, by='growth')
+'''
+
+# Import necessary libraries:
+import numpy as np                     # for numerical operations
+import pandas as pd                    # for data manipulation
+from ev_aggregations import group_counts   # for the counts per model year, shared with the other analyses
+
+# Time column and dimensions of the cube:
+TIME_COLUMN = 'Model Year'
+CUBE_DIMENSIONS = ['Model', 'Make', 'Electric Vehicle Type', 'County']
+
+# Default number of years of the rolling mean:
+ROLLING_WINDOW = 3
+
+# Columns of the metrics table and their types:
+METRIC_DTYPES = {'Count': 'int64', 'Cumulative': 'int64', 'YoY Growth': 'float64', 'Share': 'float64', 'Rolling Mean': 'float64'}
+
+# Smallest count of the previous year for a series to be ranked by its growth (growing from 1 to 5 registrations is not a trend):
+MIN_GROWTH_BASE = 10
+
+###############################################################################
+
+#                                   The Cube                                  #
+
+###############################################################################
+
+'''
+This class holds the yearly counts of many series as a sparse integer array in COO form: "series" lists the dimension and value of every series,
+"years" the model years, and (rows, columns, counts) the non-zero cells (series number, year number, count).
+'''
+class TemporalCube:
+    def __init__(self, series, years, rows, columns, counts):
+        self.series = series
+        self.years = years
+        self.rows = rows
+        self.columns = columns
+        self.counts = counts
+        self._metrics = {}
+
+    # Whether the cube has no model years (and so no series):
+    def is_empty(self):
+        return len(self.years) == 0
+
+    # Dense (series x years) integer matrix of the counts:
+    def dense(self):
+        matrix = np.zeros((len(self.series), len(self.years)), dtype=np.int64)
+        matrix[self.rows, self.columns] = self.counts
+        return matrix
+
+    '''
+    This function returns the counts of one dimension as a (years x values) table of integers, the layout of
+    group_counts(df, ['Model Year', dimension]).unstack(fill_value=0) over the full range of years.
+    '''
+    def table(self, dimension):
+        members = np.flatnonzero(self.series['Dimension'].to_numpy() == dimension)
+        return pd.DataFrame(self.dense()[members].T, index=pd.Index(self.years, name=TIME_COLUMN),
+                            columns=pd.Index(self.series['Value'].to_numpy()[members], name=dimension))
+
+    '''
+    This function computes the metrics of every series and year in one vectorized pass over the dense count matrix, and returns them as a table
+    indexed by (Dimension, Value, Model Year) with the columns Count, Cumulative, YoY Growth, Share and Rolling Mean. The table is kept, so
+    later calls (such as top_movers()) reuse it.
+    '''
+    def metrics(self, window=ROLLING_WINDOW):
+        if window in self._metrics:
+            return self._metrics[window]
+        if self.is_empty():
+            index = pd.MultiIndex.from_arrays([[], [], np.zeros(0, dtype=np.int64)], names=['Dimension', 'Value', TIME_COLUMN])
+            self._metrics[window] = pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in METRIC_DTYPES.items()}, index=index)
+            return self._metrics[window]
+        counts = self.dense()
+        cumulative = counts.cumsum(axis=1)
+
+        # Growth from the year before (missing for the first year and after a year without registrations):
+        previous = np.zeros_like(counts)
+        previous[:, 1:] = counts[:, :-1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            growth = np.where(previous > 0, (counts - previous) / previous, np.nan)
+        growth[:, 0] = np.nan
+
+        # Share of the registrations of the year within the same dimension:
+        dimension_codes, dimensions = pd.factorize(self.series['Dimension'])
+        totals = np.zeros((len(dimensions), len(self.years)), dtype=np.int64)
+        np.add.at(totals, dimension_codes, counts)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            share = np.where(totals[dimension_codes] > 0, counts / totals[dimension_codes], np.nan)
+
+        # Rolling mean over the last "window" years, from differences of the cumulative counts:
+        earlier = np.zeros_like(cumulative)
+        earlier[:, window:] = cumulative[:, :-window]
+        rolling = (cumulative - earlier) / np.minimum(np.arange(1, len(self.years) + 1), window)
+
+        index = pd.MultiIndex.from_arrays([
+            np.repeat(self.series['Dimension'].to_numpy(), len(self.years)),
+            np.repeat(self.series['Value'].to_numpy(), len(self.years)),
+            np.tile(self.years, len(self.series)),
+        ], names=['Dimension', 'Value', TIME_COLUMN])
+        self._metrics[window] = pd.DataFrame({'Count': counts.ravel(), 'Cumulative': cumulative.ravel(), 'YoY Growth': growth.ravel(),
+                                              'Share': share.ravel(), 'Rolling Mean': rolling.ravel()}, index=index)
+        return self._metrics[window]
+
+    '''
+    This function returns the n series of a dimension that moved the most in a model year (the latest by default), ranked by their change in
+    registrations from the year before ("change"), their growth ("growth", for series with at least min_base registrations the year before) or
+    their change of share ("share"). The cube must cover at least two model years.
+    '''
+    def top_movers(self, dimension, year=None, n=10, by='change', min_base=MIN_GROWTH_BASE):
+        if len(self.years) < 2:
+            raise ValueError(f"Movers need at least two model years, the cube covers {len(self.years)}.")
+        year = self.years[-1] if year is None else year
+        if year not in self.years[1:]:
+            raise ValueError(f"Movers need a model year after the first one ({self.years[0]}), got {year}.")
+        table = self.metrics().loc[dimension]
+        current = table.xs(year, level=TIME_COLUMN)
+        before = table.xs(year - 1, level=TIME_COLUMN)
+        movers = pd.DataFrame({'Count': current['Count'], 'Previous': before['Count'], 'Change': current['Count'] - before['Count'],
+                               'YoY Growth': current['YoY Growth'], 'Share': current['Share'], 'Share Change': current['Share'] - before['Share']})
+        if by == 'change':
+            ranking = movers['Change']
+        elif by == 'growth':
+            movers = movers[movers['Previous'] >= min_base]
+            ranking = movers['YoY Growth']
+        elif by == 'share':
+            ranking = movers['Share Change']
+        else:
+            raise ValueError(f"Unknown ranking {by!r}: expected 'change', 'growth' or 'share'.")
+        return movers.loc[ranking.sort_values(ascending=False, kind='stable').index[:n]].rename_axis(dimension)
+
+###############################################################################
+
+#                                 Building a Cube                             #
+
+###############################################################################
+
+'''
+This function builds the cube of a DataFrame from the counts per model year of every dimension (rows with a missing year or value are left
+out). The years cover the whole range from the first to the last model year; without any counted row the cube is empty.
+'''
+def build_cube(df, dimensions=CUBE_DIMENSIONS, filters=None):
+    counts = {dimension: group_counts(df, [TIME_COLUMN, dimension], filters) for dimension in dimensions}
+    observed = np.concatenate([np.zeros(0, dtype=np.int64)] +
+                              [counts[dimension].index.get_level_values(TIME_COLUMN).to_numpy(dtype=np.int64) for dimension in dimensions])
+    if len(observed) == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return TemporalCube(pd.DataFrame({'Dimension': pd.Series(dtype=object), 'Value': pd.Series(dtype=object)}), empty, empty, empty, empty)
+    years = np.arange(observed.min(), observed.max() + 1)
+
+    series, rows, columns, values = [], [], [], []
+    for dimension in dimensions:
+        dimension_counts = counts[dimension][counts[dimension] > 0]
+        codes, labels = pd.factorize(dimension_counts.index.get_level_values(dimension), sort=True)
+        rows.append(codes + sum(len(part) for part in series))
+        columns.append(dimension_counts.index.get_level_values(TIME_COLUMN).to_numpy(dtype=np.int64) - years[0])
+        values.append(dimension_counts.to_numpy(dtype=np.int64))
+        series.append(pd.DataFrame({'Dimension': dimension, 'Value': np.asarray(labels, dtype=object)}))
+
+    return TemporalCube(pd.concat(series, ignore_index=True), years, np.concatenate(rows), np.concatenate(columns), np.concatenate(values))
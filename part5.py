@@ -1,19 +1,13 @@
-import pandas as pd
+'''
+Part 5: Descriptive Statistics
 
-# Load the dataset
-url = 'Electric_Vehicle_Population_Data.csv'
-df = pd.read_csv(url)
+Overview:
+     Runs part 5 of the analysis on its own. The analysis itself lives in assignment1_1212214.py and is shared with the menu and the batch runner.
+'''
 
-# Select numerical features
-numerical_features = ['Model Year', 'Electric Range', 'Base MSRP']
+# Import necessary libraries:
+from assignment1_1212214 import run_analysis   # for loading the dataset and running the shared analysis
 
-# Calculate descriptive statistics
-descriptive_stats = df[numerical_features].describe().transpose()
-descriptive_stats['median'] = df[numerical_features].median()
-
-# Print the descriptive statistics
-print("Descriptive Statistics:")
-print(descriptive_stats)
-
-# If you want to save the statistics to a CSV file for further analysis or documentation
-descriptive_stats.to_csv('Descriptive_Statistics.csv')
\ No newline at end of file
+# Run the part:
+if __name__ == "__main__":
+    run_analysis('5')